@@ -0,0 +1,41 @@
+"""
+Version stamps for cached data.
+
+Cached values are keyed by a stamp that is replaced whenever the underlying
+data changes, so stale entries are never read again and simply expire; no
+cache keys have to be tracked or deleted. Stamps live in the shared database
+cache, so a stamp replaced by one process (the import worker, say) is seen by
+every other. A stamp is a fresh random token rather than a counter: a stamp
+lost to a cache flush or eviction is never handed out again, so ETags built
+from stamps can't match data that has since changed.
+
+With the database cache, reading a stamp is a primary-key lookup in the cache
+table (plus an insert the first time), and bumping one is a write; a shared
+in-memory cache such as Redis avoids both without code changes.
+"""
+import uuid
+
+from django.core.cache import cache
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def _new_stamp():
+    return uuid.uuid4().hex[:16]
+
+
+def get_version(name):
+    key = _key(name)
+    version = cache.get(key)
+    if version is None:
+        # Whichever process stores a stamp first wins
+        cache.add(key, _new_stamp(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*names):
+    if names:
+        cache.set_many({_key(name): _new_stamp() for name in names}, None)
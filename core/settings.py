@@ -129,6 +129,22 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by the web and process_imports worker processes, so version stamps bumped
+# by one are seen by the other. `migrate` creates the table (equipment_bom 0009).
+# Trade-off: every ETag check reads the table (one indexed lookup) and every stamp
+# bump writes it. Where Redis is available, django.core.cache.backends.redis.RedisCache
+# takes those off the database; nothing else needs to change.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,7 +134,7 @@ class BOMComponentAdmin(admin.ModelAdmin):
             'fields': ('component_number', 'description', 'equipment_item', 'bom_template')
         }),
         ('Product Details', {
-            'fields': ('product_type', 'supply_type')
+            'fields': ('product_type', 'supply_type', 'quantity')
         }),
         ('Dimensions', {
             'fields': ('diameter', 'height', 'length', 'width', 'thickness'),
@@ -0,0 +1,181 @@
+"""
+Import and export benchmarks on synthetic workbooks.
+
+``synthetic_workbook`` builds a single-sheet workbook of any size for an equipment
+sheet by repeating the item rows of a real workbook (the sample D365 import by
+default) under the same header, with generated item numbers. Generation is
+deterministic, so numbers from different commits are comparable.
+
+``benchmark_sheet`` imports such a workbook and exports it again, reporting the
+elapsed time, rows per second, query counts and time spent per import phase:
+
+``parse``
+    reading and cleaning row batches from the workbook
+``transform``
+    mapping rows to item and specification frames (the sheet layouts)
+``write``
+    validating, fingerprinting and upserting batches
+"""
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.db import connection
+from openpyxl import Workbook, load_workbook
+
+from .excel_importer import ExcelBOMImporter
+from .exports import export_rows, iter_csv, write_xlsx
+from .models import EquipmentType, ImportLog
+
+SAMPLE_WORKBOOK = os.path.join(settings.BASE_DIR, 'HEATER D365 IMPORT 6.4.25.xlsx')
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def synthetic_workbook(file_path, sheet_name, rows, source=SAMPLE_WORKBOOK):
+    """
+    Write a workbook with one sheet of ``rows`` item rows, cycling through the
+    item rows of ``sheet_name`` in ``source``. Returns the file size in bytes.
+    """
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        source_rows = list(workbook[sheet_name].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+    header = source_rows[0]
+    item_column = header.index('Item Number')
+    templates = [row for row in source_rows[1:] if row[item_column] is not None]
+    if not templates:
+        raise ValueError(f"Sheet '{sheet_name}' of {source} has no item rows to repeat")
+
+    code = ExcelBOMImporter.SHEETS[sheet_name].code
+    output = Workbook(write_only=True)
+    worksheet = output.create_sheet(title=sheet_name)
+    worksheet.append(header)
+    for number in range(rows):
+        row = list(templates[number % len(templates)])
+        row[item_column] = f'BENCH-{code}-{number + 1:07d}'
+        worksheet.append(row)
+    output.save(file_path)
+    return os.path.getsize(file_path)
+
+
+@contextmanager
+def count_queries(counter):
+    """Count the queries run on the default connection into ``counter['queries']``"""
+    def wrapper(execute, sql, params, many, context):
+        counter['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def _timed(function, timings, phase):
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings[phase] += time.perf_counter() - started
+    return timed
+
+
+def _timed_generator(function, timings, phase):
+    """Time only the work done inside the generator, not the consumer's work between items"""
+    def timed(*args, **kwargs):
+        iterator = function(*args, **kwargs)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                timings[phase] += time.perf_counter() - started
+            yield item
+    return timed
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def benchmark_sheet(file_path, sheet_name, user):
+    """Import a workbook's sheet and export it again, measuring both"""
+    importer = ExcelBOMImporter(file_path, user, sheet_name)
+    layout = ExcelBOMImporter.SHEETS[sheet_name]
+    timings = defaultdict(float)
+    importer._read_batches = _timed_generator(importer._read_batches, timings, 'parse')
+    importer._write_batch = _timed(importer._write_batch, timings, 'write')
+    layout.transform = _timed(layout.transform, timings, 'transform')
+
+    try:
+        with count_queries({'queries': 0}) as import_queries:
+            started = time.perf_counter()
+            importer.import_excel()
+            import_seconds = time.perf_counter() - started
+    finally:
+        # Back to the class's method
+        del layout.transform
+
+    import_log = ImportLog.objects.get(pk=importer.import_log.pk)
+    equipment_type = EquipmentType.objects.get(name=sheet_name)
+
+    with count_queries({'queries': 0}) as export_queries:
+        started = time.perf_counter()
+        header, rows = export_rows(equipment_type)
+        write_xlsx(sheet_name, header, rows).close()
+        xlsx_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        header, rows = export_rows(equipment_type)
+        for _ in iter_csv(header, rows):
+            pass
+        csv_seconds = time.perf_counter() - started
+
+    return {
+        'import': {
+            'status': import_log.status,
+            'records_processed': import_log.records_processed,
+            'records_created': import_log.records_created,
+            'errors': len(import_log.errors),
+            'seconds': round(import_seconds, 3),
+            'rows_per_second': round(import_log.records_processed / import_seconds, 1) if import_seconds else None,
+            'queries': import_queries['queries'],
+            'phases': {phase: round(timings[phase], 3) for phase in ('parse', 'transform', 'write')},
+        },
+        'export': {
+            'xlsx_seconds': round(xlsx_seconds, 3),
+            'csv_seconds': round(csv_seconds, 3),
+            'queries': export_queries['queries'],
+        },
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def environment():
+    """Where the numbers were measured, so runs can be matched up across commits"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+    }
@@ -0,0 +1,156 @@
+"""
+Change sets for import previews (dry runs).
+
+A ``ChangeSet`` compares parsed item rows with the stored items column by column
+and records, per item number, whether importing the row would insert it, update it
+(with each changed field's before/after values) or leave it unchanged. It is
+JSON-serialisable so it can be stored on the ``ImportLog`` and applied later
+without re-reading the workbook; applying writes only the inserts and updates.
+"""
+import math
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from .models import EquipmentItem, Specification
+
+
+# Item columns compared through a relation, keyed by the name used in the change set
+RELATED_FIELDS = {
+    'job': 'job__job_number',
+    'equipment_type': 'equipment_type__name',
+    'primary_material': 'primary_material__code',
+}
+
+
+def json_value(value):
+    """Plain JSON value for a DataFrame cell (NaN -> None, numpy scalars and Decimals -> Python)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+class ChangeSet:
+    """Per-item inserts, updates and no-ops of an import, diffed against the database"""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.entries = data.get('entries', {})
+        self.sheets = data.get('sheets', {})
+        self.unchanged = data.get('unchanged', 0)
+
+    def to_json(self):
+        return {
+            'entries': self.entries,
+            'sheets': self.sheets,
+            'unchanged': self.unchanged,
+            'summary': self.summary(),
+        }
+
+    def summary(self):
+        actions = [entry['action'] for entry in self.entries.values()]
+        return {
+            'inserts': actions.count('insert'),
+            'updates': actions.count('update'),
+            'unchanged': self.unchanged,
+        }
+
+    def inserts(self):
+        return [entry for entry in self.entries.values() if entry['action'] == 'insert']
+
+    def updates(self):
+        return [entry for entry in self.entries.values() if entry['action'] == 'update']
+
+    def add(self, sheet_name, job_number, items, specs):
+        """
+        Diff validated, de-duplicated item rows of a sheet (and their specification
+        rows) against the stored items, with one query each for items and specs.
+        """
+        self.sheets[sheet_name] = {'job_number': job_number}
+        numbers = items['item_number'].tolist()
+        fields = [name for name in items.columns if name not in ('item_number', 'material_code', 'import_fingerprint')]
+
+        new = items.set_index('item_number', drop=False)
+        new['job'] = job_number
+        new['equipment_type'] = sheet_name
+        new['primary_material'] = new['material_code'] if 'material_code' in new else ''
+        compared = fields + list(RELATED_FIELDS)
+
+        records = list(EquipmentItem.objects.filter(item_number__in=numbers).values(
+            'item_number', *fields, *RELATED_FIELDS.values()
+        ))
+        stored = pd.DataFrame.from_records(
+            records, columns=['item_number', *fields, *RELATED_FIELDS.values()]
+        ).rename(columns={lookup: name for name, lookup in RELATED_FIELDS.items()})
+        stored = stored.set_index('item_number').reindex(new.index)
+        exists = pd.Series(new.index.isin([record['item_number'] for record in records]), index=new.index)
+
+        changed = pd.DataFrame(False, index=new.index, columns=compared)
+        for name in compared:
+            changed[name] = ~self._equal(name, stored[name], new[name]) & exists
+
+        spec_changes = self._diff_specs(specs, numbers)
+
+        for position, item_number in enumerate(new.index):
+            row_specs = spec_changes.get(item_number, [])
+            if not exists.iloc[position]:
+                action = 'insert'
+            elif changed.iloc[position].any() or row_specs:
+                action = 'update'
+            else:
+                # A later row for the same item may supersede an earlier change
+                self.entries.pop(item_number, None)
+                self.unchanged += 1
+                continue
+            values = {name: json_value(items[name].iloc[position]) for name in items.columns}
+            self.entries[item_number] = {
+                'item_number': item_number,
+                'sheet': sheet_name,
+                'row': int(items.index[position]) + 1,
+                'action': action,
+                'values': values,
+                'changes': {
+                    name: [json_value(stored[name].iloc[position]), json_value(new[name].iloc[position])]
+                    for name in compared if changed[name].iloc[position]
+                },
+                'specs': row_specs,
+            }
+
+    def _equal(self, name, before, after):
+        """Column-wise equality of stored and parsed values, treating blanks alike"""
+        if name in RELATED_FIELDS:
+            return before.fillna('').astype(str) == after.fillna('').astype(str)
+        field = EquipmentItem._meta.get_field(name)
+        if getattr(field, 'decimal_places', None) is not None:
+            before = pd.to_numeric(before, errors='coerce').round(field.decimal_places)
+            after = pd.to_numeric(after, errors='coerce').round(field.decimal_places)
+            return (before == after) | (before.isna() & after.isna())
+        return before.fillna('').astype(str) == after.fillna('').astype(str)
+
+    def _diff_specs(self, specs, numbers):
+        """New or changed specification values per item number"""
+        stored = {
+            (item_number, spec_type): value
+            for item_number, spec_type, value in Specification.objects.filter(
+                equipment_item__item_number__in=numbers
+            ).values_list('equipment_item__item_number', 'spec_type', 'value')
+        }
+        changes = {}
+        for spec in specs.to_dict('records'):
+            before = stored.get((spec['item_number'], spec['spec_type']))
+            if before == spec['value']:
+                continue
+            changes.setdefault(spec['item_number'], []).append({
+                'spec_type': spec['spec_type'],
+                'before': before,
+                'value': spec['value'],
+                'description': spec['description'],
+            })
+        return changes
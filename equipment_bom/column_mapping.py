@@ -0,0 +1,143 @@
+"""
+Declarative column mappings for equipment sheets.
+
+Each equipment sheet is described as data in ``sheet_layouts.json``: which header
+holds each ``EquipmentItem`` field, how to convert it, and which columns become
+``Specification`` rows. ``load_layouts`` compiles every layout once into column
+transforms that run on a whole DataFrame batch, so supporting a new sheet means
+adding a layout, not code.
+
+Field transform types:
+
+``text``
+    The cell as a string (``''`` when missing); ``"strip": true`` trims whitespace.
+``number``
+    The cell coerced to a float (NaN when missing or not numeric).
+``choice``
+    The first of ``choices`` contained in the cell, else ``default``.
+``match``
+    The ``value`` (default: the ``contains`` text) of the first rule whose
+    ``column`` contains its ``contains`` text, else ``default``.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+LAYOUTS_PATH = os.path.join(os.path.dirname(__file__), 'sheet_layouts.json')
+
+SPEC_COLUMNS = ['item_number', 'spec_type', 'value', 'description']
+
+
+def column(df, key):
+    """Column by header, or an all-missing column when the sheet doesn't have it"""
+    if key in df.columns:
+        return df[key]
+    return pd.Series(np.nan, index=df.index, dtype=object)
+
+
+def text(df, key):
+    """Column as strings with missing cells as ''"""
+    col = column(df, key)
+    return col.astype(str).where(col.notna(), '')
+
+
+def numeric(df, key):
+    """Column coerced to floats with unparseable cells as NaN"""
+    return pd.to_numeric(column(df, key), errors='coerce')
+
+
+def _compile_text(spec):
+    key, strip = spec['column'], spec.get('strip', False)
+
+    def transform(df):
+        values = text(df, key)
+        return values.str.strip() if strip else values
+    return transform
+
+
+def _compile_number(spec):
+    key = spec['column']
+    return lambda df: numeric(df, key)
+
+
+def _compile_match(rules, default):
+    rules = [(rule['column'], rule['contains'], rule.get('value', rule['contains'])) for rule in rules]
+    values = [value for _, _, value in rules]
+
+    def transform(df):
+        conditions = [text(df, key).str.contains(contains, regex=False) for key, contains, _ in rules]
+        return pd.Series(np.select(conditions, values, default=default), index=df.index, dtype=object)
+    return transform
+
+
+def _compile_choice(spec):
+    rules = [{'column': spec['column'], 'contains': choice} for choice in spec['choices']]
+    return _compile_match(rules, spec.get('default', ''))
+
+
+COMPILERS = {
+    'text': _compile_text,
+    'number': _compile_number,
+    'choice': _compile_choice,
+    'match': lambda spec: _compile_match(spec['rules'], spec.get('default', '')),
+}
+
+
+class SheetLayout:
+    """A sheet's column mapping compiled into DataFrame transforms"""
+
+    def __init__(self, sheet_name, spec, common_columns=None):
+        self.sheet_name = sheet_name
+        self.label = spec.get('label', sheet_name)
+        self.code = spec['code']
+        columns = {**(common_columns or {}), **spec.get('columns', {})}
+        if 'item_number' not in columns:
+            raise ValueError(f"Layout for '{sheet_name}' has no item_number column")
+        try:
+            self.transforms = {field: COMPILERS[field_spec['type']](field_spec) for field, field_spec in columns.items()}
+        except KeyError as e:
+            raise ValueError(f"Layout for '{sheet_name}' uses an unknown transform type: {e}")
+        self.specifications = [
+            (spec_column['spec_type'], spec_column['column'], spec_column.get('description', ''))
+            for spec_column in spec.get('specifications', [])
+        ]
+
+    def __repr__(self):
+        return f"<SheetLayout {self.sheet_name}>"
+
+    def transform(self, df):
+        """
+        Item frame (one row per row of ``df``, indexed like it) and long-format
+        specification frame for a non-empty batch of importable rows.
+        """
+        items = pd.DataFrame({field: transform(df) for field, transform in self.transforms.items()}, index=df.index)
+        return items, self.specification_frame(df, items)
+
+    def specification_frame(self, df, items):
+        frames = []
+        for spec_type, key, description in self.specifications:
+            values = text(df, key)
+            present = values != ''
+            frames.append(pd.DataFrame({
+                'item_number': items['item_number'][present],
+                'spec_type': spec_type,
+                'value': values[present],
+                'description': description,
+            }))
+        if not frames:
+            return pd.DataFrame(columns=SPEC_COLUMNS)
+        return pd.concat(frames)
+
+
+def load_layouts(path=LAYOUTS_PATH):
+    """Compile every sheet layout in a layouts file, keyed by sheet name"""
+    with open(path) as handle:
+        data = json.load(handle)
+    common_columns = data.get('common_columns', {})
+    return {
+        sheet_name: SheetLayout(sheet_name, spec, common_columns)
+        for sheet_name, spec in data['sheets'].items()
+    }
@@ -1,66 +1,131 @@
+import multiprocessing
+import os
+import queue
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import numpy as np
 from django.contrib.auth.models import User
 from django.db import transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from .models import (
     EquipmentType, Job, Material, BOMTemplate, EquipmentItem, 
     BOMComponent, Specification, ImportLog
 )
+from .change_set import ChangeSet
+from .column_mapping import SPEC_COLUMNS, column, load_layouts
+from .excel_reader import StreamingExcelReader, file_sha256
+from .import_lookups import ImportLookups
+from .versions import BOM, EQUIPMENT_ITEMS, bump_version
+from . import import_workers
 import logging
 
 logger = logging.getLogger(__name__)
 
+# One parsed row batch of a sheet; built without touching the database so it can
+# be produced in a worker process and written by the importer
+SheetBatch = namedtuple('SheetBatch', ['job_number', 'items', 'specs', 'rows_read', 'processed'])
+
+
 class ExcelBOMImporter:
     """Excel importer for BOM data with multiple tabs"""
     
-    def __init__(self, file_path, user, equipment_type_name):
+    # Rows read from the workbook at a time
+    READ_BATCH_SIZE = 2000
+    # Rows written per bulk upsert / transaction
+    BATCH_SIZE = 500
+    # Worker processes for whole-workbook imports (None: one per sheet, up to the CPU count)
+    PARSE_WORKERS = None
+    # Parsed batches a sheet's worker may queue ahead of the writer
+    QUEUED_BATCHES = 2
+    
+    # Pseudo equipment type that imports every supported sheet of the workbook
+    WHOLE_WORKBOOK = 'Whole Workbook'
+    
+    # Sheet name -> compiled column layout (see sheet_layouts.json)
+    SHEETS = load_layouts()
+    
+    def __init__(self, file_path, user, equipment_type_name, import_log=None, dry_run=False):
         self.file_path = file_path
         self.user = user
         self.equipment_type_name = equipment_type_name
-        self.import_log = None
+        # A queued log (see import_jobs) is reused; otherwise one is created on import
+        self.import_log = import_log
+        # Dry runs only diff the rows against the database (see change_set)
+        self.dry_run = dry_run
+        self.change_set = ChangeSet()
         self.errors = []
         self.records_processed = 0
         self.records_created = 0
         self.records_updated = 0
+        self.records_skipped = 0
+        # Rows read so far per sheet, for progress reporting
+        self.sheet_rows = {}
+        # Identity map for equipment types, jobs and materials (loaded on import)
+        self.lookups = None
         
     def import_excel(self):
         """Main import method"""
         try:
+            whole_workbook = self.equipment_type_name == self.WHOLE_WORKBOOK
+            
+            self.lookups = ImportLookups()
+            
             # Create import log
-            equipment_type, _ = EquipmentType.objects.get_or_create(
-                name=self.equipment_type_name,
-                defaults={'code': self.equipment_type_name[:3].upper()}
-            )
+            equipment_type = None
+            if self.equipment_type_name in self.SHEETS and not self.dry_run:
+                equipment_type = self._sheet_equipment_type(self.equipment_type_name)
+            elif not whole_workbook:
+                equipment_type = self.lookups.equipment_types.get(self.equipment_type_name)
             
-            self.import_log = ImportLog.objects.create(
-                file_name=self.file_path.split('/')[-1],
-                imported_by=self.user,
-                equipment_type=equipment_type,
-                status='in_progress'
-            )
+            if self.import_log is None:
+                self.import_log = ImportLog.objects.create(
+                    file_name=self.file_path.split('/')[-1],
+                    imported_by=self.user,
+                    equipment_type=equipment_type,
+                    status='in_progress',
+                    dry_run=self.dry_run
+                )
             
-            # Read Excel file
-            excel_file = pd.ExcelFile(self.file_path)
+            self.import_log.file_hash = file_sha256(self.file_path)
+            if not self.dry_run:
+                previous = self._identical_import()
+                if previous:
+                    return self._finish_duplicate(previous)
             
-            # Process each sheet based on equipment type
-            if self.equipment_type_name == 'Import Heater':
-                self._process_heater_sheet(excel_file)
-            elif self.equipment_type_name == 'Import Tank':
-                self._process_tank_sheet(excel_file)
-            elif self.equipment_type_name == 'Pump':
-                self._process_pump_sheet(excel_file)
-            elif self.equipment_type_name == 'Stack Economizer':
-                self._process_economizer_sheet(excel_file)
+            # Stream the Excel file in row batches
+            reader = StreamingExcelReader(self.file_path, batch_size=self.READ_BATCH_SIZE)
+            
+            if whole_workbook:
+                sheets = [name for name in reader.sheet_names if name in self.SHEETS]
+                if not sheets:
+                    raise ValueError("Workbook has no supported equipment sheets")
+                self._start_progress(reader, sheets)
+                self._import_workbook(reader, sheets)
+            elif self.equipment_type_name in self.SHEETS:
+                self._start_progress(reader, [self.equipment_type_name])
+                self._process_sheet(reader, self.equipment_type_name)
             else:
                 raise ValueError(f"Unknown equipment type: {self.equipment_type_name}")
             
+            if self.dry_run:
+                summary = self.change_set.summary()
+                self.records_created = summary['inserts']
+                self.records_updated = summary['updates']
+                self.import_log.change_set = self.change_set.to_json()
+            
             # Update import log
             self.import_log.records_processed = self.records_processed
             self.import_log.records_created = self.records_created
             self.import_log.records_updated = self.records_updated
+            self.import_log.records_skipped = self.records_skipped
             self.import_log.errors = self.errors
-            self.import_log.status = 'completed' if not self.errors else 'partial'
+            if self.dry_run:
+                self.import_log.status = 'preview'
+            else:
+                self.import_log.status = 'completed' if not self.errors else 'partial'
+            self._finish_progress()
             self.import_log.save()
             
             return True
@@ -70,179 +135,247 @@ class ExcelBOMImporter:
             if self.import_log:
                 self.import_log.status = 'failed'
                 self.import_log.errors.append(str(e))
+                self._finish_progress()
                 self.import_log.save()
             return False
     
-    def _process_heater_sheet(self, excel_file):
-        """Process Import Heater sheet"""
-        df = pd.read_excel(excel_file, sheet_name='Import Heater')
-        
-        # Clean up the dataframe
-        df = self._clean_dataframe(df)
-        
-        # Extract job information
-        job_number = self._extract_job_number(df)
-        job, _ = Job.objects.get_or_create(
-            job_number=job_number,
-            defaults={
-                'description': f'Heater Project {job_number}',
-                'created_by': self.user
-            }
-        )
-        
-        # Get or create equipment type
-        equipment_type, _ = EquipmentType.objects.get_or_create(
-            name='Import Heater',
-            defaults={'code': 'HEA', 'description': 'Import Heater Equipment'}
+    def _identical_import(self):
+        """
+        The last completed import of the same file content into the same equipment type,
+        provided no item has been written or deleted since it finished (so the data still matches)
+        """
+        previous = (
+            ImportLog.objects.filter(
+                file_hash=self.import_log.file_hash,
+                equipment_type=self.import_log.equipment_type,
+                status='completed',
+                dry_run=False,
+                finished_at__isnull=False,
+            )
+            .exclude(pk=self.import_log.pk)
+            .order_by('-finished_at')
+            .first()
         )
-        
-        # Process each row
-        for index, row in df.iterrows():
-            if pd.isna(row.get('Item Number')) or pd.isna(row.get('Description')):
-                continue
-                
-            self.records_processed += 1
-            
-            try:
-                with transaction.atomic():
-                    # Create or update equipment item
-                    equipment_item, created = self._create_heater_item(row, job, equipment_type)
-                    
-                    if created:
-                        self.records_created += 1
-                    else:
-                        self.records_updated += 1
-                    
-                    # Create specifications
-                    self._create_heater_specifications(row, equipment_item)
-                    
-            except Exception as e:
-                error_msg = f"Row {index + 1}: {str(e)}"
-                self.errors.append(error_msg)
-                logger.error(error_msg)
+        if previous is None or previous.items_after_import != EquipmentItem.objects.count():
+            return None
+        if EquipmentItem.objects.filter(updated_at__gt=previous.finished_at).exists():
+            return None
+        return previous
     
-    def _process_tank_sheet(self, excel_file):
-        """Process Import Tank sheet"""
-        df = pd.read_excel(excel_file, sheet_name='Import Tank')
-        df = self._clean_dataframe(df)
-        
-        job_number = self._extract_job_number(df)
-        job, _ = Job.objects.get_or_create(
-            job_number=job_number,
-            defaults={
-                'description': f'Tank Project {job_number}',
-                'created_by': self.user
-            }
-        )
-        
-        equipment_type, _ = EquipmentType.objects.get_or_create(
-            name='Import Tank',
-            defaults={'code': 'TNK', 'description': 'Import Tank Equipment'}
-        )
-        
-        for index, row in df.iterrows():
-            if pd.isna(row.get('Item Number')) or pd.isna(row.get('Description')):
-                continue
-                
-            self.records_processed += 1
-            
-            try:
-                with transaction.atomic():
-                    equipment_item, created = self._create_tank_item(row, job, equipment_type)
-                    
-                    if created:
-                        self.records_created += 1
-                    else:
-                        self.records_updated += 1
-                        
-                    self._create_tank_specifications(row, equipment_item)
-                    
-            except Exception as e:
-                error_msg = f"Row {index + 1}: {str(e)}"
-                self.errors.append(error_msg)
-                logger.error(error_msg)
+    def _finish_duplicate(self, previous):
+        """Complete the log without reading the file: its rows were all written by ``previous``"""
+        self.records_processed = self.records_skipped = previous.records_processed
+        self.import_log.duplicate_of = previous
+        self.import_log.records_processed = self.records_processed
+        self.import_log.records_skipped = self.records_skipped
+        self.import_log.status = 'completed'
+        self._finish_progress()
+        self.import_log.save()
+        return True
     
-    def _process_pump_sheet(self, excel_file):
-        """Process Pump sheet"""
-        df = pd.read_excel(excel_file, sheet_name='Pump')
-        df = self._clean_dataframe(df)
-        
-        job_number = self._extract_job_number(df)
-        job, _ = Job.objects.get_or_create(
-            job_number=job_number,
-            defaults={
-                'description': f'Pump Project {job_number}',
-                'created_by': self.user
-            }
-        )
-        
-        equipment_type, _ = EquipmentType.objects.get_or_create(
-            name='Pump',
-            defaults={'code': 'PMP', 'description': 'Pump Equipment'}
+    def _start_progress(self, reader, sheets):
+        """Record the estimated row count and start time before any rows are read"""
+        self.import_log.phase = 'reading'
+        self.import_log.rows_total = sum(reader.row_count(sheet_name) for sheet_name in sheets)
+        self.import_log.rows_done = 0
+        if not self.import_log.started_at:
+            self.import_log.started_at = timezone.now()
+        self.import_log.heartbeat_at = timezone.now()
+        self.import_log.save(update_fields=['phase', 'rows_total', 'rows_done', 'started_at', 'heartbeat_at'])
+    
+    def _report_progress(self):
+        """Publish batch progress with a single UPDATE so polling clients see live counts"""
+        self.import_log.rows_done = sum(self.sheet_rows.values())
+        self.import_log.rows_total = max(self.import_log.rows_total, self.import_log.rows_done)
+        ImportLog.objects.filter(pk=self.import_log.pk).update(
+            phase='importing',
+            heartbeat_at=timezone.now(),
+            rows_done=self.import_log.rows_done,
+            rows_total=self.import_log.rows_total,
+            records_processed=self.records_processed,
+            records_created=self.records_created,
+            records_updated=self.records_updated,
+            records_skipped=self.records_skipped,
         )
-        
-        for index, row in df.iterrows():
-            if pd.isna(row.get('Item Number')) or pd.isna(row.get('Description')):
-                continue
-                
-            self.records_processed += 1
-            
+    
+    def _finish_progress(self):
+        self.import_log.phase = 'done'
+        self.import_log.finished_at = timezone.now()
+        self.import_log.items_after_import = EquipmentItem.objects.count()
+        if not self.dry_run:
+            # Bulk writes bypass the model signals, so invalidate cached item data here
+            bump_version(EQUIPMENT_ITEMS, BOM)
+        if self.import_log.status != 'failed':
+            # The row count is only an estimate until the sheet has been read
+            self.import_log.rows_total = self.import_log.rows_done
+    
+    # ----- Sheets -----
+    
+    @classmethod
+    def sheet_type_defaults(cls, sheet_name):
+        """Code and description of the equipment type a sheet's items are imported as"""
+        return {'code': cls.SHEETS[sheet_name].code, 'description': f'{sheet_name} Equipment'}
+    
+    def _sheet_equipment_type(self, sheet_name):
+        return self.lookups.equipment_type(sheet_name, **self.sheet_type_defaults(sheet_name))
+    
+    def _process_sheet(self, reader, sheet_name):
+        """Stream a sheet batch by batch: parse each batch and upsert it"""
+        for batch in self.parse_sheet(reader, sheet_name):
+            self._write_batch(sheet_name, batch)
+    
+    def _import_workbook(self, reader, sheets):
+        """
+        Parse the sheets in parallel worker processes and write their batches here,
+        in a single writer.
+        
+        Batches are written in sheet order (a later sheet's batches wait until the
+        earlier sheets are written) so items shared between sheets end up exactly as
+        they would after importing the sheets one by one. Each sheet has its own
+        bounded queue, so a worker that gets ahead of the writer blocks instead of
+        its batches piling up in memory.
+        """
+        workers = min(len(sheets), self.PARSE_WORKERS or os.cpu_count() or 1)
+        if workers <= 1:
+            for sheet_name in sheets:
+                self._process_sheet(reader, sheet_name)
+            return
+        
+        with multiprocessing.Manager() as manager:
+            queues = {sheet_name: manager.Queue(maxsize=self.QUEUED_BATCHES) for sheet_name in sheets}
+            with ProcessPoolExecutor(max_workers=workers, initializer=import_workers.init_worker) as pool:
+                # Submitted in sheet order, so the sheet being written has always been started
+                futures = {
+                    sheet_name: pool.submit(import_workers.parse_sheet, self.file_path, sheet_name,
+                                            self.READ_BATCH_SIZE, queues[sheet_name])
+                    for sheet_name in sheets
+                }
+                for sheet_name in sheets:
+                    self._write_queued_batches(sheet_name, queues[sheet_name], futures[sheet_name])
+    
+    def _write_queued_batches(self, sheet_name, batches, future):
+        """Write a sheet's batches as its worker queues them, until the worker is done"""
+        while True:
             try:
-                with transaction.atomic():
-                    equipment_item, created = self._create_pump_item(row, job, equipment_type)
-                    
-                    if created:
-                        self.records_created += 1
-                    else:
-                        self.records_updated += 1
-                        
-                    self._create_pump_specifications(row, equipment_item)
-                    
-            except Exception as e:
-                error_msg = f"Row {index + 1}: {str(e)}"
+                kind, _, payload = batches.get(timeout=1)
+            except queue.Empty:
+                # A worker that died can't report itself done
+                if future.done() and future.exception():
+                    self.errors.append(f"Sheet {sheet_name}: {future.exception()}")
+                    return
+                continue
+            if kind == 'batch':
+                self._write_batch(sheet_name, payload)
+            elif kind == 'error':
+                error_msg = f"Sheet {sheet_name}: {payload}"
                 self.errors.append(error_msg)
                 logger.error(error_msg)
+            else:
+                return
     
-    def _process_economizer_sheet(self, excel_file):
-        """Process Stack Economizer sheet"""
-        df = pd.read_excel(excel_file, sheet_name='Stack Economizer')
-        df = self._clean_dataframe(df)
-        
-        job_number = self._extract_job_number(df)
-        job, _ = Job.objects.get_or_create(
-            job_number=job_number,
-            defaults={
-                'description': f'Economizer Project {job_number}',
-                'created_by': self.user
-            }
-        )
-        
-        equipment_type, _ = EquipmentType.objects.get_or_create(
-            name='Stack Economizer',
-            defaults={'code': 'ECO', 'description': 'Stack Economizer Equipment'}
-        )
+    def parse_sheet(self, reader, sheet_name):
+        """
+        Yield a ``SheetBatch`` per row batch of a sheet.
+        
+        This only reads and transforms data, so it is safe to run in a worker process.
+        """
+        layout = self.SHEETS[sheet_name]
+        job_number = None
+        for df in self._read_batches(reader, sheet_name):
+            if job_number is None:
+                # Job details sit at the top of the sheet, so the first batch has them
+                job_number = self._extract_job_number(df)
+            rows = self._importable_rows(df)
+            items = specs = None
+            if not rows.empty:
+                items, specs = layout.transform(rows)
+            yield SheetBatch(job_number, items, specs, int(df.index[-1]) + 1, len(rows))
+    
+    def _write_batch(self, sheet_name, batch):
+        """Upsert one parsed batch (or diff it, on a dry run) and publish progress"""
+        self.records_processed += batch.processed
+        if batch.items is not None:
+            items, specs = self._prepare_items(batch.items, batch.specs)
+            items['import_fingerprint'] = self._fingerprints(items, specs, sheet_name, batch.job_number)
+            if self.dry_run:
+                self.change_set.add(sheet_name, batch.job_number, items, specs)
+            else:
+                job = self.lookups.job(batch.job_number, self.SHEETS[sheet_name].label)
+                self._upsert_items(items, specs, job, self._sheet_equipment_type(sheet_name))
+        self.sheet_rows[sheet_name] = batch.rows_read
+        self._report_progress()
+    
+    def apply_change_set(self):
+        """
+        Write a previewed import from the change set stored on its log: only the
+        rows the preview found new or changed are written, and the workbook isn't
+        read again.
+        """
+        try:
+            self.lookups = ImportLookups()
+            self.change_set = ChangeSet(self.import_log.change_set)
+            entries = self.change_set.inserts() + self.change_set.updates()
+            self.import_log.phase = 'importing'
+            self.import_log.rows_total = len(entries)
+            if not self.import_log.started_at:
+                self.import_log.started_at = timezone.now()
+            self.import_log.save(update_fields=['phase', 'rows_total', 'started_at'])
+            
+            for sheet_name, sheet in self.change_set.sheets.items():
+                sheet_entries = [entry for entry in entries if entry['sheet'] == sheet_name]
+                if not sheet_entries:
+                    continue
+                items = pd.DataFrame(
+                    [entry['values'] for entry in sheet_entries],
+                    index=[entry['row'] - 1 for entry in sheet_entries],
+                )
+                specs = pd.DataFrame(
+                    [
+                        {'item_number': entry['item_number'], 'spec_type': spec['spec_type'],
+                         'value': spec['value'], 'description': spec['description']}
+                        for entry in sheet_entries for spec in entry['specs']
+                    ],
+                    columns=SPEC_COLUMNS,
+                )
+                job = self.lookups.job(sheet['job_number'], self.SHEETS[sheet_name].label)
+                # The preview's diff already decided these rows change, so write them all
+                self._upsert_items(items, specs, job, self._sheet_equipment_type(sheet_name), skip_unchanged=False)
+                self.sheet_rows[sheet_name] = len(sheet_entries)
+                self._report_progress()
+            
+            self.import_log.records_created = self.records_created
+            self.import_log.records_updated = self.records_updated
+            self.import_log.records_skipped = self.records_skipped
+            self.import_log.errors = self.import_log.errors + self.errors
+            self.import_log.status = 'completed' if not self.import_log.errors else 'partial'
+            self._finish_progress()
+            self.import_log.save()
+            return True
         
-        for index, row in df.iterrows():
-            if pd.isna(row.get('Item Number')) or pd.isna(row.get('Description')):
+        except Exception as e:
+            logger.error(f"Import failed: {str(e)}")
+            self.import_log.status = 'failed'
+            self.import_log.errors.append(str(e))
+            self._finish_progress()
+            self.import_log.save()
+            return False
+    
+    def _read_batches(self, reader, sheet_name):
+        """Cleaned row batches of a sheet, keeping only sheets with item number and description columns"""
+        previous = None
+        for df in reader.iter_batches(sheet_name):
+            if 'Item Number' not in df.columns or 'Description' not in df.columns:
+                return
+            df = df.dropna(how='all')
+            if df.empty:
                 continue
-                
-            self.records_processed += 1
-            
-            try:
-                with transaction.atomic():
-                    equipment_item, created = self._create_economizer_item(row, job, equipment_type)
-                    
-                    if created:
-                        self.records_created += 1
-                    else:
-                        self.records_updated += 1
-                        
-                    self._create_economizer_specifications(row, equipment_item)
-                    
-            except Exception as e:
-                error_msg = f"Row {index + 1}: {str(e)}"
-                self.errors.append(error_msg)
-                logger.error(error_msg)
+            # Carry the previous batch's last (unfilled) row so the forward fill crosses batches
+            carried = previous
+            previous = df.iloc[-1:]
+            if carried is not None:
+                yield self._clean_dataframe(pd.concat([carried, df])).iloc[1:]
+            else:
+                yield self._clean_dataframe(df)
     
     def _clean_dataframe(self, df):
         """Clean and standardize dataframe"""
@@ -250,7 +383,7 @@ class ExcelBOMImporter:
         df = df.dropna(how='all')
         
         # Forward fill some columns for better data structure
-        df = df.fillna(method='ffill', limit=1)
+        df = df.ffill(limit=1)
         
         return df
     
@@ -272,343 +405,154 @@ class ExcelBOMImporter:
         
         return "UNKNOWN"
     
-    def _create_heater_item(self, row, job, equipment_type):
-        """Create heater equipment item from row data"""
-        item_number = str(row.get('Item Number', ''))
-        description = str(row.get('Description', ''))
-        
-        # Determine product type
-        product_type = 'Item'
-        if 'Sub Assy' in str(row.get('Product Type', '')):
-            product_type = 'Sub Assy'
-        elif 'FG FAB' in str(row.get('Product Type', '')):
-            product_type = 'FG FAB'
-        
-        # Determine supply type
-        supply_type = 'Item'
-        if 'Pegged Supply' in str(row.get('Unnamed: 6', '')):
-            supply_type = 'Pegged Supply'
-        elif 'Phantom' in str(row.get('Unnamed: 6', '')):
-            supply_type = 'Phantom'
-        
-        # Extract dimensions
-        diameter = self._safe_float(row.get(304))
-        height = self._safe_float(row.get(30))
-        length = self._safe_float(row.get(12))
-        width = self._safe_float(row.get(9.5))
-        thickness = self._safe_float(row.get(7))
-        
-        # Extract position
-        position = 'CENTER'
-        if 'LEFT' in str(row.get('LEFT', '')):
-            position = 'LEFT'
-        elif 'RIGHT' in str(row.get('RIGHT', '')):
-            position = 'RIGHT'
-        
-        # Get or create material
-        material_code = str(row.get('GP', ''))
-        if material_code and material_code != 'nan':
-            material, _ = Material.objects.get_or_create(
-                code=material_code,
-                defaults={
-                    'name': f'{material_code} Material',
-                    'material_type': material_code
-                }
-            )
-        else:
-            material = None
-        
-        # Create or update equipment item
-        equipment_item, created = EquipmentItem.objects.update_or_create(
-            item_number=item_number,
-            defaults={
-                'description': description,
-                'job': job,
-                'equipment_type': equipment_type,
-                'product_type': product_type,
-                'supply_type': supply_type,
-                'diameter': diameter,
-                'height': height,
-                'length': length,
-                'width': width,
-                'thickness': thickness,
-                'position': position,
-                'primary_material': material,
-                'created_by': self.user,
-            }
-        )
-        
-        return equipment_item, created
-    
-    def _create_tank_item(self, row, job, equipment_type):
-        """Create tank equipment item from row data"""
-        item_number = str(row.get('Item Number', ''))
-        description = str(row.get('Description', ''))
-        
-        product_type = 'Item'
-        if 'Sub Assy' in str(row.get('Product Type', '')):
-            product_type = 'Sub Assy'
-        
-        supply_type = 'Item'
-        if 'Phantom' in str(row.get('Unnamed: 6', '')):
-            supply_type = 'Phantom'
-        
-        # Extract dimensions
-        diameter = self._safe_float(row.get(304))
-        height = self._safe_float(row.get(48))
-        length = self._safe_float(row.get(3))
-        width = self._safe_float(row.get(36.25))
-        
-        # Get material
-        material_code = str(row.get('HW', ''))
-        if material_code and material_code != 'nan':
-            material, _ = Material.objects.get_or_create(
-                code=material_code,
-                defaults={
-                    'name': f'{material_code} Material',
-                    'material_type': material_code
-                }
-            )
-        else:
-            material = None
-        
-        equipment_item, created = EquipmentItem.objects.update_or_create(
-            item_number=item_number,
-            defaults={
-                'description': description,
-                'job': job,
-                'equipment_type': equipment_type,
-                'product_type': product_type,
-                'supply_type': supply_type,
-                'diameter': diameter,
-                'height': height,
-                'length': length,
-                'width': width,
-                'primary_material': material,
-                'created_by': self.user,
-            }
-        )
-        
-        return equipment_item, created
+    def _importable_rows(self, df):
+        """Rows with both an item number and a description"""
+        return df[column(df, 'Item Number').notna() & column(df, 'Description').notna()]
     
-    def _create_pump_item(self, row, job, equipment_type):
-        """Create pump equipment item from row data"""
-        item_number = str(row.get('Item Number', ''))
-        description = str(row.get('Description', ''))
-        
-        product_type = 'Item'
-        if 'Sub Assy' in str(row.get('Product Type', '')):
-            product_type = 'Sub Assy'
-        
-        supply_type = 'Item'
-        if 'Phantom' in str(row.get('Unnamed: 6', '')):
-            supply_type = 'Phantom'
+    def _validate_items(self, items):
+        """Drop rows that can't be saved, recording one error per row"""
+        problems = pd.Series('', index=items.index, dtype=object)
         
-        # Extract dimensions
-        diameter = self._safe_float(row.get(304))
-        height = self._safe_float(row.get(30))
-        length = self._safe_float(row.get(12))
-        width = self._safe_float(row.get(9.5))
-        thickness = self._safe_float(row.get(7))
+        problems[items['item_number'] == ''] += 'missing item number; '
+        max_length = EquipmentItem._meta.get_field('item_number').max_length
+        problems[items['item_number'].str.len() > max_length] += f'item number longer than {max_length} characters; '
         
-        # Get material
-        material_code = str(row.get('GP', ''))
-        if material_code and material_code != 'nan':
-            material, _ = Material.objects.get_or_create(
-                code=material_code,
-                defaults={
-                    'name': f'{material_code} Material',
-                    'material_type': material_code
-                }
-            )
-        else:
-            material = None
-        
-        equipment_item, created = EquipmentItem.objects.update_or_create(
-            item_number=item_number,
-            defaults={
-                'description': description,
-                'job': job,
-                'equipment_type': equipment_type,
-                'product_type': product_type,
-                'supply_type': supply_type,
-                'diameter': diameter,
-                'height': height,
-                'length': length,
-                'width': width,
-                'thickness': thickness,
-                'primary_material': material,
-                'created_by': self.user,
-            }
-        )
-        
-        return equipment_item, created
+        for name in items.columns:
+            try:
+                field = EquipmentItem._meta.get_field(name)
+            except Exception:
+                continue
+            if getattr(field, 'max_digits', None) is None:
+                continue
+            limit = 10 ** (field.max_digits - field.decimal_places)
+            problems[items[name].abs() >= limit] += f'{name} must be less than {limit}; '
+        
+        bad = problems != ''
+        for index, problem in problems[bad].items():
+            error_msg = f"Row {index + 1}: {problem.rstrip('; ')}"
+            self.errors.append(error_msg)
+            logger.error(error_msg)
+        return items[~bad]
     
-    def _create_economizer_item(self, row, job, equipment_type):
-        """Create economizer equipment item from row data"""
-        item_number = str(row.get('Item Number', ''))
-        description = str(row.get('Description', ''))
-        
-        product_type = 'Item'
-        if 'Sub Assy' in str(row.get('Product Type', '')):
-            product_type = 'Sub Assy'
-        elif 'FG FAB' in str(row.get('Product Type', '')):
-            product_type = 'FG FAB'
-        
-        supply_type = 'Item'
-        if 'Pegged Supply' in str(row.get('Unnamed: 6', '')):
-            supply_type = 'Pegged Supply'
-        elif 'Phantom' in str(row.get('Unnamed: 6', '')):
-            supply_type = 'Phantom'
-        
-        # Extract dimensions
-        diameter = self._safe_float(row.get(304))
-        height = self._safe_float(row.get(30))
-        length = self._safe_float(row.get(12))
-        width = self._safe_float(row.get(9.5))
-        thickness = self._safe_float(row.get(7))
-        
-        # Extract position
-        position = 'CENTER'
-        if 'LEFT' in str(row.get('LEFT', '')):
-            position = 'LEFT'
-        elif 'RIGHT' in str(row.get('RIGHT', '')):
-            position = 'RIGHT'
-        
-        # Get material
-        material_code = str(row.get('GP', ''))
-        if material_code and material_code != 'nan':
-            material, _ = Material.objects.get_or_create(
-                code=material_code,
-                defaults={
-                    'name': f'{material_code} Material',
-                    'material_type': material_code
-                }
-            )
-        else:
-            material = None
-        
-        equipment_item, created = EquipmentItem.objects.update_or_create(
-            item_number=item_number,
-            defaults={
-                'description': description,
-                'job': job,
-                'equipment_type': equipment_type,
-                'product_type': product_type,
-                'supply_type': supply_type,
-                'diameter': diameter,
-                'height': height,
-                'length': length,
-                'width': width,
-                'thickness': thickness,
-                'position': position,
-                'primary_material': material,
-                'created_by': self.user,
-            }
-        )
-        
-        return equipment_item, created
+    # ----- Bulk writes -----
     
-    def _create_heater_specifications(self, row, equipment_item):
-        """Create heater specifications from row data"""
-        # Extract various specifications
-        specs = [
-            ('Heater Diameter', str(row.get(42, '')),
-             'Heater Diameter specification'),
-            ('Heater Height', str(row.get(12, '')),
-             'Heater Height specification'),
-            ('Stack Diameter', str(row.get(18, '')),
-             'Stack Diameter specification'),
-            ('Gas Train Size', str(row.get(2, '')),
-             'Gas Train Size specification'),
-            ('Gas Train Mount', str(row.get('FM', '')),
-             'Gas Train Mount specification'),
-            ('Heater Model', str(row.get('RM', '')),
-             'Heater Model specification'),
-            ('Flange Inlet', str(row.get(2, '')),
-             'Flange Inlet specification'),
-        ]
-        
-        for spec_type, value, description in specs:
-            if value and value != 'nan':
-                Specification.objects.get_or_create(
-                    equipment_item=equipment_item,
-                    spec_type=spec_type,
-                    defaults={
-                        'value': value,
-                        'description': description
-                    }
-                )
+    def _prepare_items(self, items, specs):
+        """Drop invalid rows and keep the last row (and spec) per item number"""
+        items = self._validate_items(items)
+        # A repeated item number overwrites the earlier row, as sequential updates would
+        items = items[~items['item_number'].duplicated(keep='last')]
+        specs = specs[specs['item_number'].isin(items['item_number'])]
+        specs = specs[~specs.duplicated(['item_number', 'spec_type'], keep='last')]
+        return items, specs
     
-    def _create_tank_specifications(self, row, equipment_item):
-        """Create tank specifications from row data"""
-        specs = [
-            ('Tank Diameter', str(row.get(72, '')),
-             'Tank Diameter specification'),
-            ('Tank Height', str(row.get(12, '')),
-             'Tank Height specification'),
-            ('Type', str(row.get('HW', '')),
-             'Tank Type specification'),
-        ]
-        
-        for spec_type, value, description in specs:
-            if value and value != 'nan':
-                Specification.objects.get_or_create(
-                    equipment_item=equipment_item,
-                    spec_type=spec_type,
-                    defaults={
-                        'value': value,
-                        'description': description
-                    }
-                )
+    def _fingerprints(self, items, specs, sheet_name, job_number):
+        """
+        Stable hash per item row of everything the import writes for it: the item's
+        fields, its specifications, the sheet and the job
+        """
+        canonical = pd.DataFrame(index=items.index)
+        for name in items.columns:
+            values = items[name]
+            if pd.api.types.is_numeric_dtype(values):
+                # Same value, same text, whether this batch parsed the column as ints or floats
+                values = values.astype(float)
+            canonical[name] = values.astype(str).astype(object)
+        spec_text = (
+            specs.sort_values('spec_type')
+            .assign(pair=lambda df: df['spec_type'].astype(str) + '=' + df['value'].astype(str))
+            .groupby('item_number')['pair'].agg('|'.join)
+        )
+        canonical['specifications'] = items['item_number'].map(spec_text).fillna('').astype(object)
+        canonical['sheet'] = sheet_name
+        canonical['job'] = str(job_number)
+        hashes = pd.util.hash_pandas_object(canonical, index=False)
+        return hashes.map('{:016x}'.format).astype(object)
     
-    def _create_pump_specifications(self, row, equipment_item):
-        """Create pump specifications from row data"""
-        specs = [
-            ('HP', str(row.get(2, '')),
-             'Pump Horsepower specification'),
-            ('Type', str(row.get('HW', '')),
-             'Pump Type specification'),
-        ]
-        
-        for spec_type, value, description in specs:
-            if value and value != 'nan':
-                Specification.objects.get_or_create(
-                    equipment_item=equipment_item,
-                    spec_type=spec_type,
-                    defaults={
-                        'value': value,
-                        'description': description
-                    }
-                )
+    def _upsert_items(self, items, specs, job, equipment_type, skip_unchanged=True):
+        """
+        Write items and their specifications in chunked bulk upserts, skipping rows
+        whose import fingerprint matches the stored item's (unless ``skip_unchanged`` is off).
+        
+        A chunk that fails is written again row by row, so each bad row gets its own
+        error and the good rows of the chunk still land.
+        """
+        # NaN -> None so Django writes NULL
+        records = items.astype(object).where(items.notna(), None)
+        
+        for start in range(0, len(records), self.BATCH_SIZE):
+            chunk = records.iloc[start:start + self.BATCH_SIZE]
+            try:
+                self._write_items(chunk, specs, job, equipment_type, skip_unchanged)
+            except Exception:
+                for position in range(len(chunk)):
+                    row = chunk.iloc[position:position + 1]
+                    try:
+                        self._write_items(row, specs, job, equipment_type, skip_unchanged)
+                    except Exception as e:
+                        error_msg = f"Row {row.index[0] + 1}: {str(e)}"
+                        self.errors.append(error_msg)
+                        logger.error(error_msg)
     
-    def _create_economizer_specifications(self, row, equipment_item):
-        """Create economizer specifications from row data"""
-        specs = [
-            ('Stack Diameter', str(row.get(18, '')),
-             'Stack Diameter specification'),
-            ('Gas Train Size', str(row.get(2, '')),
-             'Gas Train Size specification'),
-            ('Gas Train Mount', str(row.get('FM', '')),
-             'Gas Train Mount specification'),
-        ]
+    def _write_items(self, chunk, specs, job, equipment_type, skip_unchanged):
+        """Upsert one chunk of item records and their specifications in one transaction"""
+        materials = self.lookups.materials_for(chunk.get('material_code', pd.Series(dtype=object)))
+        fields = [name for name in chunk.columns if name not in ('item_number', 'material_code')]
+        update_fields = fields + ['job', 'equipment_type', 'primary_material', 'updated_at']
+        numbers = chunk['item_number'].tolist()
+        with transaction.atomic():
+            stored = dict(
+                EquipmentItem.objects.filter(item_number__in=numbers).values_list('item_number', 'import_fingerprint')
+            )
+            if skip_unchanged and 'import_fingerprint' in chunk:
+                unchanged = chunk['import_fingerprint'] == chunk['item_number'].map(stored)
+                skipped = int(unchanged.sum())
+                chunk = chunk[~unchanged]
+                numbers = chunk['item_number'].tolist()
+            else:
+                skipped = 0
+            existing = set(numbers) & set(stored)
+            EquipmentItem.objects.bulk_create(
+                [
+                    EquipmentItem(
+                        item_number=row['item_number'],
+                        job=job,
+                        equipment_type=equipment_type,
+                        primary_material=materials.get(row.get('material_code')),
+                        created_by=self.user,
+                        **{name: row[name] for name in fields},
+                    )
+                    for row in chunk.to_dict('records')
+                ],
+                update_conflicts=True,
+                unique_fields=['item_number'],
+                update_fields=update_fields,
+            )
+            item_ids = dict(
+                EquipmentItem.objects.filter(item_number__in=numbers).values_list('item_number', 'id')
+            )
+            self._upsert_specifications(specs[specs['item_number'].isin(numbers)], item_ids)
         
-        for spec_type, value, description in specs:
-            if value and value != 'nan':
-                Specification.objects.get_or_create(
-                    equipment_item=equipment_item,
-                    spec_type=spec_type,
-                    defaults={
-                        'value': value,
-                        'description': description
-                    }
-                )
+        self.records_created += len(numbers) - len(existing)
+        self.records_updated += len(existing)
+        self.records_skipped += skipped
     
-    def _safe_float(self, value):
-        """Safely convert value to float"""
-        try:
-            if pd.isna(value):
-                return None
-            return float(value)
-        except (ValueError, TypeError):
-            return None
+    def _upsert_specifications(self, specs, item_ids):
+        """Insert missing specifications and update changed values"""
+        existing = {
+            (spec.equipment_item_id, spec.spec_type): spec
+            for spec in Specification.objects.filter(equipment_item_id__in=item_ids.values())
+        }
+        to_create = []
+        to_update = []
+        for item_number, spec_type, value, description in specs.itertuples(index=False):
+            item_id = item_ids[item_number]
+            spec = existing.get((item_id, spec_type))
+            if spec is None:
+                to_create.append(Specification(
+                    equipment_item_id=item_id, spec_type=spec_type, value=value, description=description
+                ))
+            elif spec.value != value:
+                spec.value = value
+                to_update.append(spec)
+        Specification.objects.bulk_create(to_create, batch_size=self.BATCH_SIZE)
+        Specification.objects.bulk_update(to_update, ['value'], batch_size=self.BATCH_SIZE)
@@ -0,0 +1,140 @@
+import hashlib
+import zipfile
+from xml.etree import ElementTree
+
+import pandas as pd
+from openpyxl import load_workbook
+
+
+# Strings pandas.read_excel treats as missing by default
+NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+def workbook_sheet_names(file_path):
+    """
+    Sheet names of a workbook.
+
+    For .xlsx files only the workbook manifest (xl/workbook.xml) is read, so no
+    worksheet, shared string or style data is parsed.
+    """
+    if not zipfile.is_zipfile(file_path):
+        return pd.ExcelFile(file_path).sheet_names
+    with zipfile.ZipFile(file_path) as archive:
+        root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in root.iter(f'{SPREADSHEET_NS}sheet')]
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StreamingExcelReader:
+    """
+    Reads a worksheet as a sequence of DataFrame batches with bounded memory.
+
+    Batches follow ``pd.read_excel`` conventions: the first row is the header (blank
+    headers become ``Unnamed: N``, integral floats become ints), the index is the
+    row's position in the full sheet, and the usual NA strings are read as missing.
+    """
+
+    def __init__(self, file_path, batch_size=1000):
+        self.file_path = file_path
+        self.batch_size = batch_size
+
+    @property
+    def sheet_names(self):
+        return workbook_sheet_names(self.file_path)
+
+    def iter_batches(self, sheet_name):
+        if not zipfile.is_zipfile(self.file_path):
+            # Legacy .xls files can't be streamed; read once and slice
+            yield from self._iter_dataframe_batches(sheet_name)
+            return
+
+        workbook = load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            if sheet_name not in workbook.sheetnames:
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+            worksheet = workbook[sheet_name]
+            # Saved dimensions can be stale; read every row that is actually there
+            worksheet.reset_dimensions()
+
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = self._header(header)
+
+            batch = []
+            start = 0
+            for row in rows:
+                batch.append([self._convert(value) for value in row])
+                if len(batch) >= self.batch_size:
+                    yield self._frame(batch, columns, start)
+                    start += len(batch)
+                    batch = []
+            if batch:
+                yield self._frame(batch, columns, start)
+        finally:
+            workbook.close()
+
+    def row_count(self, sheet_name):
+        """
+        Estimated number of data rows in a sheet, taken from the dimension the workbook
+        was saved with (no rows are read). Returns 0 if the sheet doesn't record one.
+        """
+        if not zipfile.is_zipfile(self.file_path):
+            return len(pd.read_excel(self.file_path, sheet_name=sheet_name, usecols=[0]))
+        workbook = load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            if sheet_name not in workbook.sheetnames:
+                return 0
+            max_row = workbook[sheet_name].max_row
+            return max(0, (max_row or 0) - 1)
+        finally:
+            workbook.close()
+
+    def _iter_dataframe_batches(self, sheet_name):
+        df = pd.read_excel(self.file_path, sheet_name=sheet_name)
+        for start in range(0, len(df), self.batch_size):
+            yield df.iloc[start:start + self.batch_size]
+
+    def _header(self, header):
+        columns = []
+        seen = {}
+        for position, value in enumerate(header):
+            value = self._convert(value)
+            name = f'Unnamed: {position}' if value is None else value
+            # Mangle duplicates the way pandas does: X, X.1, X.2
+            if name in seen:
+                seen[name] += 1
+                name = f'{name}.{seen[name]}'
+            else:
+                seen[name] = 0
+            columns.append(name)
+        return columns
+
+    def _convert(self, value):
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip() in NA_STRINGS:
+            return None
+        return value
+
+    def _frame(self, batch, columns, start):
+        width = max(len(columns), max(len(row) for row in batch))
+        names = columns + [f'Unnamed: {position}' for position in range(len(columns), width)]
+        rows = [row + [None] * (width - len(row)) for row in batch]
+        # Object dtype keeps each cell as read, so a column's values don't change type
+        # depending on whether this particular batch happens to contain a blank cell
+        return pd.DataFrame(rows, columns=names, index=pd.RangeIndex(start, start + len(rows)), dtype=object)
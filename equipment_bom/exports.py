@@ -0,0 +1,100 @@
+"""
+Streaming equipment exports.
+
+Items are read with ``.iterator()`` in chunks and each chunk is turned into a
+wide frame with its specifications pivoted into columns (one query per chunk, see
+``spec_pivot``), so memory stays bounded by the chunk size rather than the size
+of the export. Excel files go through openpyxl's write-only mode into a spooled
+temporary file; CSV rows are streamed straight to the response.
+"""
+import csv
+import tempfile
+from itertools import islice
+
+from django.db.models import Min
+from openpyxl import Workbook
+
+from .models import EquipmentItem, Specification
+from .spec_pivot import item_frame
+
+
+# Items (and their prefetched specifications) loaded per query
+EXPORT_CHUNK_SIZE = 2000
+# Excel exports stay in memory up to this size, then spill to disk
+SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+# (header, item field) of the columns before the specification columns
+BASE_COLUMNS = [
+    ('Item Number', 'item_number'),
+    ('Description', 'description'),
+    ('Job Number', 'job__job_number'),
+    ('Product Type', 'product_type'),
+    ('Supply Type', 'supply_type'),
+    ('Diameter', 'diameter'),
+    ('Height', 'height'),
+    ('Length', 'length'),
+    ('Width', 'width'),
+    ('Thickness', 'thickness'),
+    ('Position', 'position'),
+    ('Material', 'primary_material__code'),
+    ('Status', 'status'),
+]
+
+
+def export_spec_types(equipment_type):
+    """Specification columns of an export, in order of first appearance"""
+    return list(
+        Specification.objects.filter(equipment_item__equipment_type=equipment_type)
+        .values('spec_type')
+        .annotate(first_item=Min('equipment_item__item_number'), first_id=Min('id'))
+        .order_by('first_item', 'first_id')
+        .values_list('spec_type', flat=True)
+    )
+
+
+def export_rows(equipment_type, chunk_size=EXPORT_CHUNK_SIZE):
+    """Header and a lazy iterator of value rows for an equipment type's items"""
+    spec_types = export_spec_types(equipment_type)
+    header = [name for name, _ in BASE_COLUMNS] + spec_types
+
+    def rows():
+        items = (
+            EquipmentItem.objects.filter(equipment_type=equipment_type)
+            .values_list('id', *[field for _, field in BASE_COLUMNS])
+            .iterator(chunk_size=chunk_size)
+        )
+        while chunk := list(islice(items, chunk_size)):
+            frame = item_frame(chunk, BASE_COLUMNS, spec_types)
+            frame['Material'] = frame['Material'].fillna('')
+            yield from frame.itertuples(index=False, name=None)
+
+    return header, rows()
+
+
+def write_xlsx(sheet_name, header, rows):
+    """Write rows to a write-only workbook in a spooled temp file, rewound for reading"""
+    workbook = Workbook(write_only=True)
+    # Excel limits sheet titles to 31 characters
+    worksheet = workbook.create_sheet(title=sheet_name[:31])
+    worksheet.append(header)
+    for row in rows:
+        worksheet.append(row)
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+class Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
@@ -0,0 +1,103 @@
+"""
+Faceted navigation for the equipment list.
+
+Each facet's counts come from one grouped query over the search-filtered items,
+narrowed by the selections in all *other* facets, so the work grows with the
+number of distinct values of a facet rather than with the number of items. The
+total for the paginator is read off the first facet's counts.
+"""
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.utils.functional import cached_property
+
+from .models import EquipmentItem
+
+
+class Facet:
+    """A filterable column of ``EquipmentItem`` and how its values are labelled"""
+
+    def __init__(self, param, label, field, label_field=None):
+        self.param = param
+        self.label = label
+        self.field = field
+        self.label_field = label_field
+        self.choices = {} if label_field else dict(EquipmentItem._meta.get_field(field).choices)
+
+    def value_label(self, row):
+        if self.label_field:
+            return row[self.label_field]
+        return self.choices.get(row[self.field], row[self.field])
+
+    def clean(self, value):
+        """Selected value from the query string ('' when absent or not a valid id)"""
+        if self.label_field and not value.isdigit():
+            return ''
+        return value
+
+
+FACETS = [
+    Facet('type', 'Equipment Type', 'equipment_type_id', 'equipment_type__name'),
+    Facet('status', 'Status', 'status'),
+    Facet('product_type', 'Product Type', 'product_type'),
+    Facet('supply_type', 'Supply Type', 'supply_type'),
+    Facet('material', 'Material', 'primary_material_id', 'primary_material__code'),
+    Facet('job', 'Job', 'job_id', 'job__job_number'),
+]
+
+
+class FacetedPaginator(Paginator):
+    """Paginator with a known object count, so it doesn't run its own COUNT(*)"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count
+
+
+class FacetedSearch:
+    """Facet selections from a request's query string, applied to an item queryset"""
+
+    def __init__(self, queryset, params):
+        self.queryset = queryset
+        self.selected = {facet.param: facet.clean(params.get(facet.param, '')) for facet in FACETS}
+
+    def _selections(self, skip=None):
+        return {
+            facet.field: self.selected[facet.param]
+            for facet in FACETS if facet is not skip and self.selected[facet.param]
+        }
+
+    def _facet_rows(self, facet):
+        """Item counts per value of one facet, honouring the selections in every other facet"""
+        columns = [facet.field] + ([facet.label_field] if facet.label_field else [])
+        return self.queryset.filter(**self._selections(skip=facet)).order_by().values(*columns).annotate(count=Count('pk'))
+
+    def counts(self):
+        """Facet options with counts, and the number of items matching every selection"""
+        facets = []
+        total = None
+        for facet in FACETS:
+            rows = list(self._facet_rows(facet))
+            selected = self.selected[facet.param]
+            if total is None:
+                # Narrowing the first facet's counts to its own selection gives the total
+                total = sum(row['count'] for row in rows if not selected or str(row[facet.field]) == selected)
+            options = [
+                {'value': str(row[facet.field]), 'label': facet.value_label(row), 'count': row['count']}
+                for row in rows if row[facet.field] not in (None, '')
+            ]
+            facets.append({
+                'param': facet.param,
+                'label': facet.label,
+                'selected': selected,
+                'options': sorted(options, key=lambda option: str(option['label'])),
+            })
+        return facets, total
+
+    def filtered(self):
+        """The queryset narrowed to every selected facet value"""
+        return self.queryset.filter(**self._selections())
+
@@ -0,0 +1,174 @@
+"""
+Database-backed queue for Excel BOM imports.
+
+Uploads are stored under ``MEDIA_ROOT/imports`` and recorded as a queued
+``ImportLog``; the ``process_imports`` management command claims queued logs one
+at a time and runs the importer, which reports its progress on the same row.
+Dry runs store a change set on the log instead of writing; applying one queues
+the log again and the worker writes the stored changes.
+No broker is needed: the ``ImportLog`` table is the queue.
+
+The worker refreshes ``heartbeat_at`` while it runs an import. If it dies mid-import,
+the next worker pass finds the stale heartbeat and queues the import again, or marks
+it failed after ``MAX_IMPORT_ATTEMPTS``, so it never stays in progress for good.
+"""
+import datetime
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .excel_importer import ExcelBOMImporter
+from .models import EquipmentType, ImportLog
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = 'imports'
+# An in-progress import without a heartbeat for this long has lost its worker
+STALE_IMPORT_AFTER = datetime.timedelta(minutes=10)
+MAX_IMPORT_ATTEMPTS = 2
+
+
+def enqueue_import(uploaded_file, user, equipment_type_name, dry_run=False):
+    """Store an uploaded workbook and queue it for the import worker"""
+    equipment_type = None
+    if equipment_type_name in ExcelBOMImporter.SHEETS:
+        # The type the importer writes the sheet's items with, coded from its layout
+        equipment_type, _ = EquipmentType.objects.get_or_create(
+            name=equipment_type_name,
+            defaults=ExcelBOMImporter.sheet_type_defaults(equipment_type_name),
+        )
+    elif equipment_type_name != ExcelBOMImporter.WHOLE_WORKBOOK:
+        raise ValueError(f"Unknown equipment type: {equipment_type_name}")
+
+    file_name = get_valid_filename(os.path.basename(uploaded_file.name))
+    file_path = os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR, f'{uuid.uuid4().hex}_{file_name}')
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'wb+') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    return ImportLog.objects.create(
+        file_name=file_name,
+        file_path=file_path,
+        imported_by=user,
+        equipment_type=equipment_type,
+        status='queued',
+        phase='queued',
+        dry_run=dry_run,
+    )
+
+
+def queue_preview_apply(import_log):
+    """Queue a previewed import so the worker writes its stored change set"""
+    return bool(ImportLog.objects.filter(pk=import_log.pk, status='preview', change_set__isnull=False).update(
+        status='queued', phase='queued', dry_run=False,
+        rows_done=0, rows_total=0, started_at=None, finished_at=None, heartbeat_at=None, attempts=0,
+    ))
+
+
+def claim_next_import():
+    """
+    Claim the oldest queued import, or return None if the queue is empty.
+
+    The claim is a conditional UPDATE on the queued status, so when several workers
+    race for the same log only one of them gets it.
+    """
+    for log_id in ImportLog.objects.filter(status='queued').order_by('import_date', 'pk').values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = ImportLog.objects.filter(pk=log_id, status='queued').update(
+            status='in_progress', phase='reading', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return ImportLog.objects.select_related('imported_by', 'equipment_type').get(pk=log_id)
+    return None
+
+
+def recover_stale_imports(stale_after=STALE_IMPORT_AFTER):
+    """
+    Queue again the in-progress imports whose worker stopped sending heartbeats, or
+    mark them failed once they have used their attempts (or lost their upload).
+    Returns the number of imports recovered.
+    """
+    now = timezone.now()
+    recovered = 0
+    for import_log in ImportLog.objects.filter(status='in_progress', heartbeat_at__lt=now - stale_after):
+        # Applied previews write their stored change set, not the upload
+        has_input = (import_log.change_set and not import_log.dry_run) or os.path.exists(import_log.file_path)
+        if import_log.attempts < MAX_IMPORT_ATTEMPTS and has_input:
+            changes = {
+                'status': 'queued', 'phase': 'queued', 'rows_done': 0,
+                'started_at': None, 'heartbeat_at': None,
+            }
+        else:
+            changes = {
+                'status': 'failed', 'phase': 'done', 'finished_at': now,
+                'errors': import_log.errors + ['The import worker stopped before the import finished'],
+            }
+        # Conditional on the heartbeat, in case the worker was only slow and has reported since
+        if not ImportLog.objects.filter(
+            pk=import_log.pk, status='in_progress', heartbeat_at=import_log.heartbeat_at
+        ).update(**changes):
+            continue
+        recovered += 1
+        if changes['status'] == 'queued':
+            logger.warning(f"Requeued import {import_log.pk}: its worker stopped")
+        else:
+            logger.warning(f"Failed import {import_log.pk}: its worker stopped")
+            if import_log.file_path and os.path.exists(import_log.file_path):
+                os.remove(import_log.file_path)
+    return recovered
+
+
+def run_import(import_log):
+    """Run a claimed import and remove its stored upload afterwards"""
+    importer = ExcelBOMImporter(
+        import_log.file_path,
+        import_log.imported_by,
+        import_log.equipment_type.name if import_log.equipment_type else ExcelBOMImporter.WHOLE_WORKBOOK,
+        import_log=import_log,
+        dry_run=import_log.dry_run,
+    )
+    try:
+        if import_log.change_set and not import_log.dry_run:
+            # An applied preview: write the stored change set, not the workbook
+            return importer.apply_change_set()
+        return importer.import_excel()
+    finally:
+        if import_log.file_path and os.path.exists(import_log.file_path):
+            os.remove(import_log.file_path)
+
+
+def process_queue(limit=None):
+    """Run queued imports until the queue is empty (or ``limit`` imports have run)"""
+    recover_stale_imports()
+    processed = 0
+    while limit is None or processed < limit:
+        import_log = claim_next_import()
+        if import_log is None:
+            break
+        logger.info(f"Processing import {import_log.pk}: {import_log.file_name}")
+        run_import(import_log)
+        processed += 1
+    return processed
+
+
+def import_progress(import_log):
+    """Progress payload for polling clients"""
+    return {
+        'id': import_log.pk,
+        'status': import_log.status,
+        'phase': import_log.phase,
+        'rows_done': import_log.rows_done,
+        'rows_total': import_log.rows_total,
+        'percent': import_log.progress_percent,
+        'rows_per_second': import_log.rows_per_second,
+        'records_created': import_log.records_created,
+        'records_updated': import_log.records_updated,
+        'records_skipped': import_log.records_skipped,
+        'errors': len(import_log.errors),
+        'finished': import_log.is_finished,
+    }
@@ -0,0 +1,50 @@
+from .models import EquipmentType, Job, Material
+
+
+class ImportLookups:
+    """
+    Import-scoped identity map for the lookup tables imported rows point at.
+
+    Existing equipment types, jobs and materials are loaded once, with one query
+    each; missing ones are created in a single bulk insert per request and from
+    then on every foreign key is resolved from memory.
+    """
+
+    def __init__(self):
+        self.equipment_types = {t.name: t for t in EquipmentType.objects.all()}
+        self.jobs = {j.job_number: j for j in Job.objects.only('id', 'job_number')}
+        self.materials = {m.code: m for m in Material.objects.only('id', 'code')}
+
+    def equipment_type(self, name, code, description=''):
+        """Equipment type by name, created with ``code`` if it doesn't exist yet"""
+        self._create_missing(EquipmentType, 'name', self.equipment_types, {
+            name: {'code': code, 'description': description},
+        })
+        return self.equipment_types[name]
+
+    def job(self, job_number, label):
+        self._create_missing(Job, 'job_number', self.jobs, {
+            job_number: {'description': f'{label} Project {job_number}'},
+        })
+        return self.jobs[job_number]
+
+    def materials_for(self, codes):
+        """Material per distinct code (blank codes are skipped)"""
+        codes = [code for code in dict.fromkeys(codes) if code]
+        self._create_missing(Material, 'code', self.materials, {
+            code: {'name': f'{code} Material', 'material_type': code} for code in codes
+        })
+        return {code: self.materials[code] for code in codes}
+
+    def _create_missing(self, model, key_field, cache, defaults):
+        """Bulk-create the keys in ``defaults`` that aren't cached and cache the saved rows"""
+        missing = {key: values for key, values in defaults.items() if key not in cache}
+        if not missing:
+            return
+        # Conflicts mean another import created the row meanwhile; the re-read picks it up
+        model.objects.bulk_create(
+            [model(**{key_field: key}, **values) for key, values in missing.items()],
+            ignore_conflicts=True,
+        )
+        for obj in model.objects.filter(**{f'{key_field}__in': list(missing)}):
+            cache[getattr(obj, key_field)] = obj
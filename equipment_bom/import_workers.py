@@ -0,0 +1,28 @@
+"""
+Entry points for the worker processes of whole-workbook imports.
+
+Workers only parse: they read their sheet and put each parsed batch on the
+sheet's bounded queue for the importer, which is the single writer. Django is imported lazily so
+this module can be loaded by freshly spawned interpreters before ``django.setup()``.
+"""
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def parse_sheet(file_path, sheet_name, batch_size, batches):
+    """Parse one sheet, sending ``('batch' | 'error' | 'done', sheet_name, payload)`` messages"""
+    from .excel_importer import ExcelBOMImporter
+    from .excel_reader import StreamingExcelReader
+
+    try:
+        parser = ExcelBOMImporter(file_path, None, sheet_name)
+        reader = StreamingExcelReader(file_path, batch_size=batch_size)
+        for batch in parser.parse_sheet(reader, sheet_name):
+            batches.put(('batch', sheet_name, batch))
+    except Exception as e:
+        batches.put(('error', sheet_name, str(e)))
+    finally:
+        batches.put(('done', sheet_name, None))
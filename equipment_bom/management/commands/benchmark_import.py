@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from equipment_bom.benchmark import DEFAULT_SIZES, SAMPLE_WORKBOOK, benchmark_sheet, environment, synthetic_workbook
+from equipment_bom.excel_importer import ExcelBOMImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark imports and exports on synthetic workbooks of each equipment type, '
+        'against a scratch database, and print the results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=DEFAULT_SIZES,
+            help='Workbook sizes (item rows) to benchmark'
+        )
+        parser.add_argument(
+            '--types',
+            nargs='+',
+            default=list(ExcelBOMImporter.SHEETS),
+            help='Equipment sheets to benchmark'
+        )
+        parser.add_argument(
+            '--source',
+            default=SAMPLE_WORKBOOK,
+            help='Workbook whose item rows are repeated to build the synthetic workbooks'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the JSON results to this file instead of stdout'
+        )
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options['types'] if name not in ExcelBOMImporter.SHEETS]
+        if unknown:
+            raise CommandError(f"Unknown equipment types: {', '.join(unknown)}")
+
+        results = {'environment': environment(), 'runs': []}
+        # The test database machinery gives a throwaway database on the configured backend
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as work_dir:
+                for rows in options['rows']:
+                    for sheet_name in options['types']:
+                        self.stderr.write(f'{sheet_name}: {rows} rows...')
+                        results['runs'].append(self.run(work_dir, sheet_name, rows, options['source']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results['runs'])} benchmark run(s) to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def run(self, work_dir, sheet_name, rows, source):
+        """One benchmark on an emptied database"""
+        call_command('flush', interactive=False, verbosity=0)
+        call_command('setup_equipment_bom', stdout=StringIO())
+        user = User.objects.create_user('benchmark')
+
+        file_path = os.path.join(work_dir, f'{sheet_name}_{rows}.xlsx')
+        file_size = synthetic_workbook(file_path, sheet_name, rows, source)
+        try:
+            result = benchmark_sheet(file_path, sheet_name, user)
+        finally:
+            os.remove(file_path)
+        return {
+            'equipment_type': sheet_name,
+            'rows': rows,
+            'workbook_mb': round(file_size / (1024 * 1024), 2),
+            **result,
+        }
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from equipment_bom.import_jobs import process_queue
+
+
+class Command(BaseCommand):
+    help = 'Run queued Excel BOM imports (polls the ImportLog table; no message broker needed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the imports that are currently queued, then exit'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between checks when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = process_queue()
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} queued import(s)'))
+            return
+
+        self.stdout.write(f"Waiting for queued imports (polling every {options['poll_interval']}s)...")
+        try:
+            while True:
+                close_old_connections()
+                processed = process_queue()
+                if processed:
+                    self.stdout.write(self.style.SUCCESS(f'Processed {processed} queued import(s)'))
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Import worker stopped')
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_bom', '0002_equipmentitem_capacity_equipmentitem_economizer_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='file_path',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='phase',
+            field=models.CharField(choices=[('queued', 'Queued'), ('reading', 'Reading Workbook'), ('importing', 'Importing Rows'), ('done', 'Done')], default='done', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='rows_done',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='rows_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='importlog',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('failed', 'Failed'), ('partial', 'Partial Success')], default='in_progress', max_length=50),
+        ),
+    ]
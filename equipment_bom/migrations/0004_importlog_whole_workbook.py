@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_bom', '0003_importlog_progress'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importlog',
+            name='equipment_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='equipment_bom.equipmenttype'),
+        ),
+    ]
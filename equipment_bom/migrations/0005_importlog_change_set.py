@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_bom', '0004_importlog_whole_workbook'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='change_set',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='dry_run',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='importlog',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('in_progress', 'In Progress'), ('preview', 'Preview Ready'), ('completed', 'Completed'), ('failed', 'Failed'), ('partial', 'Partial Success')], default='in_progress', max_length=50),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_bom', '0005_importlog_change_set'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentitem',
+            name='import_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='equipment_bom.importlog'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='items_after_import',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='records_skipped',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:57
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_bom', '0006_import_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bomcomponent',
+            name='quantity',
+            field=models.DecimalField(decimal_places=3, default=1, max_digits=10, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_bom', '0007_bomcomponent_quantity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipmentitem',
+            index=models.Index(fields=['equipment_type', 'status', 'item_number'], name='equipment_b_equipme_512055_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentitem',
+            index=models.Index(fields=['status', 'item_number'], name='equipment_b_status_654570_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentitem',
+            index=models.Index(fields=['job', 'status'], name='equipment_b_job_id_778401_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentitem',
+            index=models.Index(fields=['product_type', 'supply_type'], name='equipment_b_product_edf4c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentitem',
+            index=models.Index(fields=['primary_material', 'status'], name='equipment_b_primary_b26acd_idx'),
+        ),
+    ]
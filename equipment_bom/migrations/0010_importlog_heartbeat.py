@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment_bom', '0009_create_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
+from django.utils import timezone
 import uuid
 
 class EquipmentType(models.Model):
@@ -163,11 +164,27 @@ class EquipmentItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Hash of the sheet row this item was last imported from; re-imports skip rows whose hash is unchanged
+    import_fingerprint = models.CharField(max_length=32, blank=True, editable=False)
+    
     class Meta:
         ordering = ['item_number']
+        # Common equipment list filter combinations (see facets.py)
+        indexes = [
+            models.Index(fields=['equipment_type', 'status', 'item_number']),
+            models.Index(fields=['status', 'item_number']),
+            models.Index(fields=['job', 'status']),
+            models.Index(fields=['product_type', 'supply_type']),
+            models.Index(fields=['primary_material', 'status']),
+        ]
     
     def __str__(self):
         return f"{self.item_number}: {self.description}"
+    
+    def save(self, *args, **kwargs):
+        # Edited outside an import, so the next import must write the row again
+        self.import_fingerprint = ''
+        super().save(*args, **kwargs)
 
 class BOMComponent(models.Model):
     """Individual components within a BOM"""
@@ -193,6 +210,9 @@ class BOMComponent(models.Model):
     width = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     thickness = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
+    # Quantity per parent item; a component whose number is another item's item_number is a sub-assembly
+    quantity = models.DecimalField(max_digits=10, decimal_places=3, default=1, validators=[MinValueValidator(0)])
+    
     # Material specifications
     material = models.ForeignKey(Material, on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -263,20 +283,75 @@ class ImportLog(models.Model):
     file_name = models.CharField(max_length=255)
     imported_by = models.ForeignKey(User, on_delete=models.CASCADE)
     import_date = models.DateTimeField(auto_now_add=True)
-    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE)
+    # Empty for whole-workbook imports, which cover every equipment sheet
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE, null=True, blank=True)
     records_processed = models.IntegerField(default=0)
     records_created = models.IntegerField(default=0)
     records_updated = models.IntegerField(default=0)
     errors = models.JSONField(default=list, blank=True)
     status = models.CharField(max_length=50, choices=[
+        ('queued', 'Queued'),
         ('in_progress', 'In Progress'),
+        ('preview', 'Preview Ready'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
         ('partial', 'Partial Success'),
     ], default='in_progress')
     
+    # Background processing (see equipment_bom.import_jobs)
+    file_path = models.CharField(max_length=500, blank=True)
+    phase = models.CharField(max_length=20, choices=[
+        ('queued', 'Queued'),
+        ('reading', 'Reading Workbook'),
+        ('importing', 'Importing Rows'),
+        ('done', 'Done'),
+    ], default='done')
+    rows_total = models.IntegerField(default=0)
+    rows_done = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while it runs the import; a stale one means the worker died
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    
+    # Dry runs store the diff they computed; applying the preview writes only its changes
+    dry_run = models.BooleanField(default=False)
+    change_set = models.JSONField(null=True, blank=True)
+    
+    # Re-imports: identical files short-circuit to the earlier import, unchanged rows are skipped
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
+    records_skipped = models.IntegerField(default=0)
+    # Equipment items in the database when the import finished (detects deletions since)
+    items_after_import = models.IntegerField(null=True, blank=True)
+    
     class Meta:
         ordering = ['-import_date']
     
     def __str__(self):
         return f"Import {self.file_name} - {self.import_date.strftime('%Y-%m-%d %H:%M')}"
+    
+    @property
+    def is_finished(self):
+        return self.status not in ('queued', 'in_progress')
+    
+    @property
+    def can_apply_preview(self):
+        return self.status == 'preview' and bool(self.change_set)
+    
+    @property
+    def progress_percent(self):
+        if self.is_finished:
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(100, round(self.rows_done / self.rows_total * 100))
+    
+    @property
+    def rows_per_second(self):
+        """Import throughput so far (or overall, once finished)"""
+        if not self.started_at:
+            return 0
+        end = self.finished_at or timezone.now()
+        elapsed = (end - self.started_at).total_seconds()
+        return round(self.rows_done / elapsed, 1) if elapsed > 0 else 0
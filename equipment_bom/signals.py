@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import BOMComponent, EquipmentItem, EquipmentType, Material, Specification
+from .versions import BOM, EQUIPMENT_ITEMS, bump_version
+
+
+@receiver([post_save, post_delete], sender=EquipmentItem)
+def equipment_item_changed(sender, **kwargs):
+    bump_version(EQUIPMENT_ITEMS, BOM)
+
+
+@receiver([post_save, post_delete], sender=Specification)
+def specification_changed(sender, instance, **kwargs):
+    # Edited outside an import (which writes specifications in bulk, without signals):
+    # like an item edit, the item's row must be written again by the next import, and an
+    # identical re-upload must not short-circuit past it
+    EquipmentItem.objects.filter(pk=instance.equipment_item_id).update(
+        import_fingerprint='', updated_at=timezone.now()
+    )
+
+
+@receiver([post_save, post_delete], sender=BOMComponent)
+def bom_component_changed(sender, **kwargs):
+    bump_version(BOM)
+
+
+@receiver([post_save, post_delete], sender=EquipmentType)
+def equipment_type_changed(sender, **kwargs):
+    # Type names are part of the aggregates and explosions
+    bump_version(EQUIPMENT_ITEMS, BOM)
+
+
+@receiver([post_save, post_delete], sender=Material)
+def material_changed(sender, **kwargs):
+    bump_version(BOM)
@@ -0,0 +1,71 @@
+"""
+Wide specification frames.
+
+``Specification`` rows are entity-attribute-value records. ``pivot_specifications``
+reads the specifications of a set of items with one ordered query and pivots them
+with pandas into one row per item and one column per spec type; ``item_frame``
+joins that onto item columns. Exports and the item comparison view are built on
+the same frame.
+"""
+import pandas as pd
+
+from .models import EquipmentItem, Specification
+
+
+def pivot_specifications(items, spec_types=None):
+    """
+    Specification values of ``items`` (a queryset or item ids), one row per item id
+    and one column per spec type. Columns follow ``spec_types`` when given,
+    otherwise the order in which spec types first appear by item number. Items
+    without specifications are missing from the index.
+    """
+    records = (
+        Specification.objects.filter(equipment_item__in=items)
+        .order_by('equipment_item__item_number', 'id')
+        .values_list('equipment_item_id', 'spec_type', 'value')
+    )
+    specs = pd.DataFrame.from_records(list(records), columns=['item_id', 'spec_type', 'value'])
+    if spec_types is None:
+        spec_types = list(pd.unique(specs['spec_type']))
+    if specs.empty:
+        return pd.DataFrame(index=pd.Index([], name='item_id'), columns=spec_types, dtype=object)
+    # A repeated spec type keeps its latest value
+    specs = specs.drop_duplicates(['item_id', 'spec_type'], keep='last')
+    return specs.pivot(index='item_id', columns='spec_type', values='value').reindex(columns=spec_types)
+
+
+def item_frame(records, columns, spec_types=None):
+    """
+    Wide frame of item rows: ``records`` are ``(id, *fields)`` tuples for the
+    ``(header, field)`` pairs in ``columns``, followed by a column per spec type.
+    Missing values are None.
+    """
+    fields = [field for _, field in columns]
+    items = pd.DataFrame.from_records(list(records), columns=['id', *fields]).set_index('id')
+    specs = pivot_specifications(list(items.index), spec_types)
+    frame = items.join(specs)
+    frame.columns = [header for header, _ in columns] + list(specs.columns)
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def items_frame(queryset, columns, spec_types=None):
+    """``item_frame`` of a queryset's items, in the queryset's order (two queries)"""
+    fields = [field for _, field in columns]
+    return item_frame(queryset.values_list('id', *fields), columns, spec_types)
+
+
+def comparison_table(item_numbers, columns):
+    """
+    Side-by-side comparison of items: one row per column or spec type and one
+    column per item number (the first of ``columns`` must be the item number),
+    with a flag for rows whose values differ.
+    """
+    queryset = EquipmentItem.objects.filter(item_number__in=item_numbers)
+    frame = items_frame(queryset, columns)
+    if frame.empty:
+        return pd.DataFrame(dtype=object), pd.Series(dtype=bool)
+    # Columns none of the compared items has a value for are left out
+    frame = frame.dropna(axis=1, how='all')
+    table = frame.set_index(frame.columns[0]).T
+    differs = table.apply(lambda row: row.astype(str).nunique() > 1, axis=1)
+    return table, differs
@@ -1,41 +1,76 @@
+import hashlib
 import os
-import pandas as pd
 from django.conf import settings
+from django.core.cache import cache
 from .models import EquipmentType
+from .column_mapping import load_layouts
+from .excel_reader import StreamingExcelReader, workbook_sheet_names
+from .versions import EXCEL_TEMPLATES, bump_version, get_version
+
+# Template metadata stays cached until the file's mtime or size changes
+TEMPLATE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def invalidate_template_cache():
+    """Drop all cached template metadata, e.g. after a file was replaced keeping its mtime and size"""
+    bump_version(EXCEL_TEMPLATES)
+
 
 class ExcelTemplateDiscovery:
     """Utility class for discovering and managing Excel templates"""
     
-    def __init__(self):
+    def __init__(self, use_cache=True):
         self.template_dir = os.path.join(settings.BASE_DIR, 'equipment_bom', 'excel_templates')
-        self.supported_types = [
-            'Import Heater',
-            'Import Tank', 
-            'Pump',
-            'Stack Economizer'
-        ]
+        self.supported_types = list(load_layouts())
+        self.use_cache = use_cache
     
     def get_available_templates(self):
-        """Get list of available Excel templates"""
+        """
+        Get list of available Excel templates.
+        
+        Only the directory listing is read on each call; a workbook is analyzed again
+        only when its path, mtime or size differs from the cached entry.
+        """
         templates = []
         
         if not os.path.exists(self.template_dir):
             return templates
-            
-        for filename in os.listdir(self.template_dir):
-            if filename.endswith(('.xlsx', '.xls')):
-                file_path = os.path.join(self.template_dir, filename)
-                template_info = self._analyze_template(file_path)
-                if template_info:
-                    templates.append(template_info)
+        
+        entries = sorted(
+            (entry for entry in os.scandir(self.template_dir)
+             if entry.is_file() and entry.name.endswith(('.xlsx', '.xls'))),
+            key=lambda entry: entry.name
+        )
+        version = get_version(EXCEL_TEMPLATES) if self.use_cache else 0
+        keys = {self._cache_key(entry, version): entry for entry in entries}
+        cached = cache.get_many(list(keys)) if self.use_cache else {}
+        
+        missing = {}
+        for key, entry in keys.items():
+            if key in cached:
+                template_info = cached[key]
+            else:
+                template_info = self._analyze_template(entry.path)
+                # Cache workbooks that aren't templates too, so they aren't re-read either
+                missing[key] = template_info or {}
+            if template_info:
+                templates.append(template_info)
+        
+        if missing and self.use_cache:
+            cache.set_many(missing, TEMPLATE_CACHE_TIMEOUT)
         
         return templates
     
+    def _cache_key(self, entry, version):
+        stat = entry.stat()
+        path_hash = hashlib.sha1(entry.path.encode()).hexdigest()
+        return f'equipment_bom:excel_template:{version}:{path_hash}:{stat.st_mtime_ns}:{stat.st_size}'
+    
     def _analyze_template(self, file_path):
         """Analyze an Excel file to determine its type and contents"""
         try:
-            excel_file = pd.ExcelFile(file_path)
-            sheet_names = excel_file.sheet_names
+            # Only the workbook manifest is read here, not the sheets themselves
+            sheet_names = workbook_sheet_names(file_path)
             
             # Find matching equipment type
             equipment_type = None
@@ -67,16 +102,16 @@ class ExcelTemplateDiscovery:
     def validate_template(self, file_path, equipment_type):
         """Validate that an Excel template has the required structure"""
         try:
-            excel_file = pd.ExcelFile(file_path)
-            
-            if equipment_type not in excel_file.sheet_names:
+            if equipment_type not in workbook_sheet_names(file_path):
                 return False, f"Missing required sheet: {equipment_type}"
             
-            # Read the sheet and check for required columns
-            df = pd.read_excel(excel_file, sheet_name=equipment_type)
+            # Read just the header row and check for required columns
+            reader = StreamingExcelReader(file_path, batch_size=1)
+            df = next(reader.iter_batches(equipment_type), None)
+            columns = list(df.columns) if df is not None else []
             required_columns = ['Item Number', 'Description']
             
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            missing_columns = [col for col in required_columns if col not in columns]
             if missing_columns:
                 return False, f"Missing required columns: {missing_columns}"
             
@@ -88,17 +123,23 @@ class ExcelTemplateDiscovery:
     def get_template_preview(self, file_path, equipment_type, rows=5):
         """Get a preview of the template data"""
         try:
-            excel_file = pd.ExcelFile(file_path)
-            df = pd.read_excel(excel_file, sheet_name=equipment_type)
+            reader = StreamingExcelReader(file_path)
+            preview = None
+            total_rows = 0
+            for df in reader.iter_batches(equipment_type):
+                # Clean up the dataframe
+                df = df.dropna(how='all')  # Remove completely empty rows
+                if preview is None:
+                    preview = df.ffill(limit=1)  # Forward fill some columns
+                total_rows += len(df)
             
-            # Clean up the dataframe
-            df = df.dropna(how='all')  # Remove completely empty rows
-            df = df.fillna(method='ffill', limit=1)  # Forward fill some columns
+            if preview is None:
+                return None
             
             return {
-                'columns': list(df.columns),
-                'preview_data': df.head(rows).to_dict('records'),
-                'total_rows': len(df)
+                'columns': list(preview.columns),
+                'preview_data': preview.head(rows).to_dict('records'),
+                'total_rows': total_rows
             }
             
         except Exception as e:
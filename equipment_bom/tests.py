@@ -1,3 +1,796 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, IntegrityError, connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .column_mapping import SheetLayout, load_layouts
+from .excel_importer import ExcelBOMImporter
+from .excel_reader import StreamingExcelReader, workbook_sheet_names
+from .benchmark import benchmark_sheet, synthetic_workbook
+from .bom import cached_explosion, explode
+from .exports import export_rows
+from .facets import FACETS
+from .spec_pivot import pivot_specifications
+from . import template_utils
+from .import_lookups import ImportLookups
+from .models import BOMComponent, EquipmentItem, EquipmentType, ImportLog, Job, Material, Specification
+
+
+SAMPLE_WORKBOOK = os.path.join(settings.BASE_DIR, 'HEATER D365 IMPORT 6.4.25.xlsx')
+
+
+class ExcelBOMImporterTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('importer', password='x')
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_import(self, path, equipment_type):
+        importer = ExcelBOMImporter(path, self.user, equipment_type)
+        self.assertTrue(importer.import_excel(), importer.errors)
+        return importer
+
+    def write_workbook(self, sheet_name, rows):
+        path = os.path.join(self.tmpdir, 'workbook.xlsx')
+        pd.DataFrame(rows).to_excel(path, sheet_name=sheet_name, index=False)
+        return path
+
+    def test_imports_sample_workbook_sheets(self):
+        importer = self.run_import(SAMPLE_WORKBOOK, 'Import Heater')
+        self.assertGreater(importer.records_created, 0)
+        heater = EquipmentItem.objects.get(item_number='35284-01')
+        self.assertEqual(heater.description, 'HEATER, FAB, 42X12, RM, 316')
+        self.assertTrue(Specification.objects.filter(equipment_item=heater).exists())
+
+        for equipment_type in ['Import Tank', 'Pump', 'Stack Economizer']:
+            importer = self.run_import(SAMPLE_WORKBOOK, equipment_type)
+            # Sheets share item numbers, so later sheets update earlier items
+            self.assertGreater(importer.records_created + importer.records_updated, 0, equipment_type)
+            self.assertEqual(importer.errors, [])
+
+    def test_reimport_updates_instead_of_duplicating(self):
+        first = self.run_import(SAMPLE_WORKBOOK, 'Import Tank')
+        count = EquipmentItem.objects.count()
+        spec_count = Specification.objects.count()
+
+        # An edit outside the import clears the item's fingerprint, so it is written again
+        edited = EquipmentItem.objects.get(item_number='35284-01')
+        edited.description = 'Edited'
+        edited.save()
+
+        second = self.run_import(SAMPLE_WORKBOOK, 'Import Tank')
+        self.assertEqual(second.records_created, 0)
+        self.assertEqual(second.records_updated, 1)
+        self.assertEqual(second.records_skipped, first.records_created - 1)
+        self.assertNotEqual(EquipmentItem.objects.get(item_number='35284-01').description, 'Edited')
+        self.assertEqual(EquipmentItem.objects.count(), count)
+        self.assertEqual(Specification.objects.count(), spec_count)
+
+    def test_identical_reupload_short_circuits(self):
+        first = self.run_import(SAMPLE_WORKBOOK, 'Import Tank')
+        updated_at = list(EquipmentItem.objects.values_list('updated_at', flat=True))
+
+        second = self.run_import(SAMPLE_WORKBOOK, 'Import Tank')
+        self.assertEqual((second.records_created, second.records_updated), (0, 0))
+        self.assertEqual(second.import_log.duplicate_of, first.import_log)
+        self.assertEqual(second.import_log.file_hash, first.import_log.file_hash)
+        self.assertEqual(list(EquipmentItem.objects.values_list('updated_at', flat=True)), updated_at)
+
+        # Deleted items are not short-circuited away
+        EquipmentItem.objects.filter(item_number='35284-01').delete()
+        third = self.run_import(SAMPLE_WORKBOOK, 'Import Tank')
+        self.assertIsNone(third.import_log.duplicate_of)
+        self.assertEqual(third.records_created, 1)
+        self.assertEqual(third.records_skipped, first.records_created - 1)
+
+    def test_specification_edits_are_written_again(self):
+        self.run_import(SAMPLE_WORKBOOK, 'Import Tank')
+        spec = Specification.objects.filter(equipment_item__item_number='35284-01').first()
+        original = spec.value
+        spec.value = 'EDITED'
+        spec.save()
+
+        second = self.run_import(SAMPLE_WORKBOOK, 'Import Tank')
+        self.assertIsNone(second.import_log.duplicate_of)
+        self.assertEqual(second.records_updated, 1)
+        self.assertEqual(Specification.objects.get(pk=spec.pk).value, original)
+
+        # Deleting one is also an edit
+        spec.delete()
+        third = self.run_import(SAMPLE_WORKBOOK, 'Import Tank')
+        self.assertIsNone(third.import_log.duplicate_of)
+        self.assertTrue(Specification.objects.filter(
+            equipment_item__item_number='35284-01', spec_type=spec.spec_type, value=original,
+        ).exists())
+
+    def test_changed_file_writes_only_changed_rows(self):
+        path = os.path.join(self.tmpdir, 'tank.xlsx')
+        df = pd.read_excel(SAMPLE_WORKBOOK, sheet_name='Import Tank')
+        df.to_excel(path, sheet_name='Import Tank', index=False)
+        first = self.run_import(path, 'Import Tank')
+
+        df.loc[df['Item Number'] == '35284-01', 'Description'] = 'TANK, CHANGED'
+        df.to_excel(path, sheet_name='Import Tank', index=False)
+        second = self.run_import(path, 'Import Tank')
+        self.assertIsNone(second.import_log.duplicate_of)
+        self.assertEqual((second.records_created, second.records_updated), (0, 1))
+        self.assertEqual(second.records_skipped, first.records_created - 1)
+        self.assertEqual(EquipmentItem.objects.get(item_number='35284-01').description, 'TANK, CHANGED')
+
+    def test_invalid_rows_are_reported_per_row(self):
+        path = self.write_workbook('Pump', [
+            {'Item Number': 'P-1', 'Description': 'PUMP, GOOD', 'Job #': '40001', 304: 10},
+            {'Item Number': 'P-2', 'Description': 'PUMP, HUGE', 'Job #': None, 304: 1e12},
+            {'Item Number': 'P-3', 'Description': 'PUMP, GOOD', 'Job #': None, 304: 'unknown'},
+        ])
+        importer = self.run_import(path, 'Pump')
+        self.assertEqual(importer.records_created, 2)
+        self.assertEqual(len(importer.errors), 1)
+        self.assertTrue(importer.errors[0].startswith('Row 2:'))
+        self.assertIsNone(EquipmentItem.objects.get(item_number='P-3').diameter)
+
+        log = ImportLog.objects.get()
+        self.assertEqual(log.status, 'partial')
+        self.assertEqual(log.errors, importer.errors)
+
+    def test_failed_chunks_are_retried_row_by_row(self):
+        path = self.write_workbook('Import Heater', [
+            {'Item Number': 'H-1', 'Description': 'HEATER, GOOD', 'Job #': '40001', 'GP': 'SS'},
+            {'Item Number': 'H-2', 'Description': 'HEATER, BAD MATERIAL', 'Job #': None, 'GP': 'BROKEN'},
+            {'Item Number': 'H-3', 'Description': 'HEATER, GOOD', 'Job #': None, 'GP': 'SS'},
+            {'Item Number': 'H-4', 'Description': 'HEATER, LOCKED', 'Job #': None, 'GP': 'SS'},
+        ])
+        materials_for = ImportLookups.materials_for
+        bulk_create = QuerySet.bulk_create
+
+        def failing_materials_for(lookups, codes):
+            if 'BROKEN' in list(codes):
+                raise DatabaseError('material lookup failed')
+            return materials_for(lookups, codes)
+
+        def failing_bulk_create(queryset, objs, *args, **kwargs):
+            if any(getattr(obj, 'item_number', None) == 'H-4' for obj in objs):
+                raise IntegrityError('item is locked')
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        with mock.patch.object(ImportLookups, 'materials_for', failing_materials_for), \
+                mock.patch.object(QuerySet, 'bulk_create', failing_bulk_create):
+            importer = self.run_import(path, 'Import Heater')
+
+        self.assertEqual(importer.records_created, 2)
+        self.assertEqual([error.split(':')[0] for error in importer.errors], ['Row 2', 'Row 4'])
+        self.assertEqual(
+            sorted(EquipmentItem.objects.values_list('item_number', flat=True)), ['H-1', 'H-3']
+        )
+        self.assertEqual(EquipmentItem.objects.get(item_number='H-3').primary_material.code, 'SS')
+
+
+class ColumnMappingTests(TestCase):
+    def test_layout_compiles_to_column_transforms(self):
+        layout = SheetLayout('Boiler', {
+            'code': 'BLR',
+            'columns': {
+                'item_number': {'type': 'text', 'column': 'Item Number', 'strip': True},
+                'product_type': {'type': 'choice', 'column': 'Kind', 'choices': ['Sub Assy', 'FG FAB'], 'default': 'Item'},
+                'diameter': {'type': 'number', 'column': 304},
+                'position': {'type': 'match', 'default': 'CENTER', 'rules': [
+                    {'column': 'Side', 'contains': 'L', 'value': 'LEFT'},
+                    {'column': 'Side', 'contains': 'R', 'value': 'RIGHT'},
+                ]},
+            },
+            'specifications': [{'spec_type': 'Rating', 'column': 'kW', 'description': 'Rating'}],
+        })
+        df = pd.DataFrame({
+            'Item Number': [' B-1 ', 'B-2'],
+            'Kind': ['FG FAB part', None],
+            304: ['12.5', 'n/a'],
+            'Side': ['L', None],
+            'kW': [30, None],
+        }, index=[4, 7], dtype=object)
+
+        items, specs = layout.transform(df)
+        self.assertEqual(list(items.index), [4, 7])
+        self.assertEqual(list(items['item_number']), ['B-1', 'B-2'])
+        self.assertEqual(list(items['product_type']), ['FG FAB', 'Item'])
+        self.assertEqual(items['diameter'].iloc[0], 12.5)
+        self.assertTrue(pd.isna(items['diameter'].iloc[1]))
+        self.assertEqual(list(items['position']), ['LEFT', 'CENTER'])
+        self.assertEqual(specs.to_dict('records'), [
+            {'item_number': 'B-1', 'spec_type': 'Rating', 'value': '30', 'description': 'Rating'},
+        ])
+
+    def test_unknown_transform_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            SheetLayout('Boiler', {'code': 'BLR', 'columns': {'item_number': {'type': 'date', 'column': 'A'}}})
+
+    def test_sample_layouts_cover_the_workbook_sheets(self):
+        self.assertEqual(set(load_layouts()), set(workbook_sheet_names(SAMPLE_WORKBOOK)))
+
+
+class ImportLookupsTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+
+    def test_resolves_from_memory_and_batch_creates_missing(self):
+        with self.assertNumQueries(3):
+            lookups = ImportLookups()
+
+        existing = list(Material.objects.values_list('code', flat=True)[:2])
+        with self.assertNumQueries(0):
+            materials = lookups.materials_for(existing + [''])
+        self.assertEqual(sorted(materials), sorted(existing))
+
+        with self.assertNumQueries(2):
+            materials = lookups.materials_for(['NEW1', 'NEW2', 'NEW1'])
+        self.assertEqual({m.code for m in Material.objects.filter(code__in=['NEW1', 'NEW2'])}, {'NEW1', 'NEW2'})
+        self.assertEqual(materials['NEW1'].pk, Material.objects.get(code='NEW1').pk)
+
+        with self.assertNumQueries(0):
+            lookups.equipment_type('Pump', 'PMP')
+        job = lookups.job('35284', 'Heater')
+        self.assertEqual(job.description, 'Heater Project 35284')
+        with self.assertNumQueries(0):
+            self.assertEqual(lookups.job('35284', 'Heater'), job)
+
+    def test_import_does_not_create_extra_equipment_types(self):
+        user = User.objects.create_user('importer', password='x')
+        types = EquipmentType.objects.count()
+        self.assertTrue(ExcelBOMImporter(SAMPLE_WORKBOOK, user, 'Pump').import_excel())
+        self.assertEqual(EquipmentType.objects.count(), types)
+
+
+class DryRunImportTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('importer', password='x')
+
+    def dry_run(self, equipment_type):
+        importer = ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, equipment_type, dry_run=True)
+        self.assertTrue(importer.import_excel(), importer.errors)
+        return importer
+
+    def test_dry_run_reports_inserts_without_writing(self):
+        importer = self.dry_run('Import Heater')
+        self.assertFalse(EquipmentItem.objects.exists())
+        summary = importer.change_set.summary()
+        self.assertGreater(summary['inserts'], 0)
+        self.assertEqual(importer.import_log.status, 'preview')
+        self.assertEqual(importer.import_log.change_set['summary'], summary)
+
+    def test_diff_reports_updates_with_before_and_after(self):
+        ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, 'Import Heater').import_excel()
+        self.assertEqual(self.dry_run('Import Heater').change_set.summary()['updates'], 0)
+
+        item = EquipmentItem.objects.get(item_number='35284-01')
+        description = item.description
+        EquipmentItem.objects.filter(pk=item.pk).update(description='Changed', diameter=1)
+
+        change_set = self.dry_run('Import Heater').change_set
+        self.assertEqual([entry['item_number'] for entry in change_set.updates()], ['35284-01'])
+        changes = change_set.entries['35284-01']['changes']
+        self.assertEqual(changes['description'], ['Changed', description])
+        self.assertEqual(set(changes), {'description', 'diameter'})
+
+    def test_applying_preview_writes_only_changed_rows(self):
+        ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, 'Import Heater').import_excel()
+        EquipmentItem.objects.filter(item_number='35284-01').update(description='Changed')
+        untouched = EquipmentItem.objects.exclude(item_number='35284-01').values_list('updated_at', flat=True)
+        untouched = list(untouched)
+
+        import_log = self.dry_run('Import Heater').import_log
+        applier = ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, 'Import Heater', import_log=import_log)
+        self.assertTrue(applier.apply_change_set())
+
+        self.assertEqual((applier.records_created, applier.records_updated), (0, 1))
+        self.assertNotEqual(EquipmentItem.objects.get(item_number='35284-01').description, 'Changed')
+        self.assertEqual(
+            list(EquipmentItem.objects.exclude(item_number='35284-01').values_list('updated_at', flat=True)),
+            untouched,
+        )
+        import_log.refresh_from_db()
+        self.assertEqual(import_log.status, 'completed')
+
+
+class WholeWorkbookImportTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('importer', password='x')
+
+    def snapshot(self):
+        return (
+            list(EquipmentItem.objects.order_by('item_number').values_list(
+                'item_number', 'description', 'equipment_type__name', 'job__job_number', 'diameter')),
+            list(Specification.objects.order_by('equipment_item__item_number', 'spec_type').values_list(
+                'equipment_item__item_number', 'spec_type', 'value')),
+        )
+
+    def test_parallel_workbook_import_matches_sheet_by_sheet_import(self):
+        created = 0
+        for sheet_name in ExcelBOMImporter.SHEETS:
+            importer = ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, sheet_name)
+            self.assertTrue(importer.import_excel())
+            created += importer.records_created
+        expected = self.snapshot()
+        EquipmentItem.objects.all().delete()
+
+        importer = ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, ExcelBOMImporter.WHOLE_WORKBOOK)
+        importer.PARSE_WORKERS = 2
+        importer.READ_BATCH_SIZE = 5
+        # Workers of later sheets block on their full queues until the writer gets to them
+        importer.QUEUED_BATCHES = 1
+        self.assertTrue(importer.import_excel(), importer.errors)
+
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(importer.records_created, created)
+        self.assertEqual(set(importer.sheet_rows), set(ExcelBOMImporter.SHEETS))
+        import_log = ImportLog.objects.latest('pk')
+        self.assertIsNone(import_log.equipment_type)
+        self.assertEqual(import_log.rows_done, sum(importer.sheet_rows.values()))
+
+
+class StreamingExcelReaderTests(TestCase):
+    def test_sheet_names_from_manifest(self):
+        self.assertEqual(
+            workbook_sheet_names(SAMPLE_WORKBOOK),
+            ['Import Heater', 'Import Tank', 'Pump', 'Stack Economizer'],
+        )
+
+    def test_batches_match_pandas_layout(self):
+        expected = pd.read_excel(SAMPLE_WORKBOOK, sheet_name='Import Tank')
+        batches = list(StreamingExcelReader(SAMPLE_WORKBOOK, batch_size=5).iter_batches('Import Tank'))
+        self.assertEqual(len(batches), -(-len(expected) // 5))
+        combined = pd.concat(batches)
+        self.assertEqual(list(combined.columns), list(expected.columns))
+        self.assertEqual(list(combined.index), list(expected.index))
+        self.assertEqual(list(combined['Item Number'].dropna()), list(expected['Item Number'].dropna()))
+
+    def test_small_read_batches_import_the_same_items(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        user = User.objects.create_user('importer', password='x')
+
+        ExcelBOMImporter(SAMPLE_WORKBOOK, user, 'Import Heater').import_excel()
+        expected = list(EquipmentItem.objects.values_list('item_number', 'description', 'diameter'))
+        expected_specs = list(Specification.objects.values_list('equipment_item__item_number', 'spec_type', 'value'))
+        EquipmentItem.objects.all().delete()
+
+        importer = ExcelBOMImporter(SAMPLE_WORKBOOK, user, 'Import Heater')
+        importer.READ_BATCH_SIZE = 2
+        importer.import_excel()
+        self.assertEqual(list(EquipmentItem.objects.values_list('item_number', 'description', 'diameter')), expected)
+        self.assertEqual(
+            list(Specification.objects.values_list('equipment_item__item_number', 'spec_type', 'value')),
+            expected_specs,
+        )
+
+
+class BackgroundImportTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('importer', password='x')
+        self.client.force_login(self.user)
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self):
+        with open(SAMPLE_WORKBOOK, 'rb') as handle:
+            upload = SimpleUploadedFile('heater.xlsx', handle.read())
+        return self.client.post(reverse('equipment_bom:import_excel'), {
+            'excel_file': upload,
+            'equipment_type': 'Import Tank',
+        })
+
+    def test_upload_is_queued_then_processed_by_worker(self):
+        response = self.upload()
+        import_log = ImportLog.objects.get()
+        self.assertRedirects(response, reverse('equipment_bom:import_log_detail', args=[import_log.id]))
+        self.assertEqual(import_log.status, 'queued')
+        self.assertTrue(os.path.exists(import_log.file_path))
+        self.assertFalse(EquipmentItem.objects.exists())
+
+        call_command('process_imports', once=True, stdout=StringIO())
+
+        import_log.refresh_from_db()
+        self.assertEqual(import_log.status, 'completed')
+        self.assertEqual(import_log.phase, 'done')
+        self.assertGreater(import_log.rows_done, 0)
+        self.assertEqual(import_log.rows_done, import_log.rows_total)
+        self.assertIsNotNone(import_log.finished_at)
+        self.assertEqual(import_log.records_created, EquipmentItem.objects.count())
+        self.assertFalse(os.path.exists(import_log.file_path))
+
+    def test_progress_endpoint(self):
+        self.upload()
+        import_log = ImportLog.objects.get()
+        url = reverse('equipment_bom:import_log_progress', args=[import_log.id])
+
+        progress = self.client.get(url).json()
+        self.assertEqual(progress['status'], 'queued')
+        self.assertFalse(progress['finished'])
+        self.assertContains(self.client.get(url, HTTP_HX_REQUEST='true'), 'hx-trigger="every 2s"')
+
+        call_command('process_imports', once=True, stdout=StringIO())
+        progress = self.client.get(url).json()
+        self.assertTrue(progress['finished'])
+        self.assertEqual(progress['percent'], 100)
+        self.assertNotContains(self.client.get(url, HTTP_HX_REQUEST='true'), 'hx-trigger')
+
+    def test_preview_then_apply_through_the_queue(self):
+        with open(SAMPLE_WORKBOOK, 'rb') as handle:
+            upload = SimpleUploadedFile('heater.xlsx', handle.read())
+        self.client.post(reverse('equipment_bom:import_excel'), {
+            'excel_file': upload, 'equipment_type': 'Import Tank', 'dry_run': '1',
+        })
+        call_command('process_imports', once=True, stdout=StringIO())
+        import_log = ImportLog.objects.get()
+        self.assertEqual(import_log.status, 'preview')
+        self.assertFalse(EquipmentItem.objects.exists())
+        self.assertContains(self.client.get(reverse('equipment_bom:import_log_detail', args=[import_log.id])), 'Apply Changes')
+
+        self.client.post(reverse('equipment_bom:import_log_apply', args=[import_log.id]))
+        call_command('process_imports', once=True, stdout=StringIO())
+        import_log.refresh_from_db()
+        self.assertEqual(import_log.status, 'completed')
+        self.assertEqual(EquipmentItem.objects.count(), import_log.change_set['summary']['inserts'])
+
+    def test_queued_sheet_imports_use_the_layout_codes(self):
+        from .import_jobs import enqueue_import
+
+        EquipmentType.objects.all().delete()
+        for name in ('Import Heater', 'Import Tank'):
+            enqueue_import(SimpleUploadedFile('bom.xlsx', b''), self.user, name)
+        self.assertEqual(
+            dict(EquipmentType.objects.values_list('name', 'code')),
+            {'Import Heater': 'HEA', 'Import Tank': 'TNK'},
+        )
+
+        with self.assertRaisesMessage(ValueError, 'Unknown equipment type: Import Boiler'):
+            enqueue_import(SimpleUploadedFile('bom.xlsx', b''), self.user, 'Import Boiler')
+        self.assertEqual(ImportLog.objects.count(), 2)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'imports'))), 2)
+
+    def test_queued_import_is_claimed_once(self):
+        from .import_jobs import claim_next_import
+
+        self.upload()
+        self.assertIsNotNone(claim_next_import())
+        self.assertIsNone(claim_next_import())
+
+    def test_imports_of_a_dead_worker_are_recovered(self):
+        from .import_jobs import STALE_IMPORT_AFTER, claim_next_import, recover_stale_imports
+
+        self.upload()
+        import_log = claim_next_import()
+        # The worker died right after claiming the import
+        ImportLog.objects.filter(pk=import_log.pk).update(heartbeat_at=timezone.now() - 2 * STALE_IMPORT_AFTER)
+        call_command('process_imports', once=True, stdout=StringIO())
+        import_log.refresh_from_db()
+        self.assertEqual((import_log.status, import_log.attempts), ('completed', 2))
+
+        # Out of attempts, it fails instead of staying in progress
+        ImportLog.objects.filter(pk=import_log.pk).update(
+            status='in_progress', heartbeat_at=timezone.now() - 2 * STALE_IMPORT_AFTER
+        )
+        self.assertEqual(recover_stale_imports(), 1)
+        import_log.refresh_from_db()
+        self.assertEqual(import_log.status, 'failed')
+        self.assertTrue(import_log.is_finished)
+
+        # A live worker's import is left alone
+        ImportLog.objects.filter(pk=import_log.pk).update(status='in_progress', heartbeat_at=timezone.now())
+        self.assertEqual(recover_stale_imports(), 0)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('exporter', password='x')
+        self.client.force_login(self.user)
+        ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, 'Import Heater').import_excel()
+        self.equipment_type = EquipmentType.objects.get(name='Import Heater')
+        self.url = reverse('equipment_bom:export_excel', args=[self.equipment_type.id])
+        self.items = EquipmentItem.objects.filter(equipment_type=self.equipment_type)
+
+    def test_excel_export_streams_every_item(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+
+        df = pd.read_excel(BytesIO(b''.join(response.streaming_content)), sheet_name='Import Heater')
+        self.assertEqual(list(df['Item Number']), list(self.items.values_list('item_number', flat=True)))
+        spec_types = set(Specification.objects.filter(equipment_item__in=self.items).values_list('spec_type', flat=True))
+        self.assertTrue(spec_types)
+        self.assertEqual(set(df.columns[13:]), spec_types)
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        df = pd.read_csv(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(df), self.items.count())
+        self.assertEqual(list(df.columns[:3]), ['Item Number', 'Description', 'Job Number'])
+
+    def test_export_queries_are_chunked(self):
+        count = self.items.count()
+        header, rows = export_rows(self.equipment_type, chunk_size=2)
+        # One streamed item query, plus one specification query per chunk
+        with self.assertNumQueries(1 + -(-count // 2)):
+            self.assertEqual(len(list(rows)), count)
+
+
+class TemplateDiscoveryCacheTests(TestCase):
+    def setUp(self):
+        self.template_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.template_dir)
+        self.template = os.path.join(self.template_dir, 'heater.xlsx')
+        shutil.copy(SAMPLE_WORKBOOK, self.template)
+        self.discovery = template_utils.ExcelTemplateDiscovery()
+        self.discovery.template_dir = self.template_dir
+        template_utils.invalidate_template_cache()
+
+    def discover(self):
+        with mock.patch.object(template_utils, 'workbook_sheet_names', wraps=workbook_sheet_names) as reads:
+            templates = self.discovery.get_available_templates()
+        return templates, reads.call_count
+
+    def test_unchanged_template_is_not_reread(self):
+        first, reads = self.discover()
+        self.assertEqual(reads, 1)
+        self.assertEqual(first[0]['equipment_type'], 'Import Heater')
+        second, reads = self.discover()
+        self.assertEqual(reads, 0)
+        self.assertEqual(second, first)
+
+    def test_changed_or_invalidated_template_is_reread(self):
+        self.discover()
+        stat = os.stat(self.template)
+        os.utime(self.template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(self.discover()[1], 1)
+        template_utils.invalidate_template_cache()
+        self.assertEqual(self.discover()[1], 1)
+
+
+class BOMExplosionTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('bom', password='x')
+        self.client.force_login(self.user)
+        self.job = Job.objects.create(job_number='J-BOM')
+        self.steel = Material.objects.create(code='M316', name='316 Stainless', material_type='316')
+        self.alloy = Material.objects.create(code='M304', name='304 Stainless', material_type='304')
+        self.top = self.item('TOP-1')
+        self.sub = self.item('SUB-1')
+        self.component(self.top, 'SUB-1', 2)
+        self.component(self.top, 'P-1', 3, self.steel)
+        self.component(self.sub, 'P-2', 4, self.steel)
+        self.component(self.sub, 'P-3', 1, self.alloy)
+
+    def item(self, item_number):
+        return EquipmentItem.objects.create(
+            item_number=item_number, description=item_number, job=self.job,
+            equipment_type=EquipmentType.objects.first(), product_type='Sub Assy', created_by=self.user,
+        )
+
+    def component(self, item, number, quantity, material=None):
+        return BOMComponent.objects.create(
+            equipment_item=item, component_number=number, description=number,
+            product_type='Item', quantity=quantity, material=material,
+        )
+
+    def test_explosion_rolls_up_quantities_in_one_query(self):
+        with self.assertNumQueries(1):
+            explosion = explode(self.top)
+        lines = [(line['component_number'], line['depth'], line['extended_quantity']) for line in explosion['lines']]
+        self.assertEqual(lines, [('P-1', 1, 3), ('SUB-1', 1, 2), ('P-2', 2, 8), ('P-3', 2, 2)])
+        self.assertEqual(
+            [(total['code'], total['quantity']) for total in explosion['materials']],
+            [('M304', 2), ('M316', 11)],
+        )
+
+    def test_cycles_are_not_expanded_again(self):
+        self.component(self.sub, 'TOP-1', 1)
+        numbers = [line['component_number'] for line in explode(self.top)['lines']]
+        self.assertEqual(numbers, ['P-1', 'SUB-1', 'P-2', 'P-3', 'TOP-1'])
+
+    def test_explosion_is_cached_until_bom_changes(self):
+        cached_explosion(self.top)
+        # Only the (database) cache is read
+        with CaptureQueriesContext(connection) as queries:
+            cached_explosion(self.top)
+        self.assertEqual([query for query in queries if 'django_cache' not in query['sql']], [])
+        self.component(self.sub, 'P-4', 5, self.alloy)
+        materials = {total['code']: total['quantity'] for total in cached_explosion(self.top)['materials']}
+        self.assertEqual(materials['M304'], 12)
+
+    def test_view_and_api(self):
+        response = self.client.get(reverse('equipment_bom:equipment_bom_explosion', args=[self.top.id]))
+        self.assertContains(response, 'P-2')
+        data = self.client.get(reverse('equipment_bom:api_bom_explosion', args=[self.top.id])).json()
+        self.assertEqual(data['component_count'], 4)
+        self.assertEqual(data['max_depth'], 2)
+
+
+class EquipmentFacetTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('facets', password='x')
+        self.client.force_login(self.user)
+        self.heater, self.tank = EquipmentType.objects.all()[:2]
+        job = Job.objects.create(job_number='J-FACET')
+        for number, equipment_type, status in [
+            ('F-1', self.heater, 'draft'), ('F-2', self.heater, 'approved'), ('F-3', self.tank, 'draft'),
+        ]:
+            EquipmentItem.objects.create(
+                item_number=number, description=number, job=job, equipment_type=equipment_type,
+                product_type='Item', status=status, created_by=self.user,
+            )
+
+    def facet(self, response, param):
+        facet = next(facet for facet in response.context['facets'] if facet['param'] == param)
+        return {option['value']: option['count'] for option in facet['options']}
+
+    def test_facet_counts_honour_other_selections(self):
+        response = self.client.get(reverse('equipment_bom:equipment_list'), {'status': 'draft'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertEqual(self.facet(response, 'type'), {str(self.heater.id): 1, str(self.tank.id): 1})
+        # A facet's own selection doesn't narrow its counts
+        self.assertEqual(self.facet(response, 'status'), {'draft': 2, 'approved': 1})
+
+        response = self.client.get(reverse('equipment_bom:equipment_list'), {'type': self.heater.id, 'status': 'draft'})
+        self.assertEqual([item.item_number for item in response.context['page_obj']], ['F-1'])
+        self.assertEqual(self.facet(response, 'status'), {'draft': 1, 'approved': 1})
+
+    def test_list_skips_paginator_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('equipment_bom:equipment_list'), {'q': 'F-'})
+        counts = [query for query in queries if 'COUNT(*)' in query['sql'] and 'equipment_bom_equipmentitem' in query['sql']]
+        self.assertEqual(counts, [])
+
+    def test_one_grouped_query_per_facet(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('equipment_bom:equipment_list'), {'status': 'draft'})
+        grouped = [query for query in queries if 'GROUP BY' in query['sql'] and 'equipment_bom_equipmentitem' in query['sql']]
+        self.assertEqual(len(grouped), len(FACETS))
+        # Each groups by its own column (and label) only
+        self.assertTrue(all(query['sql'].split('GROUP BY')[1].count(',') <= 1 for query in grouped))
+
+    def test_invalid_id_is_ignored(self):
+        response = self.client.get(reverse('equipment_bom:equipment_list'), {'job': 'abc'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+
+
+class EquipmentDataApiTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('charts', password='x')
+        self.client.force_login(self.user)
+        self.url = reverse('equipment_bom:api_equipment_data')
+        self.job = Job.objects.create(job_number='J-API')
+        self.add_item('A-1')
+
+    def add_item(self, item_number):
+        EquipmentItem.objects.create(
+            item_number=item_number, description=item_number, job=self.job,
+            equipment_type=EquipmentType.objects.first(), product_type='Item', created_by=self.user,
+        )
+
+    def aggregate_queries(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, **headers)
+        return response, [query for query in queries if 'equipment_bom_equipmentitem' in query['sql']]
+
+    def test_unchanged_data_is_not_modified(self):
+        response, queries = self.aggregate_queries()
+        self.assertEqual(response.json()['status_counts'], [{'status': 'draft', 'count': 1}])
+        self.assertEqual(len(queries), 2)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        response, queries = self.aggregate_queries(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, [])
+
+        # Without the ETag the payload comes from the cache
+        response, queries = self.aggregate_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_item_writes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.add_item('A-2')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['status_counts'], [{'status': 'draft', 'count': 2}])
+
+        etag = response['ETag']
+        ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, 'Import Heater').import_excel()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+    def test_type_renames_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        equipment_type = EquipmentType.objects.first()
+        equipment_type.name = 'Renamed Heater'
+        equipment_type.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_lost_stamps_are_not_reused(self):
+        etag = self.client.get(self.url)['ETag']
+        cache.clear()
+        self.add_item('A-2')
+        cache.clear()
+        # A restarted stamp must not match an ETag issued before the change
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SpecificationPivotTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('pivot', password='x')
+        self.client.force_login(self.user)
+        ExcelBOMImporter(SAMPLE_WORKBOOK, self.user, 'Import Heater').import_excel()
+        self.items = EquipmentItem.objects.filter(equipment_type__name='Import Heater')
+
+    def test_pivot_matches_specification_rows_in_one_query(self):
+        with self.assertNumQueries(1):
+            frame = pivot_specifications(self.items)
+        for item_id, spec_type, value in Specification.objects.filter(
+            equipment_item__in=self.items
+        ).values_list('equipment_item_id', 'spec_type', 'value'):
+            self.assertEqual(frame.loc[item_id, spec_type], value)
+
+    def test_explicit_spec_types_fix_the_columns(self):
+        frame = pivot_specifications(self.items, ['Heater Model', 'HP'])
+        self.assertEqual(list(frame.columns), ['Heater Model', 'HP'])
+        self.assertTrue(frame['HP'].isna().all())
+
+    def test_compare_view_highlights_differences(self):
+        first, second = self.items.values_list('item_number', flat=True)[:2]
+        response = self.client.get(reverse('equipment_bom:compare_items'), {'items': f'{first}, {second}, MISSING'})
+        self.assertEqual(response.context['compared_items'], [first, second])
+        self.assertEqual(response.context['missing_items'], ['MISSING'])
+        rows = {row['label']: row for row in response.context['rows']}
+        self.assertTrue(rows['Description']['differs'])
+        self.assertFalse(rows['Job Number']['differs'])
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        call_command('setup_equipment_bom', stdout=StringIO())
+        self.user = User.objects.create_user('bench', password='x')
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        self.file_path = os.path.join(work_dir, 'pump.xlsx')
+
+    def test_synthetic_workbook_import_is_measured(self):
+        synthetic_workbook(self.file_path, 'Pump', 40)
+        result = benchmark_sheet(self.file_path, 'Pump', self.user)
+
+        self.assertEqual(result['import']['records_created'], 40)
+        self.assertEqual(EquipmentItem.objects.filter(item_number__startswith='BENCH-').count(), 40)
+        self.assertEqual(set(result['import']['phases']), {'parse', 'transform', 'write'})
+        self.assertGreater(result['import']['queries'], 0)
+        self.assertGreater(result['export']['queries'], 0)
+        # The timing wrapper is removed from the shared layout again
+        self.assertNotIn('transform', vars(ExcelBOMImporter.SHEETS['Pump']))
@@ -17,7 +17,9 @@ urlpatterns = [
     path('equipment/', views.equipment_list, name='equipment_list'),
     path('equipment/<int:equipment_id>/', views.equipment_detail, name='equipment_detail'),
     path('equipment/create/', views.equipment_create, name='equipment_create'),
+    path('equipment/compare/', views.compare_items, name='compare_items'),
     path('equipment/<int:equipment_id>/edit/', views.equipment_edit, name='equipment_edit'),
+    path('equipment/<int:equipment_id>/bom/', views.equipment_bom_explosion, name='equipment_bom_explosion'),
     
     # Materials
     path('materials/', views.material_list, name='material_list'),
@@ -37,8 +39,11 @@ urlpatterns = [
     path('import/', views.import_excel, name='import_excel'),
     path('import/logs/', views.import_logs, name='import_logs'),
     path('import/logs/<int:log_id>/', views.import_log_detail, name='import_log_detail'),
+    path('import/logs/<int:log_id>/progress/', views.import_log_progress, name='import_log_progress'),
+    path('import/logs/<int:log_id>/apply/', views.import_log_apply, name='import_log_apply'),
     path('export/<int:equipment_type_id>/', views.export_excel, name='export_excel'),
     
     # API endpoints
     path('api/equipment-data/', views.api_equipment_data, name='api_equipment_data'),
+    path('api/equipment/<int:equipment_id>/bom/', views.api_bom_explosion, name='api_bom_explosion'),
 ]
@@ -0,0 +1,12 @@
+"""
+Version stamps for cached equipment data (see core.cache_versions).
+
+Model signals bump the stamps for ordinary saves and deletes, and the importer
+bumps them after its bulk writes, which bypass the signals.
+"""
+from core.cache_versions import bump_version, get_version  # noqa: F401
+
+# Stamps
+EQUIPMENT_ITEMS = 'equipment_bom:equipment_items'
+BOM = 'equipment_bom:bom'
+EXCEL_TEMPLATES = 'equipment_bom:excel_templates'
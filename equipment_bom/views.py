@@ -3,8 +3,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Count, Sum
-from django.http import JsonResponse, HttpResponse
-from django.views.decorators.http import require_POST
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
+from django.core.cache import cache
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 from django.utils import timezone
 from django.conf import settings
 import os
@@ -14,7 +16,14 @@ from .models import (
     EquipmentType, Job, Material, BOMTemplate, EquipmentItem, 
     BOMComponent, Specification, ImportLog
 )
+from .bom import cached_explosion
 from .excel_importer import ExcelBOMImporter
+from .exports import BASE_COLUMNS, export_rows, iter_csv, write_xlsx
+from .facets import FacetedPaginator, FacetedSearch
+from .spec_pivot import comparison_table
+from .versions import EQUIPMENT_ITEMS, get_version
+from .change_set import ChangeSet
+from .import_jobs import enqueue_import, import_progress, queue_preview_apply
 from .forms import JobForm, EquipmentItemForm, HeaterForm, TankForm, PumpForm, StackEconomizerForm, MaterialForm, BOMTemplateForm
 from .template_utils import ExcelTemplateDiscovery
 
@@ -110,8 +119,6 @@ def job_detail(request, job_id):
 def equipment_list(request):
     """List all equipment items"""
     search_query = request.GET.get('q', '')
-    equipment_type_filter = request.GET.get('type', '')
-    status_filter = request.GET.get('status', '')
     
     equipment = EquipmentItem.objects.select_related('job', 'equipment_type', 'primary_material').all()
     
@@ -122,27 +129,24 @@ def equipment_list(request):
             Q(job__job_number__icontains=search_query)
         )
     
-    if equipment_type_filter:
-        equipment = equipment.filter(equipment_type__id=equipment_type_filter)
-    
-    if status_filter:
-        equipment = equipment.filter(status=status_filter)
+    # Facet counts and the result total come from one grouped query
+    search = FacetedSearch(equipment, request.GET)
+    facets, total = search.counts()
     
-    # Pagination
-    paginator = Paginator(equipment, 20)
+    # Pagination (the total is already known, so no COUNT(*) query)
+    paginator = FacetedPaginator(search.filtered(), 20, count=total)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Get equipment types for filter
-    equipment_types = EquipmentType.objects.all()
+    filter_params = request.GET.copy()
+    filter_params.pop('page', None)
     
     context = {
         'page_obj': page_obj,
         'search_query': search_query,
-        'equipment_type_filter': equipment_type_filter,
-        'status_filter': status_filter,
-        'equipment_types': equipment_types,
-        'status_choices': EquipmentItem._meta.get_field('status').choices,
+        'facets': facets,
+        'is_filtered': bool(search_query) or any(facet['selected'] for facet in facets),
+        'filter_query': filter_params.urlencode(),
     }
     
     return render(request, 'equipment_bom/equipment_list.html', context)
@@ -162,6 +166,47 @@ def equipment_detail(request, equipment_id):
     
     return render(request, 'equipment_bom/equipment_detail.html', context)
 
+# Items shown side by side on the compare page at most
+COMPARE_LIMIT = 10
+
+@login_required
+def compare_items(request):
+    """Compare the fields and specifications of equipment items side by side"""
+    item_numbers = [
+        number.strip()
+        for value in request.GET.getlist('items') for number in value.split(',')
+        if number.strip()
+    ]
+    item_numbers = list(dict.fromkeys(item_numbers))[:COMPARE_LIMIT]
+    
+    table, differs = comparison_table(item_numbers, BASE_COLUMNS)
+    rows = [
+        {'label': label, 'values': list(values), 'differs': differs[label]}
+        for label, values in table.iterrows()
+    ]
+    
+    context = {
+        'item_numbers': item_numbers,
+        'compared_items': list(table.columns),
+        'missing_items': [number for number in item_numbers if number not in table.columns],
+        'rows': rows,
+        'compare_limit': COMPARE_LIMIT,
+    }
+    
+    return render(request, 'equipment_bom/compare_items.html', context)
+
+@login_required
+def equipment_bom_explosion(request, equipment_id):
+    """Multi-level BOM of an equipment item with rolled-up quantities and material totals"""
+    equipment = get_object_or_404(EquipmentItem, id=equipment_id)
+    
+    context = {
+        'equipment': equipment,
+        'explosion': cached_explosion(equipment),
+    }
+    
+    return render(request, 'equipment_bom/bom_explosion.html', context)
+
 @login_required
 def material_list(request):
     """List all materials"""
@@ -210,38 +255,12 @@ def import_excel(request):
                 messages.error(request, 'Please select both a file and equipment type.')
                 return redirect('equipment_bom:import_excel')
             
-            # Save file temporarily
-            file_path = os.path.join(settings.MEDIA_ROOT, 'temp', excel_file.name)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            with open(file_path, 'wb+') as destination:
-                for chunk in excel_file.chunks():
-                    destination.write(chunk)
-            
-            # Import the data
-            importer = ExcelBOMImporter(file_path, request.user, equipment_type_name)
-            success = importer.import_excel()
-            
-            # Clean up temp file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            if success:
-                messages.success(
-                    request, 
-                    f'Import completed successfully! '
-                    f'Processed: {importer.records_processed}, '
-                    f'Created: {importer.records_created}, '
-                    f'Updated: {importer.records_updated}'
-                )
-            else:
-                messages.warning(
-                    request, 
-                    f'Import completed with errors. '
-                    f'Check the import log for details.'
-                )
-            
-            return redirect('equipment_bom:import_logs')
+            # Queue the import; the process_imports worker picks it up
+            import_log = enqueue_import(
+                excel_file, request.user, equipment_type_name, dry_run=bool(request.POST.get('dry_run'))
+            )
+            messages.info(request, 'Import queued. Progress will update on this page.')
+            return redirect('equipment_bom:import_log_detail', log_id=import_log.id)
             
         except Exception as e:
             messages.error(request, f'Import failed: {str(e)}')
@@ -252,6 +271,7 @@ def import_excel(request):
     
     context = {
         'equipment_types': equipment_types,
+        'whole_workbook': ExcelBOMImporter.WHOLE_WORKBOOK,
     }
     
     return render(request, 'equipment_bom/import_excel.html', context)
@@ -272,6 +292,9 @@ def import_logs(request):
     
     return render(request, 'equipment_bom/import_logs.html', context)
 
+# Change set entries shown on the import log page
+CHANGE_SET_DISPLAY_LIMIT = 500
+
 @login_required
 def import_log_detail(request, log_id):
     """Import log detail view"""
@@ -281,8 +304,40 @@ def import_log_detail(request, log_id):
         'import_log': import_log,
     }
     
+    if import_log.change_set:
+        change_set = ChangeSet(import_log.change_set)
+        changes = change_set.inserts() + change_set.updates()
+        context.update({
+            'change_summary': change_set.summary(),
+            'changes': changes[:CHANGE_SET_DISPLAY_LIMIT],
+            'changes_truncated': len(changes) > CHANGE_SET_DISPLAY_LIMIT,
+        })
+    
     return render(request, 'equipment_bom/import_log_detail.html', context)
 
+@login_required
+@require_POST
+def import_log_apply(request, log_id):
+    """Queue a previewed (dry run) import to be written from its change set"""
+    import_log = get_object_or_404(ImportLog, id=log_id)
+    
+    if queue_preview_apply(import_log):
+        messages.info(request, 'Applying the previewed changes. Progress will update on this page.')
+    else:
+        messages.error(request, 'This import has no preview to apply.')
+    
+    return redirect('equipment_bom:import_log_detail', log_id=import_log.id)
+
+@login_required
+def import_log_progress(request, log_id):
+    """Live import progress: an HTML fragment for HTMX polling, JSON otherwise"""
+    import_log = get_object_or_404(ImportLog, id=log_id)
+    
+    if request.headers.get('HX-Request'):
+        return render(request, 'equipment_bom/partials/import_progress.html', {'import_log': import_log})
+    
+    return JsonResponse(import_progress(import_log))
+
 @login_required
 def bom_template_list(request):
     """List BOM templates"""
@@ -312,83 +367,72 @@ def bom_template_detail(request, template_id):
 
 @login_required
 def export_excel(request, equipment_type_id):
-    """Export equipment data to Excel"""
+    """Export equipment data to Excel (or CSV with ?format=csv)"""
     equipment_type = get_object_or_404(EquipmentType, id=equipment_type_id)
-    equipment_items = EquipmentItem.objects.filter(equipment_type=equipment_type).select_related(
-        'job', 'primary_material'
-    ).prefetch_related('specifications')
-    
-    # Create Excel file using pandas
-    import pandas as pd
-    from io import BytesIO
-    
-    # Prepare data for export
-    data = []
-    for item in equipment_items:
-        row = {
-            'Item Number': item.item_number,
-            'Description': item.description,
-            'Job Number': item.job.job_number,
-            'Product Type': item.product_type,
-            'Supply Type': item.supply_type,
-            'Diameter': item.diameter,
-            'Height': item.height,
-            'Length': item.length,
-            'Width': item.width,
-            'Thickness': item.thickness,
-            'Position': item.position,
-            'Material': item.primary_material.code if item.primary_material else '',
-            'Status': item.status,
-        }
-        
-        # Add specifications
-        for spec in item.specifications.all():
-            row[spec.spec_type] = spec.value
-        
-        data.append(row)
-    
-    # Create DataFrame and export
-    df = pd.DataFrame(data)
-    
-    # Create Excel file in memory
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name=equipment_type.name, index=False)
-    
-    output.seek(0)
-    
-    # Create HTTP response
-    filename = f"{equipment_type.name}_Export_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    response = HttpResponse(
-        output.read(),
+    header, rows = export_rows(equipment_type)
+    filename = f"{equipment_type.name}_Export_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    # CSV fast path: rows are streamed to the client as they are read
+    if request.GET.get('format') == 'csv':
+        response = StreamingHttpResponse(iter_csv(header, rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+    
+    return FileResponse(
+        write_xlsx(equipment_type.name, header, rows),
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+
+# Cached API payloads are keyed by version stamp; this only bounds how long stale ones linger
+API_CACHE_TIMEOUT = 60 * 60
+
+def equipment_data_etag(request):
+    """Strong ETag of the equipment data payload: the item table's version stamp and the query"""
+    return f"equipment-data-{get_version(EQUIPMENT_ITEMS)}-{request.GET.get('type', '')}"
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=equipment_data_etag)
 def api_equipment_data(request):
-    """API endpoint for equipment data (for charts/dashboards)"""
-    equipment_type_id = request.GET.get('type')
-    
-    if equipment_type_id:
-        equipment = EquipmentItem.objects.filter(equipment_type_id=equipment_type_id)
-    else:
-        equipment = EquipmentItem.objects.all()
-    
-    # Group by status
-    status_counts = equipment.values('status').annotate(count=Count('id'))
+    """
+    API endpoint for equipment data (for charts/dashboards).
     
-    # Group by equipment type
-    type_counts = equipment.values('equipment_type__name').annotate(count=Count('id'))
-    
-    data = {
-        'status_counts': list(status_counts),
-        'type_counts': list(type_counts),
-    }
+    Polling clients that send back the ETag get a 304 after a single lookup of the
+    version stamp in the cache (a table read with the database cache), without any
+    aggregate query; otherwise the serialized payload is served from the cache until the next item write.
+    """
+    equipment_type_id = request.GET.get('type')
+    cache_key = f'equipment_bom:api_equipment_data:{equipment_data_etag(request)}'
+    content = cache.get(cache_key)
+    
+    if content is None:
+        if equipment_type_id:
+            equipment = EquipmentItem.objects.filter(equipment_type_id=equipment_type_id)
+        else:
+            equipment = EquipmentItem.objects.all()
+        
+        # Group by status
+        status_counts = equipment.values('status').annotate(count=Count('id'))
+        
+        # Group by equipment type
+        type_counts = equipment.values('equipment_type__name').annotate(count=Count('id'))
+        
+        data = {
+            'status_counts': list(status_counts),
+            'type_counts': list(type_counts),
+        }
+        content = json.dumps(data)
+        cache.set(cache_key, content, API_CACHE_TIMEOUT)
     
-    return JsonResponse(data)
+    return HttpResponse(content, content_type='application/json')
+
+@login_required
+def api_bom_explosion(request, equipment_id):
+    """API endpoint for an equipment item's exploded BOM"""
+    equipment = get_object_or_404(EquipmentItem, id=equipment_id)
+    return JsonResponse(cached_explosion(equipment))
 
 
 # ===== CREATION VIEWS =====
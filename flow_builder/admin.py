@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
+from .forms import StepAdminForm
 from .models import Department, Person, Flow, Step, Task
+from .signals import request_reschedule
 
 
 @admin.register(Department)
@@ -19,6 +22,7 @@ class TaskInline(admin.TabularInline):
 
 class StepInline(admin.TabularInline):
     model = Step
+    form = StepAdminForm
     extra = 1
     inlines = [TaskInline]
 
@@ -30,18 +34,31 @@ class FlowAdmin(admin.ModelAdmin):
     actions = ['recalculate_dates']
 
     def recalculate_dates(self, request, queryset):
-        for flow in queryset:
-            flow.recalculate_dates()
+        # Through the commit batch, so the flows' cached timelines are refreshed too
+        with transaction.atomic():
+            for flow_id in queryset.values_list('pk', flat=True):
+                request_reschedule(flow_id)
         self.message_user(request, "Dates recalculated.")
     recalculate_dates.short_description = "Recalculate dates for selected flows"
 
 
 @admin.register(Step)
 class StepAdmin(admin.ModelAdmin):
+    form = StepAdminForm
     list_filter = ['flow', 'is_completed']
     list_display = ['title', 'flow', 'get_status', 'planned_end_date', 'actual_end_date']
 
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
-    list_filter = ['step__flow', 'is_completed']
\ No newline at end of file
+    list_filter = ['step__flow', 'is_completed']
+    actions = ['mark_completed']
+
+    def mark_completed(self, request, queryset):
+        # One transaction, so each step's progress and each flow's dates are recalculated once
+        with transaction.atomic():
+            for task in queryset.filter(is_completed=False).select_related('step'):
+                task.is_completed = True
+                task.save()
+        self.message_user(request, "Tasks marked completed.")
+    mark_completed.short_description = "Mark selected tasks completed"
\ No newline at end of file
@@ -1,5 +1,19 @@
 from django import forms
 from .models import Flow, Step, Task, Person, Department
+from .scheduling import find_cycle
+
+
+def validate_dependencies(step, flow, dependencies):
+    """Reject dependencies that would make the step (indirectly) depend on itself."""
+    if not step.pk or not dependencies:
+        # Nothing depends on a new step yet
+        return
+    cyclic = find_cycle(flow, [step.pk], [dependency.pk for dependency in dependencies])
+    if cyclic is not None:
+        dependency = next(dependency for dependency in dependencies if dependency.pk == cyclic)
+        raise forms.ValidationError(
+            f'"{dependency.title}" already depends on "{step.title}", so it cannot also be one of its dependencies.'
+        )
 
 
 class FlowForm(forms.ModelForm):
@@ -18,7 +32,7 @@ class StepForm(forms.ModelForm):
     
     class Meta:
         model = Step
-        fields = ['title', 'description', 'time_allotted_days']
+        fields = ['title', 'description', 'time_allotted_days', 'optimistic_days', 'pessimistic_days']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
         }
@@ -26,6 +40,7 @@ class StepForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         flow = kwargs.pop('flow', None)
         super().__init__(*args, **kwargs)
+        self.flow = flow
         
         if flow:
             # Set queryset for dependencies to only include steps from the same flow
@@ -35,6 +50,12 @@ class StepForm(forms.ModelForm):
             if self.instance and self.instance.pk:
                 self.fields['dependencies'].queryset = flow.steps.exclude(pk=self.instance.pk)
     
+    def clean_dependencies(self):
+        dependencies = self.cleaned_data['dependencies']
+        if self.flow:
+            validate_dependencies(self.instance, self.flow, dependencies)
+        return dependencies
+
     def save(self, commit=True):
         step = super().save(commit=False)
         if commit:
@@ -45,6 +66,25 @@ class StepForm(forms.ModelForm):
         return step
 
 
+class StepAdminForm(forms.ModelForm):
+    """Admin and inline step form that rejects dependency cycles before saving."""
+
+    class Meta:
+        model = Step
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        flow = cleaned_data.get('flow') or (self.instance.flow if self.instance.flow_id else None)
+        dependencies = cleaned_data.get('dependencies')
+        if flow and dependencies:
+            try:
+                validate_dependencies(self.instance, flow, dependencies)
+            except forms.ValidationError as error:
+                self.add_error('dependencies', error)
+        return cleaned_data
+
+
 class TaskForm(forms.ModelForm):
     class Meta:
         model = Task
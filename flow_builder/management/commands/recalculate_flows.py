@@ -0,0 +1,33 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from flow_builder.models import Flow
+from flow_builder.signals import request_timeline_refresh
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the planned dates of every flow (or the given flows) from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'flow_ids',
+            nargs='*',
+            type=int,
+            help='Flows to recalculate (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        flows = Flow.objects.all()
+        if options['flow_ids']:
+            flows = flows.filter(pk__in=options['flow_ids'])
+
+        updated_count = 0
+        for flow in flows:
+            try:
+                flow.recalculate_dates()
+            except ValidationError as error:
+                self.stdout.write(self.style.WARNING(f'Skipped flow "{flow.name}": {error.messages[0]}'))
+                continue
+            request_timeline_refresh(flow.pk)
+            updated_count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Recalculated {updated_count} flow(s)'))
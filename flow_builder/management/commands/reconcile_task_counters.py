@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from flow_builder.models import Step
+
+
+class Command(BaseCommand):
+    help = 'Recount the total and completed tasks of every step, repairing counters that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the steps whose counters are wrong without fixing them'
+        )
+
+    def handle(self, *args, **options):
+        steps = Step.objects.annotate(
+            task_count=Count('tasks'),
+            completed_task_count=Count('tasks', filter=Q(tasks__is_completed=True)),
+        )
+        repaired = []
+        for step in steps.iterator():
+            if (step.total_tasks, step.completed_tasks) == (step.task_count, step.completed_task_count):
+                continue
+            self.stdout.write(
+                f'Step "{step.title}": {step.completed_tasks}/{step.total_tasks} tasks '
+                f'-> {step.completed_task_count}/{step.task_count}'
+            )
+            step.total_tasks, step.completed_tasks = step.task_count, step.completed_task_count
+            step.update_progress()
+            repaired.append(step)
+
+        if repaired and not options['dry_run']:
+            # Saving each step reschedules the dependents of steps whose completion changed;
+            # step saves leave the counters out, so those are written on their own
+            with transaction.atomic():
+                for step in repaired:
+                    Step.objects.filter(pk=step.pk).update(
+                        total_tasks=step.total_tasks, completed_tasks=step.completed_tasks
+                    )
+                    step.save()
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(repaired)} step(s) with wrong task counters'))
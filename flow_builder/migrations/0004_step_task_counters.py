@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:16
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_tasks(apps, schema_editor):
+    Step = apps.get_model('flow_builder', 'Step')
+    steps = list(Step.objects.annotate(
+        task_count=Count('tasks'),
+        completed_task_count=Count('tasks', filter=Q(tasks__is_completed=True)),
+    ))
+    for step in steps:
+        step.total_tasks, step.completed_tasks = step.task_count, step.completed_task_count
+    Step.objects.bulk_update(steps, ['total_tasks', 'completed_tasks'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow_builder', '0003_remove_step_responsible_person_task_completed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='step',
+            name='completed_tasks',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='total_tasks',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_tasks, migrations.RunPython.noop),
+    ]
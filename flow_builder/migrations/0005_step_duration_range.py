@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow_builder', '0004_step_task_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='step',
+            name='optimistic_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Fewest days this step could take', null=True),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='pessimistic_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Most days this step could take', null=True),
+        ),
+    ]
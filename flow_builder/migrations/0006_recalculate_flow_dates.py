@@ -0,0 +1,62 @@
+import datetime
+from collections import defaultdict, deque
+
+from django.db import migrations
+
+
+def recalculate_flows(apps, schema_editor):
+    # Planned dates stored before the critical-path scheduler used the old rules
+    # (each step chained after the previous one); recompute every flow so partial
+    # reschedules don't mix the two. A copy of the scheduler's forward pass as it
+    # stood, so later changes to flow_builder.scheduling can't alter this migration.
+    Flow = apps.get_model('flow_builder', 'Flow')
+    Step = apps.get_model('flow_builder', 'Step')
+    Dependency = Step.dependencies.through
+
+    for flow in Flow.objects.all():
+        steps = {step.pk: step for step in Step.objects.filter(flow=flow)}
+        dependencies, dependents = defaultdict(list), defaultdict(list)
+        edges = Dependency.objects.filter(from_step__flow=flow, to_step__flow=flow)
+        for step_id, dependency_id in edges.values_list('from_step_id', 'to_step_id'):
+            dependencies[step_id].append(dependency_id)
+            dependents[dependency_id].append(step_id)
+
+        # Every step after its dependencies (Kahn's algorithm, ties by id)
+        remaining = {step_id: len(dependencies[step_id]) for step_id in steps}
+        ready = deque(sorted(step_id for step_id, count in remaining.items() if count == 0))
+        order = []
+        while ready:
+            step_id = ready.popleft()
+            order.append(step_id)
+            for dependent_id in dependents[step_id]:
+                remaining[dependent_id] -= 1
+                if remaining[dependent_id] == 0:
+                    ready.append(dependent_id)
+        if len(order) < len(steps):
+            # A dependency cycle; fixing it reschedules the flow
+            continue
+
+        finishes, changed = {}, []
+        for step_id in order:
+            step = steps[step_id]
+            start = max([flow.start_date] + [finishes[dep_id] for dep_id in dependencies[step_id]])
+            # Actual dates override the plan
+            if step.actual_start_date:
+                start = step.actual_start_date
+            finish = step.actual_end_date or start + datetime.timedelta(days=step.time_allotted_days)
+            finishes[step_id] = finish
+            if (step.planned_start_date, step.planned_end_date) != (start, finish):
+                step.planned_start_date, step.planned_end_date = start, finish
+                changed.append(step)
+        Step.objects.bulk_update(changed, ['planned_start_date', 'planned_end_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow_builder', '0005_step_duration_range'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalculate_flows, migrations.RunPython.noop),
+    ]
@@ -31,75 +31,24 @@ class Flow(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     
-    # Flag to prevent recursion during recalculation
-    _recalculating = False
-
     def __str__(self):
         return self.name
 
     def get_steps_in_order(self) -> List['Step']:
         """Topological sort of steps based on dependencies to get execution order."""
-        steps = list(self.steps.all())
-        visited = set()
-        rec_stack = set()
-        order = []
-
-        def visit(step):
-            if step in rec_stack:
-                raise ValidationError(f"Cycle detected in dependencies involving step: {step.title}")
-            if step not in visited:
-                visited.add(step)
-                rec_stack.add(step)
-                for dep in step.dependencies.all():
-                    if dep.flow == self:  # Only intra-flow deps
-                        visit(dep)
-                rec_stack.remove(step)
-                order.append(step)
-
-        for step in steps:
-            if step not in visited:
-                visit(step)
-
-        return order
-
-    def recalculate_dates(self):
+        from .scheduling import FlowGraph
+        return FlowGraph.load(self).ordered_steps()
+
+    def recalculate_dates(self, changed_steps=None):
         """Recalculate all planned dates for steps based on start_date, deps, and time_allotted.
-        Call this after creating/updating steps or flow start_date."""
-        # Prevent recursion
-        if self._recalculating:
-            return
-        self._recalculating = True
-        
-        try:
-            ordered_steps = self.get_steps_in_order()
-            current_date = self.start_date
-
-            for step in ordered_steps:
-                # Planned start: max of flow start or latest dep actual/planned end
-                dep_end = current_date
-                for dep in step.dependencies.all():
-                    if dep.flow == self:
-                        # Use actual end date if available, otherwise planned end date
-                        dep_end_date = dep.actual_end_date or dep.planned_end_date or current_date
-                        dep_end = max(dep_end, dep_end_date)
-
-                # If step has actual start date, use it as the base
-                if step.actual_start_date:
-                    step.planned_start_date = step.actual_start_date
-                    step.planned_end_date = step.actual_start_date + datetime.timedelta(days=step.time_allotted_days)
-                else:
-                    step.planned_start_date = dep_end
-                    step.planned_end_date = dep_end + datetime.timedelta(days=step.time_allotted_days)
-
-                # If step has actual end date, use it as the planned end date
-                if step.actual_end_date:
-                    step.planned_end_date = step.actual_end_date
-
-                # If no actual end yet, but planned is set, that's fine; actuals will trigger updates
-                step.save(update_fields=['planned_start_date', 'planned_end_date'], skip_recalc=True)
-                current_date = step.planned_end_date + datetime.timedelta(days=1)  # Assume 1 day buffer if sequential
-        finally:
-            self._recalculating = False
+        Call this after creating/updating steps or flow start_date.
+
+        With ``changed_steps`` (step ids), only those steps and their dependents are
+        rescheduled (see flow_builder.scheduling)."""
+        from .scheduling import recalculate_downstream, recalculate_flow
+        if changed_steps is not None:
+            return recalculate_downstream(self, changed_steps)
+        return recalculate_flow(self)
 
     def save(self, *args, **kwargs):
         # Check if this is a new instance or if start_date changed
@@ -115,7 +64,7 @@ class Flow(models.Model):
         super().save(*args, **kwargs)
         
         # Only recalculate dates if it's a new flow or start_date changed
-        if not self._recalculating and (is_new or start_date_changed):
+        if is_new or start_date_changed:
             self.recalculate_dates()
 
 
@@ -124,6 +73,9 @@ class Step(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     time_allotted_days = models.PositiveIntegerField(default=1, help_text="Days allotted for this step")
+    # Optional range around the allotted days, for schedule risk simulation
+    optimistic_days = models.PositiveIntegerField(null=True, blank=True, help_text="Fewest days this step could take")
+    pessimistic_days = models.PositiveIntegerField(null=True, blank=True, help_text="Most days this step could take")
     dependencies = models.ManyToManyField('self', symmetrical=False, blank=True, related_name='dependents', help_text="Steps that must complete before this one starts")
 
     # Dates: Planned based on flow/deps; Actual set by user on completion
@@ -135,6 +87,13 @@ class Step(models.Model):
     
     # Progress tracking
     progress_percentage = models.PositiveIntegerField(default=0, help_text="Percentage complete based on tasks")
+    # Kept in step with the tasks by flow_builder.signals; repair with reconcile_task_counters
+    total_tasks = models.PositiveIntegerField(default=0, editable=False)
+    completed_tasks = models.PositiveIntegerField(default=0, editable=False)
+    COUNTER_FIELDS = ('total_tasks', 'completed_tasks')
+
+    # Fields that move this step's dates (and so its dependents' dates) when they change
+    SCHEDULE_FIELDS = ('time_allotted_days', 'actual_start_date', 'actual_end_date')
 
     class Meta:
         unique_together = ['flow', 'title']  # Prevent duplicate titles per flow
@@ -142,26 +101,76 @@ class Step(models.Model):
     def __str__(self):
         return f"{self.title} in {self.flow.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the scheduling inputs as loaded, to tell on save whether they changed
+        if all(name in instance.__dict__ for name in cls.SCHEDULE_FIELDS):
+            instance._loaded_schedule = instance.schedule_values()
+        return instance
+
+    def clean(self):
+        if self.optimistic_days is not None and self.optimistic_days > self.time_allotted_days:
+            raise ValidationError({'optimistic_days': "Can't be more than the days allotted."})
+        if self.pessimistic_days is not None and self.pessimistic_days < self.time_allotted_days:
+            raise ValidationError({'pessimistic_days': "Can't be less than the days allotted."})
+
+    def duration_range(self):
+        """(fewest, most likely, most) days; the allotted days when no range is given"""
+        likely = self.time_allotted_days
+        low = likely if self.optimistic_days is None else min(self.optimistic_days, likely)
+        high = likely if self.pessimistic_days is None else max(self.pessimistic_days, likely)
+        return low, likely, high
+
+    def schedule_values(self):
+        return tuple(getattr(self, name) for name in self.SCHEDULE_FIELDS)
+
+    def schedule_changed(self):
+        """Whether saving this step can move any dates (always true for new steps)"""
+        return self._state.adding or getattr(self, '_loaded_schedule', None) != self.schedule_values()
+
+    def fields_without_counters(self):
+        """
+        Loaded fields to write on a full save. The task counters are left out: they
+        move by F() updates, and writing back the counts as loaded would undo the
+        updates of tasks saved by other requests since.
+        """
+        deferred = self.get_deferred_fields()
+        return [
+            field.attname for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname not in self.COUNTER_FIELDS and field.attname not in deferred
+        ]
+
     def save(self, *args, **kwargs):
         # Extract custom arguments
         skip_recalc = kwargs.pop('skip_recalc', False)
         
         # Check if this is a recursive call from recalculate_dates or signals
-        if kwargs.get('update_fields') or skip_recalc:
+        recursive = kwargs.get('update_fields') or skip_recalc
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = self.fields_without_counters()
+        if recursive:
             # This is a call from recalculate_dates or signals, don't trigger it again
             super().save(*args, **kwargs)
         else:
+            schedule_changed = self.schedule_changed()
             super().save(*args, **kwargs)
-            if self.flow:
-                self.flow.recalculate_dates()  # Trigger recalc on save
-
-    def calculate_progress(self):
-        """Calculate progress percentage based on completed tasks."""
-        total_tasks = self.tasks.count()
+            self._loaded_schedule = self.schedule_values()
+            if schedule_changed and self.flow_id:
+                # Only this step and the steps downstream of it can move, once the transaction commits
+                from .signals import request_reschedule
+                request_reschedule(self.flow_id, [self.pk])
+
+    @staticmethod
+    def progress_for(total_tasks, completed_tasks):
+        """Percentage complete given the number of tasks and completed tasks."""
         if total_tasks == 0:
             return 0
-        completed_tasks = self.tasks.filter(is_completed=True).count()
         return int((completed_tasks / total_tasks) * 100)
+
+    def calculate_progress(self):
+        """Calculate progress percentage based on completed tasks (from the task counters)."""
+        return self.progress_for(self.total_tasks, self.completed_tasks)
     
     def update_progress(self):
         """Update progress percentage and check if step should be marked complete."""
@@ -204,6 +213,17 @@ class Task(models.Model):
 
     def __str__(self):
         return f"{self.title} ({self.step.title})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What this task counts towards as loaded, for the step's task counters
+        if 'step_id' in instance.__dict__ and 'is_completed' in instance.__dict__:
+            instance._counted_as = instance.counted_as()
+        return instance
+
+    def counted_as(self):
+        return (self.step_id, self.is_completed)
     
     def can_be_completed_by(self, user):
         """Check if the given user can complete this task."""
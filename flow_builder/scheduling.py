@@ -0,0 +1,220 @@
+"""
+Critical-path scheduling of a flow's steps.
+
+A flow's steps and their dependency edges are loaded with two queries into a
+``FlowGraph``. ``FlowGraph.schedule()`` then runs, in memory, the forward pass
+(earliest start/finish, from the flow start and each step's dependencies) and the
+backward pass (latest start/finish and slack). Steps with no slack form the
+critical path. ``recalculate_flow`` writes the earliest dates back as the steps'
+planned dates, updating only the steps whose dates changed.
+
+When a single step changes (its duration, actual dates or dependencies),
+``recalculate_downstream`` recomputes only that step and the steps that depend on
+it, directly or indirectly; every other step keeps its stored dates.
+
+``find_cycle`` checks new dependency edges before they are stored, so forms, the
+admin and the dependency signals reject cycles instead of a later recalculation
+failing on them.
+"""
+import datetime
+from collections import defaultdict, deque, namedtuple
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+
+class StepSchedule(namedtuple('StepSchedule', [
+    'earliest_start', 'earliest_finish', 'latest_start', 'latest_finish', 'slack',
+])):
+    """Computed dates of one step; ``slack`` is in days"""
+
+    @property
+    def is_critical(self):
+        return self.slack <= 0
+
+
+def as_date(value):
+    """A DateField value that may still be the ``timezone.now`` default of an unsaved flow"""
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+class FlowGraph:
+    """The dependency DAG of one flow: its steps and the edges between them"""
+
+    def __init__(self, flow, steps, edges):
+        self.flow = flow
+        self.steps = {step.pk: step for step in steps}
+        # step id -> ids of the steps it depends on, and the reverse
+        self.dependencies = defaultdict(list)
+        self.dependents = defaultdict(list)
+        for step_id, dependency_id in edges:
+            if step_id in self.steps and dependency_id in self.steps:
+                self.dependencies[step_id].append(dependency_id)
+                self.dependents[dependency_id].append(step_id)
+
+    @classmethod
+    def load(cls, flow):
+        """Steps and intra-flow dependency edges of a flow, in two queries"""
+        Step = flow.steps.model
+        steps = list(flow.steps.order_by('pk'))
+        edges = Step.dependencies.through.objects.filter(
+            from_step__flow=flow, to_step__flow=flow
+        ).values_list('from_step_id', 'to_step_id')
+        return cls(flow, steps, edges)
+
+    def topological_order(self, step_ids=None):
+        """
+        Step ids with every step after its dependencies (Kahn's algorithm, ties by
+        id), for the whole flow or for a downstream closure (counting only the
+        edges inside it).
+        """
+        step_ids = set(self.steps) if step_ids is None else step_ids
+        remaining = {
+            step_id: sum(dep_id in step_ids for dep_id in self.dependencies[step_id]) for step_id in step_ids
+        }
+        ready = deque(sorted(step_id for step_id, count in remaining.items() if count == 0))
+        order = []
+        while ready:
+            step_id = ready.popleft()
+            order.append(step_id)
+            for dependent_id in self.dependents[step_id]:
+                remaining[dependent_id] -= 1
+                if remaining[dependent_id] == 0:
+                    ready.append(dependent_id)
+        if len(order) < len(step_ids):
+            blocked = min(step_id for step_id, count in remaining.items() if count > 0)
+            raise ValidationError(f"Cycle detected in dependencies involving step: {self.steps[blocked].title}")
+        return order
+
+    def ordered_steps(self):
+        return [self.steps[step_id] for step_id in self.topological_order()]
+
+    def downstream(self, step_ids):
+        """The given steps and every step that depends on them, directly or indirectly"""
+        closure = set()
+        pending = [step_id for step_id in step_ids if step_id in self.steps]
+        while pending:
+            step_id = pending.pop()
+            if step_id not in closure:
+                closure.add(step_id)
+                pending.extend(self.dependents[step_id])
+        return closure
+
+    def forward_pass(self, step_ids=None):
+        """
+        Earliest start and finish dates per step id, for every step or for a
+        downstream closure; dependencies outside the closure count with their
+        stored planned end dates.
+        """
+        order = self.topological_order(step_ids)
+        flow_start = as_date(self.flow.start_date)
+        starts, finishes = {}, {}
+
+        for step_id in order:
+            step = self.steps[step_id]
+            start = max([flow_start] + [
+                finishes[dep_id] if dep_id in finishes else self.steps[dep_id].planned_end_date
+                for dep_id in self.dependencies[step_id]
+            ])
+            # Actual dates override the plan
+            if step.actual_start_date:
+                start = step.actual_start_date
+            finish = step.actual_end_date or start + datetime.timedelta(days=step.time_allotted_days)
+            starts[step_id], finishes[step_id] = start, finish
+        return order, starts, finishes
+
+    def schedule(self):
+        """``StepSchedule`` per step id, from a forward and a backward pass"""
+        order, starts, finishes = self.forward_pass()
+
+        project_finish = max(finishes.values(), default=as_date(self.flow.start_date))
+        schedule = {}
+        for step_id in reversed(order):
+            successors = self.dependents[step_id]
+            latest_finish = min((schedule[s].latest_start for s in successors), default=project_finish)
+            latest_start = latest_finish - (finishes[step_id] - starts[step_id])
+            schedule[step_id] = StepSchedule(
+                starts[step_id], finishes[step_id], latest_start, latest_finish,
+                (latest_start - starts[step_id]).days,
+            )
+        return schedule
+
+
+def recalculate_flow(flow):
+    """
+    Schedule a flow and store the earliest dates as planned dates, with one
+    ``bulk_update`` of just the steps whose dates changed. Returns the schedule.
+    """
+    graph = FlowGraph.load(flow)
+    schedule = graph.schedule()
+    _store_dates(graph, {
+        step_id: (times.earliest_start, times.earliest_finish) for step_id, times in schedule.items()
+    })
+    return schedule
+
+
+def recalculate_downstream(flow, step_ids):
+    """
+    Reschedule only the given steps and their downstream closure, storing the
+    dates that changed. Returns the updated steps.
+
+    Falls back to a full recalculation while a dependency outside the closure has
+    never been scheduled.
+    """
+    graph = FlowGraph.load(flow)
+    closure = graph.downstream(step_ids)
+    unscheduled = any(
+        graph.steps[dep_id].planned_end_date is None
+        for step_id in closure for dep_id in graph.dependencies[step_id] if dep_id not in closure
+    )
+    if unscheduled:
+        closure = None
+    _, starts, finishes = graph.forward_pass(closure)
+    return _store_dates(graph, {step_id: (starts[step_id], finishes[step_id]) for step_id in starts})
+
+
+def _store_dates(graph, dates):
+    """Set planned dates and bulk-update the steps whose dates changed"""
+    changed = []
+    for step_id, (start, finish) in dates.items():
+        step = graph.steps[step_id]
+        if (step.planned_start_date, step.planned_end_date) != (start, finish):
+            step.planned_start_date, step.planned_end_date = start, finish
+            changed.append(step)
+    if changed:
+        graph.flow.steps.model.objects.bulk_update(changed, ['planned_start_date', 'planned_end_date'])
+    return changed
+
+
+def find_cycle(flow, step_ids, dependency_ids):
+    """
+    Whether making each of ``step_ids`` depend on each of ``dependency_ids`` would
+    close a cycle: it does if one of the dependencies already depends on one of the
+    steps, directly or indirectly. Returns the first such dependency id, or None.
+
+    Loads the flow's (or flow id's) edges with one query and walks them once, O(V+E).
+    """
+    step_ids, dependency_ids = set(step_ids), set(dependency_ids)
+    if step_ids & dependency_ids:
+        return min(step_ids & dependency_ids)
+
+    Step = apps.get_model('flow_builder', 'Step')
+    dependents = defaultdict(list)
+    edges = Step.dependencies.through.objects.filter(from_step__flow=flow).values_list('from_step_id', 'to_step_id')
+    for step_id, dependency_id in edges:
+        dependents[dependency_id].append(step_id)
+
+    # Everything downstream of the steps; reaching a dependency closes the loop
+    seen = set(step_ids)
+    pending = deque(sorted(step_ids))
+    while pending:
+        for dependent_id in dependents[pending.popleft()]:
+            if dependent_id in dependency_ids:
+                return dependent_id
+            if dependent_id not in seen:
+                seen.add(dependent_id)
+                pending.append(dependent_id)
+    return None
@@ -1,36 +1,245 @@
-from django.db.models.signals import post_save, pre_save
+"""
+Signal handlers that keep step progress and planned dates up to date.
+
+Task saves and deletes adjust their step's ``total_tasks``/``completed_tasks``
+counters right away, with ``F()`` updates. Progress is read from those counters,
+so no aggregate queries are needed (``reconcile_task_counters`` repairs them).
+
+Handlers don't recalculate anything themselves. They record what needs
+recalculating (a step's progress from its tasks, the downstream closure of a
+step, or a whole flow) in a batch for the current transaction. The batch runs
+once, through ``transaction.on_commit``, when the transaction commits.
+Completing 50 tasks in one transaction therefore counts each step's tasks and
+reschedules each flow once. Outside a transaction the batch runs right away.
+Last, the batch bumps the schedule version of every flow it touched, which
+invalidates their cached timelines.
+
+Rollbacks are left to ``on_commit``, which discards the callbacks registered in
+a rolled-back transaction or savepoint. Each request is registered as its own
+callback, and the batch (registered first) only applies the requests whose
+callbacks are still pending. The batch and the requests are only referenced
+weakly here, so once Django discards them they are gone (CPython frees them as
+soon as the last reference is dropped); nothing reads Django's callback list.
+"""
+import threading
+import weakref
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from .models import Step, Flow, Task
-import datetime
+from .scheduling import find_cycle
+from .versions import bump_schedule_version
+
+_local = threading.local()
+
+
+class PendingRecalculation:
+    """Recalculations requested during one transaction, deduplicated per step and per flow"""
+
+    def __init__(self, alias=None):
+        self.alias = alias
+        # Weak references to the requests registered with on_commit
+        self.requests = []
+        self.progress_steps = set()
+        # flow id -> ids of the steps to reschedule downstream of
+        self.changed_steps = defaultdict(set)
+        self.full_flows = set()
+        # Flows whose cached timelines are out of date
+        self.touched_flows = set()
+
+    def __call__(self):
+        # Requests made from here on belong to the next batch
+        batches = _pending_batches()
+        if batches.get(self.alias) is self:
+            del batches[self.alias]
+        # Requests of rolled-back savepoints were discarded along with their callbacks
+        for ref in self.requests:
+            request = ref()
+            if request is not None:
+                request.add(self)
+        if self.progress_steps or self.changed_steps or self.full_flows:
+            with transaction.atomic():
+                self.update_progress()
+                self.reschedule()
+        bump_schedule_version(*self.touched_flows | self.full_flows | set(self.changed_steps))
+
+    def update_progress(self):
+        """Progress of every requested step, from their task counters as committed"""
+        if not self.progress_steps:
+            return
+        changed = []
+        for step in Step.objects.filter(pk__in=self.progress_steps):
+            self.touched_flows.add(step.flow_id)
+            before = (step.progress_percentage, step.is_completed, step.actual_end_date)
+            step.update_progress()
+            if (step.progress_percentage, step.is_completed, step.actual_end_date) != before:
+                changed.append(step)
+            if step.actual_end_date != before[2]:
+                self.changed_steps[step.flow_id].add(step.pk)
+        if changed:
+            Step.objects.bulk_update(changed, ['progress_percentage', 'is_completed', 'actual_end_date'])
+
+    def reschedule(self):
+        flows = Flow.objects.in_bulk(self.full_flows | set(self.changed_steps))
+        for flow_id, flow in flows.items():
+            if flow_id in self.full_flows:
+                flow.recalculate_dates()
+            else:
+                flow.recalculate_dates(changed_steps=self.changed_steps[flow_id])
+
+
+def _pending_batches():
+    """Connection alias -> batch of its current transaction, dropped once Django discards it"""
+    if not hasattr(_local, 'batches'):
+        _local.batches = weakref.WeakValueDictionary()
+    return _local.batches
+
+
+class _Request:
+    """One request, registered with on_commit so that a rollback discards it"""
+
+    def __init__(self, add):
+        self.add = add
+
+    def __call__(self):
+        # Applied by the batch, which was registered before it and has already run
+        pass
+
+
+def request_progress_update(step_id):
+    """Recount a step's tasks on commit, rescheduling its dependents if its completion changes"""
+    _request(lambda batch: batch.progress_steps.add(step_id))
+
+
+def request_reschedule(flow_id, step_ids=None):
+    """Reschedule the downstream closure of ``step_ids`` on commit, or the whole flow without them"""
+    if step_ids is None:
+        _request(lambda batch: batch.full_flows.add(flow_id))
+    else:
+        _request(lambda batch: batch.changed_steps[flow_id].update(step_ids))
+
+
+def request_timeline_refresh(flow_id):
+    """Invalidate a flow's cached timeline on commit"""
+    _request(lambda batch: batch.touched_flows.add(flow_id))
+
+
+def _request(add):
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        # on_commit would run the batch immediately, before the request was added
+        batch = PendingRecalculation(connection.alias)
+        add(batch)
+        batch()
+        return
+    batches = _pending_batches()
+    batch = batches.get(connection.alias)
+    if batch is None:
+        batch = batches[connection.alias] = PendingRecalculation(connection.alias)
+        transaction.on_commit(batch)
+    request = _Request(add)
+    batch.requests.append(weakref.ref(request))
+    transaction.on_commit(request)
+
+
+@receiver(m2m_changed, sender=Step.dependencies.through)
+def reject_dependency_cycles(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refuse to store dependency edges that would close a cycle"""
+    if action != 'pre_add' or not pk_set:
+        return
+    # Forward, the instance gains dependencies; reverse, it becomes a dependency of pk_set
+    step_ids, dependency_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    if find_cycle(instance.flow_id, step_ids, dependency_ids) is not None:
+        raise ValidationError(f"Cycle detected in dependencies involving step: {instance.title}")
+
+
+@receiver(m2m_changed, sender=Step.dependencies.through)
+def reschedule_on_dependency_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reschedule the steps whose dependencies were edited, and everything downstream of them"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        request_reschedule(instance.flow_id, [instance.pk])
+    elif pk_set:
+        # Edited from the dependency's side: the steps in pk_set gained or lost it
+        request_reschedule(instance.flow_id, pk_set)
+    else:
+        # A reverse clear doesn't say which dependents were affected
+        request_reschedule(instance.flow_id)
+
+
+@receiver(post_save, sender=Flow)
+@receiver(post_delete, sender=Flow)
+def refresh_flow_timeline(sender, instance: Flow, **kwargs):
+    request_timeline_refresh(instance.pk)
 
 
 @receiver(post_save, sender=Step)
-def propagate_completion(sender, instance: Step, **kwargs):
-    if instance.actual_end_date and not kwargs.get('created', False):  # Only on update with actual end set
-        # Recalc dependents
-        for dependent in instance.dependents.filter(flow=instance.flow):
-            # Dependent's planned/actual start = max(its current, this instance's actual end)
-            new_start = max(dependent.planned_start_date or instance.flow.start_date, instance.actual_end_date)
-            dependent.planned_start_date = new_start
-            dependent.planned_end_date = new_start + datetime.timedelta(days=dependent.time_allotted_days)
-            dependent.save(skip_recalc=True)  # Skip recalc to prevent recursion
+def refresh_step_timeline(sender, instance: Step, **kwargs):
+    """Rescheduling is requested by Step.save(); other edits still change the timeline"""
+    request_timeline_refresh(instance.flow_id)
+
+
+@receiver(post_delete, sender=Step)
+def reschedule_on_step_delete(sender, instance: Step, **kwargs):
+    """The deleted step's dependents lost a dependency"""
+    request_reschedule(instance.flow_id)
+
+
+@receiver(pre_save, sender=Task)
+def set_completed_at(sender, instance: Task, **kwargs):
+    """Stamp when a task was completed."""
+    if instance.is_completed and not instance.completed_at:
+        instance.completed_at = timezone.now()
+
+
+def _adjust_task_counters(before, after):
+    """
+    Move a task's count from ``before`` to ``after``, each a (step id, is completed)
+    pair or None, with F() updates so concurrent task saves can't lose counts.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for counted_as, sign in ((before, -1), (after, 1)):
+        if counted_as is not None and counted_as[0] is not None:
+            step_id, is_completed = counted_as
+            deltas[step_id][0] += sign
+            deltas[step_id][1] += sign * is_completed
+    for step_id, (total, completed) in deltas.items():
+        updates = {}
+        if total:
+            updates['total_tasks'] = F('total_tasks') + total
+        if completed:
+            updates['completed_tasks'] = F('completed_tasks') + completed
+        if updates:
+            Step.objects.filter(pk=step_id).update(**updates)
+            request_progress_update(step_id)
 
 
 @receiver(post_save, sender=Task)
-def update_step_progress(sender, instance: Task, **kwargs):
-    """Update step progress when a task is completed or created."""
-    if instance.step:
-        # If task was just completed, set completion tracking
-        if instance.is_completed and not instance.completed_at:
-            instance.completed_at = timezone.now()
-            instance.save(update_fields=['completed_at'], skip_recalc=True)
-        
-        instance.step.update_progress()
-        instance.step.save(update_fields=['progress_percentage', 'is_completed', 'actual_end_date'], skip_recalc=True)
-        
-        # If step is now complete, trigger flow recalculation
-        if instance.step.is_completed:
-            instance.step.flow.recalculate_dates()
+def update_step_progress(sender, instance: Task, created, **kwargs):
+    """Update step task counters and progress when a task is created or changed."""
+    if created:
+        before = None
+    elif hasattr(instance, '_counted_as'):
+        before = instance._counted_as
+    else:
+        # Saved without being loaded: what it counted as is unknown, so only recount progress
+        if instance.step_id:
+            request_progress_update(instance.step_id)
+        return
+    instance._counted_as = instance.counted_as()
+    _adjust_task_counters(before, instance._counted_as)
+
+
+@receiver(post_delete, sender=Task)
+def update_step_progress_on_delete(sender, instance: Task, **kwargs):
+    """Update step task counters and progress when a task is deleted."""
+    _adjust_task_counters(getattr(instance, '_counted_as', instance.counted_as()), None)
 
 
 @receiver(pre_save, sender=Task)
@@ -0,0 +1,127 @@
+"""
+Monte Carlo schedule risk of a flow.
+
+Each step's duration is drawn from a triangular distribution. It runs from the
+step's optimistic to its pessimistic days and peaks at its allotted days; a
+step without a range always takes its allotted days. All iterations are drawn
+at once, as a steps x iterations NumPy array. The forward and backward passes
+of flow_builder.scheduling then run on whole rows, so the Python loops are over
+steps only. 10,000 iterations of a 200-step flow take a fraction of a second.
+Iterations run in chunks of at most ``CHUNK_CELLS`` steps x iterations, which
+bounds memory whatever the flow's size; only each run's finish and the steps'
+critical-run counts are kept across chunks.
+
+The result gives the dates by which the flow finishes in 50/80/95% of the
+iterations. It also gives each step's criticality index: the share of
+iterations in which the step was on the critical path. Actual dates are fixed,
+as in the deterministic schedule.
+"""
+import datetime
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from .scheduling import FlowGraph, as_date
+
+DEFAULT_ITERATIONS = 10000
+PERCENTILES = (50, 80, 95)
+# Array cells (steps x iterations) simulated at once, about 16 MB per array
+CHUNK_CELLS = 2000000
+
+SimulationResult = namedtuple('SimulationResult', [
+    'iterations',          # number of simulated runs
+    'completion_dates',    # percentile -> date the flow finishes by
+    'mean_duration_days',  # average days from the flow start to its finish
+    'criticality',         # step id -> share of runs with the step on the critical path
+])
+
+
+def triangular(low, mode, high, iterations, rng):
+    """
+    ``iterations`` samples per row of triangular distributions given as arrays
+    of bounds, by inverting the CDF (rows with ``low == high`` are constant,
+    which ``Generator.triangular`` rejects).
+    """
+    low, mode, high = (np.asarray(bound, dtype=float)[:, None] for bound in (low, mode, high))
+    width = high - low
+    uniform = rng.random((low.shape[0], iterations))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        split = np.where(width > 0, (mode - low) / width, 0.0)
+    return np.where(
+        uniform < split,
+        low + np.sqrt(uniform * width * (mode - low)),
+        high - np.sqrt((1 - uniform) * width * (high - mode)),
+    )
+
+
+def simulate_graph(graph, iterations=DEFAULT_ITERATIONS, seed=None):
+    """Simulate a loaded ``FlowGraph``; see the module docstring"""
+    flow_start = as_date(graph.flow.start_date)
+    order = graph.topological_order()
+    if not order:
+        return SimulationResult(iterations, {p: flow_start for p in PERCENTILES}, 0.0, {})
+
+    steps = [graph.steps[step_id] for step_id in order]
+    index = {step_id: position for position, step_id in enumerate(order)}
+    dependencies = [[index[dep_id] for dep_id in graph.dependencies[step.pk]] for step in steps]
+    dependents = [[index[step_id] for step_id in graph.dependents[step.pk]] for step in steps]
+    duration_ranges = list(zip(*(step.duration_range() for step in steps)))
+    rng = np.random.default_rng(seed)
+
+    def offset(date):
+        return float((date - flow_start).days)
+
+    def simulate_chunk(chunk_iterations):
+        """Finish of each run, and how many runs each step was critical in"""
+        durations = triangular(*duration_ranges, chunk_iterations, rng)
+
+        # Forward pass, in days from the flow start
+        starts = np.empty_like(durations)
+        finishes = np.empty_like(durations)
+        for position, step in enumerate(steps):
+            if step.actual_start_date:
+                starts[position] = offset(step.actual_start_date)
+            elif dependencies[position]:
+                starts[position] = np.maximum(finishes[dependencies[position]].max(axis=0), 0.0)
+            else:
+                starts[position] = 0.0
+            if step.actual_end_date:
+                finishes[position] = offset(step.actual_end_date)
+            else:
+                finishes[position] = starts[position] + durations[position]
+        project_finish = finishes.max(axis=0)
+
+        # Backward pass; a step is critical in the runs where it has no slack
+        latest_starts = np.empty_like(durations)
+        for position in reversed(range(len(steps))):
+            successors = dependents[position]
+            latest_finish = latest_starts[successors].min(axis=0) if successors else project_finish
+            latest_starts[position] = latest_finish - (finishes[position] - starts[position])
+        critical_runs = (latest_starts - starts <= 1e-9).sum(axis=1)
+        return project_finish, critical_runs
+
+    chunk_size = max(1, CHUNK_CELLS // len(steps))
+    finishes, critical_runs = [], np.zeros(len(steps), dtype=np.int64)
+    for chunk_start in range(0, iterations, chunk_size):
+        chunk_finishes, chunk_critical_runs = simulate_chunk(min(chunk_size, iterations - chunk_start))
+        finishes.append(chunk_finishes)
+        critical_runs += chunk_critical_runs
+    project_finish = np.concatenate(finishes)
+
+    percentiles = np.percentile(project_finish, PERCENTILES)
+    return SimulationResult(
+        iterations=iterations,
+        # Whole days, like the deterministic schedule (rounded first to drop float noise)
+        completion_dates={
+            p: flow_start + datetime.timedelta(days=math.ceil(round(float(days), 6)))
+            for p, days in zip(PERCENTILES, percentiles)
+        },
+        mean_duration_days=round(float(project_finish.mean()), 2),
+        criticality={step.pk: round(float(critical_runs[position] / iterations), 3) for position, step in enumerate(steps)},
+    )
+
+
+def simulate_flow(flow, iterations=DEFAULT_ITERATIONS, seed=None):
+    """Simulate a flow's schedule; loads its steps and edges in two queries"""
+    return simulate_graph(FlowGraph.load(flow), iterations, seed)
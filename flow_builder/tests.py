@@ -1,3 +1,439 @@
+import datetime
+import importlib
+import time
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .forms import StepAdminForm, StepForm
+from .models import Flow, Step, Task
+from .scheduling import FlowGraph, find_cycle, recalculate_downstream, recalculate_flow
+from .signals import PendingRecalculation, request_reschedule, request_timeline_refresh
+from . import simulation
+from .simulation import simulate_flow, simulate_graph
+
+START = datetime.date(2025, 1, 6)
+
+
+def days(count):
+    return START + datetime.timedelta(days=count)
+
+
+class FlowTestCase(TestCase):
+    """A diamond flow: design -> (build, docs) -> release"""
+
+    def setUp(self):
+        # Rescheduling runs when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flow = Flow.objects.create(name='Launch', start_date=START)
+            self.design = self.step('Design', 2)
+            self.build = self.step('Build', 5, self.design)
+            self.docs = self.step('Docs', 1, self.design)
+            self.release = self.step('Release', 1, self.build, self.docs)
+
+    def step(self, title, duration, *dependencies):
+        step = Step.objects.create(flow=self.flow, title=title, time_allotted_days=duration)
+        step.dependencies.set(dependencies)
+        return step
+
+    def refresh(self, *steps):
+        for step in steps:
+            step.refresh_from_db()
+
+    @contextmanager
+    def assertNumDataQueries(self, count):
+        """assertNumQueries, not counting savepoints or the queries of the database cache"""
+        with CaptureQueriesContext(connection) as queries:
+            yield
+        data_queries = [
+            query['sql'] for query in queries
+            if 'django_cache' not in query['sql'] and not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+        self.assertEqual(len(data_queries), count, '\n'.join(data_queries))
+
+
+class SchedulingTests(FlowTestCase):
+    def test_forward_and_backward_pass(self):
+        schedule = recalculate_flow(self.flow)
+
+        self.assertEqual(schedule[self.build.pk][:2], (days(2), days(7)))
+        self.assertEqual(schedule[self.release.pk][:2], (days(7), days(8)))
+        # Docs can slip until the build is done
+        self.assertEqual(schedule[self.docs.pk].latest_start, days(6))
+        self.assertEqual(schedule[self.docs.pk].slack, 4)
+        critical = {step_id for step_id, times in schedule.items() if times.is_critical}
+        self.assertEqual(critical, {self.design.pk, self.build.pk, self.release.pk})
+
+        self.refresh(self.release)
+        self.assertEqual((self.release.planned_start_date, self.release.planned_end_date), (days(7), days(8)))
+
+    def test_actual_dates_override_the_plan(self):
+        Step.objects.filter(pk=self.design.pk).update(actual_end_date=days(4))
+        schedule = recalculate_flow(self.flow)
+        self.assertEqual(schedule[self.build.pk].earliest_start, days(4))
+        self.assertEqual(schedule[self.release.pk].earliest_finish, days(10))
+
+    def test_unchanged_schedule_only_reads(self):
+        recalculate_flow(self.flow)
+        # Steps and edges, and no writes
+        with self.assertNumQueries(2):
+            recalculate_flow(self.flow)
+
+    def test_cycles_are_reported(self):
+        # Stored directly, skipping the signals that reschedule on dependency edits
+        Step.dependencies.through.objects.create(from_step=self.design, to_step=self.release)
+        with self.assertRaises(ValidationError):
+            FlowGraph.load(self.flow).topological_order()
+
+    def test_recalculate_flows_command(self):
+        # Dates stored by the old sequential scheduler
+        Step.objects.filter(flow=self.flow).update(planned_start_date=START, planned_end_date=START)
+        cyclic = Flow.objects.create(name='Cyclic', start_date=START)
+        first = Step.objects.create(flow=cyclic, title='First', time_allotted_days=1)
+        second = Step.objects.create(flow=cyclic, title='Second', time_allotted_days=1)
+        Step.dependencies.through.objects.create(from_step=first, to_step=second)
+        Step.dependencies.through.objects.create(from_step=second, to_step=first)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('recalculate_flows', stdout=out)
+        self.assertIn('Skipped flow "Cyclic"', out.getvalue())
+        self.assertIn('Recalculated 1 flow(s)', out.getvalue())
+        self.refresh(self.docs, self.release)
+        self.assertEqual((self.docs.planned_start_date, self.docs.planned_end_date), (days(2), days(3)))
+        self.assertEqual(self.release.planned_start_date, days(7))
+
+    def test_recalculation_migration_matches_the_scheduler(self):
+        Step.objects.filter(pk=self.design.pk).update(actual_end_date=days(4))
+        expected = recalculate_flow(self.flow)
+        Step.objects.filter(flow=self.flow).update(planned_start_date=START, planned_end_date=START)
+        cyclic = Flow.objects.create(name='Cyclic', start_date=START)
+        first = Step.objects.create(flow=cyclic, title='First', time_allotted_days=1)
+        Step.dependencies.through.objects.create(from_step=first, to_step=first)
+
+        migration = importlib.import_module('flow_builder.migrations.0006_recalculate_flow_dates')
+        state = MigrationExecutor(connection).loader.project_state(('flow_builder', '0006_recalculate_flow_dates'))
+        migration.recalculate_flows(state.apps, None)
+
+        for step in Step.objects.filter(flow=self.flow):
+            times = expected[step.pk]
+            self.assertEqual((step.planned_start_date, step.planned_end_date), (times.earliest_start, times.earliest_finish))
+
+
+class DownstreamRescheduleTests(FlowTestCase):
+    def test_only_the_downstream_closure_is_rescheduled(self):
+        graph = FlowGraph.load(self.flow)
+        self.assertEqual(graph.downstream([self.docs.pk]), {self.docs.pk, self.release.pk})
+
+        # Lengthening docs past the build moves docs and release, nothing upstream or parallel
+        Step.objects.filter(pk=self.docs.pk).update(time_allotted_days=8)
+        updated = recalculate_downstream(self.flow, [self.docs.pk])
+        self.assertEqual({step.pk for step in updated}, {self.docs.pk, self.release.pk})
+        self.refresh(self.release, self.build)
+        self.assertEqual(self.release.planned_start_date, days(10))
+        self.assertEqual(self.build.planned_end_date, days(7))
+
+    def test_save_reschedules_only_on_schedule_changes(self):
+        step = Step.objects.get(pk=self.docs.pk)
+        step.description = 'Write the manual'
+        # Just the step's own UPDATE (and a timeline refresh on commit)
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            step.save()
+
+        step.time_allotted_days = 8
+        with self.captureOnCommitCallbacks(execute=True):
+            step.save()
+        self.refresh(self.release)
+        self.assertEqual(self.release.planned_end_date, days(11))
+
+    def test_dependency_edits_reschedule(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.release.dependencies.remove(self.build)
+        self.refresh(self.release)
+        self.assertEqual(self.release.planned_start_date, days(3))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.build.dependents.add(self.release)
+        self.refresh(self.release)
+        self.assertEqual(self.release.planned_start_date, days(7))
+
+
+class CoalescedRecalculationTests(FlowTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tasks = [Task.objects.create(step=self.design, title=f'Review {number}') for number in range(50)]
+
+    def complete_all(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                for task in self.tasks:
+                    task.is_completed = True
+                    task.save()
+        return callbacks
+
+    def batches(self, callbacks):
+        return [callback for callback in callbacks if isinstance(callback, PendingRecalculation)]
+
+    def test_one_recalculation_per_transaction(self):
+        # The task and step counter UPDATEs, then once: load and update the step, load
+        # the flow, load its steps and edges, and update the moved steps
+        with self.assertNumDataQueries(2 * len(self.tasks) + 6):
+            callbacks = self.complete_all()
+        self.assertEqual(len(self.batches(callbacks)), 1)
+
+        self.refresh(self.design, self.build)
+        self.assertTrue(self.design.is_completed)
+        self.assertEqual(self.design.progress_percentage, 100)
+        self.assertIsNotNone(Task.objects.get(pk=self.tasks[0].pk).completed_at)
+        # Completion moved the dependents to follow the actual end date
+        self.assertEqual(self.build.planned_start_date, self.design.actual_end_date)
+
+    def test_rolled_back_requests_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                with transaction.atomic():
+                    self.tasks[0].is_completed = True
+                    self.tasks[0].save()
+                    transaction.set_rollback(True)
+                self.tasks[1].is_completed = True
+                self.tasks[1].save()
+        self.assertEqual(len(self.batches(callbacks)), 1)
+        self.refresh(self.design)
+        self.assertEqual(self.design.progress_percentage, 2)
+
+    def test_requests_of_rolled_back_savepoints_are_dropped(self):
+        # Dates gone stale without the signals noticing
+        Step.objects.filter(pk=self.docs.pk).update(planned_start_date=START)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                request_timeline_refresh(self.flow.pk)
+                with transaction.atomic():
+                    request_reschedule(self.flow.pk)
+                    transaction.set_rollback(True)
+        self.assertEqual(len(self.batches(callbacks)), 1)
+        self.refresh(self.docs)
+        self.assertEqual(self.docs.planned_start_date, START)
+
+
+class TaskCounterTests(FlowTestCase):
+    def add_task(self, step, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Task.objects.create(step=step, title=f'Task {step.total_tasks}', **kwargs)
+
+    def counters(self, step):
+        step.refresh_from_db()
+        return step.completed_tasks, step.total_tasks
+
+    def test_counters_follow_task_changes(self):
+        first = self.add_task(self.docs)
+        self.add_task(self.docs, is_completed=True)
+        self.assertEqual(self.counters(self.docs), (1, 2))
+
+        first = Task.objects.get(pk=first.pk)
+        first.is_completed = True
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.counters(self.docs), (2, 2))
+        self.assertTrue(self.docs.is_completed)
+
+        first.step = self.build
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.counters(self.build), (1, 1))
+        self.assertEqual(self.counters(self.docs), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.counters(self.build), (0, 0))
+        self.assertEqual(self.build.progress_percentage, 0)
+
+    def test_step_saves_keep_concurrent_counts(self):
+        step = Step.objects.get(pk=self.docs.pk)
+        # Another request adds tasks while this one edits the step
+        self.add_task(self.docs, is_completed=True)
+        self.add_task(self.docs)
+        step.description = 'Write the manual'
+        with self.captureOnCommitCallbacks(execute=True):
+            step.save()
+        self.assertEqual(self.counters(self.docs), (1, 2))
+        self.assertEqual(self.docs.description, 'Write the manual')
+
+    def test_progress_reads_no_tasks(self):
+        self.add_task(self.docs, is_completed=True)
+        self.add_task(self.docs)
+        self.docs.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.docs.calculate_progress(), 50)
+
+    def test_reconcile_repairs_drifted_counters(self):
+        self.add_task(self.docs, is_completed=True)
+        Step.objects.filter(pk=self.docs.pk).update(total_tasks=5, completed_tasks=0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_task_counters', stdout=StringIO())
+        self.assertEqual(self.counters(self.docs), (1, 1))
+        self.assertEqual(self.docs.progress_percentage, 100)
+
+
+class TimelineApiTests(FlowTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.url = reverse('flow_builder:api_flow_timeline', args=[self.flow.pk])
+
+    def test_timeline_payload(self):
+        # The flow, its steps and its edges
+        with self.assertNumDataQueries(3):
+            response = self.client.get(self.url)
+        data = response.json()
+
+        self.assertEqual([step['title'] for step in data['steps']], ['Design', 'Build', 'Docs', 'Release'])
+        self.assertEqual(data['finish_date'], days(8).isoformat())
+        docs = data['steps'][2]
+        self.assertEqual((docs['planned_start'], docs['slack_days'], docs['is_critical']), (days(2).isoformat(), 4, False))
+        self.assertEqual(len(data['edges']), 4)
+        self.assertIn([self.design.pk, self.build.pk], data['edges'])
+
+    def test_cached_until_the_schedule_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumDataQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(step=self.docs, title='Write the manual', is_completed=True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        docs = response.json()['steps'][2]
+        self.assertEqual((docs['progress'], docs['is_completed']), (100, True))
+
+    def test_admin_recalculation_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        # Bypassing the signals, as dates stored by an older scheduler would
+        Step.objects.filter(pk=self.docs.pk).update(planned_start_date=START)
+
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:flow_builder_flow_changelist'), {
+                'action': 'recalculate_dates',
+                '_selected_action': [self.flow.pk],
+            })
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['steps'][2]['planned_start'], days(2).isoformat())
+
+
+class CycleValidationTests(FlowTestCase):
+    def test_find_cycle(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(find_cycle(self.flow, [self.design.pk], [self.docs.pk, self.build.pk]), self.build.pk)
+        self.assertEqual(find_cycle(self.flow, [self.docs.pk], [self.docs.pk]), self.docs.pk)
+        self.assertIsNone(find_cycle(self.flow, [self.docs.pk], [self.build.pk]))
+
+    def test_dependency_edits_reject_cycles(self):
+        # The m2m add runs in the caller's transaction, which the error breaks
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.design.dependencies.add(self.release)
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.release.dependents.add(self.build)
+        self.assertFalse(self.design.dependencies.exists())
+
+    def test_step_form_rejects_cycles(self):
+        form = StepForm(
+            {'title': 'Design', 'time_allotted_days': 2, 'dependencies': [self.docs.pk]},
+            instance=self.design, flow=self.flow,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('"Docs" already depends on "Design"', form.errors['dependencies'][0])
+
+        form = StepForm(
+            {'title': 'Docs', 'time_allotted_days': 1, 'dependencies': [self.design.pk, self.build.pk]},
+            instance=self.docs, flow=self.flow,
+        )
+        self.assertTrue(form.is_valid())
+
+    def test_admin_form_rejects_cycles(self):
+        form = StepAdminForm(
+            {'flow': self.flow.pk, 'title': 'Build', 'time_allotted_days': 5, 'progress_percentage': 0,
+             'dependencies': [self.release.pk]},
+            instance=self.build,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('dependencies', form.errors)
+
+
+class ScheduleSimulationTests(FlowTestCase):
+    def test_fixed_durations_match_the_schedule(self):
+        result = simulate_flow(self.flow, iterations=100, seed=1)
+        self.assertEqual(set(result.completion_dates.values()), {days(8)})
+        self.assertEqual(result.criticality, {
+            self.design.pk: 1.0, self.build.pk: 1.0, self.docs.pk: 0.0, self.release.pk: 1.0,
+        })
+
+    def test_duration_ranges_spread_the_finish(self):
+        Step.objects.filter(pk=self.docs.pk).update(optimistic_days=1, pessimistic_days=15)
+        result = simulate_flow(self.flow, iterations=5000, seed=1)
+
+        dates = result.completion_dates
+        self.assertTrue(days(8) <= dates[50] <= dates[80] <= dates[95] <= days(18))
+        self.assertLess(dates[50], dates[95])
+        # Docs outruns the build in part of the runs, taking its place on the critical path
+        self.assertTrue(0 < result.criticality[self.docs.pk] < 1)
+        self.assertAlmostEqual(result.criticality[self.docs.pk] + result.criticality[self.build.pk], 1, delta=0.01)
+
+    def test_large_flow_is_fast(self):
+        # 200 steps in 20 layers, each depending on two steps of the layer before
+        steps = [Step(pk=number, flow=self.flow, title=str(number), time_allotted_days=3,
+                      optimistic_days=2, pessimistic_days=8) for number in range(200)]
+        edges = [(number, number - 10) for number in range(10, 200)]
+        edges += [(number, number - 11) for number in range(10, 200) if number % 10]
+        graph = FlowGraph(self.flow, steps, edges)
+
+        started = time.perf_counter()
+        result = simulate_graph(graph, iterations=10000, seed=1)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(len(result.criticality), 200)
+
+    def test_iterations_run_in_chunks(self):
+        Step.objects.filter(pk=self.docs.pk).update(optimistic_days=1, pessimistic_days=15)
+        # 10 iterations of the 4 steps at a time, the last chunk partial
+        with mock.patch.object(simulation, 'CHUNK_CELLS', 40):
+            result = simulate_flow(self.flow, iterations=1005, seed=1)
+
+        self.assertEqual(result.iterations, 1005)
+        self.assertEqual((result.criticality[self.design.pk], result.criticality[self.release.pk]), (1.0, 1.0))
+        self.assertAlmostEqual(result.criticality[self.docs.pk] + result.criticality[self.build.pk], 1, delta=0.01)
+        self.assertTrue(days(8) <= result.completion_dates[50] <= result.completion_dates[95] <= days(18))
+
+    def test_simulation_api(self):
+        url = reverse('flow_builder:api_flow_simulation', args=[self.flow.pk])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user('planner', password='password'))
+        data = self.client.get(url, {'iterations': 200, 'seed': 3}).json()
+        self.assertEqual(data['completion_dates']['P95'], days(8).isoformat())
+        self.assertEqual(len(data['criticality']), 4)
+        self.assertEqual(self.client.get(url, {'iterations': 0}).status_code, 400)
+        # Runs x steps is bounded too
+        with mock.patch('flow_builder.views.MAX_SIMULATION_CELLS', 400):
+            self.assertEqual(self.client.get(url, {'iterations': 100}).status_code, 200)
+            response = self.client.get(url, {'iterations': 101})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 100', response.json()['error'])
 
-# Create your tests here.
+    def test_ranges_must_bracket_the_allotted_days(self):
+        self.docs.optimistic_days = 3
+        with self.assertRaises(ValidationError):
+            self.docs.full_clean()
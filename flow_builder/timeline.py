@@ -0,0 +1,44 @@
+"""
+Timeline (Gantt) data of a flow.
+
+``flow_timeline`` returns everything a client-side chart needs in one payload:
+the steps in execution order with their planned and actual dates, progress,
+slack and critical-path flag, plus the dependency edges. It takes three queries
+(the flow, its steps and its edges) however many steps and tasks there are.
+Progress comes from the steps' task counters.
+"""
+from .scheduling import FlowGraph
+
+
+def flow_timeline(flow):
+    graph = FlowGraph.load(flow)
+    schedule = graph.schedule()
+    steps = []
+    for step_id in graph.topological_order():
+        step, times = graph.steps[step_id], schedule[step_id]
+        steps.append({
+            'id': step.pk,
+            'title': step.title,
+            'duration_days': step.time_allotted_days,
+            'planned_start': step.planned_start_date,
+            'planned_end': step.planned_end_date,
+            'actual_start': step.actual_start_date,
+            'actual_end': step.actual_end_date,
+            'latest_start': times.latest_start,
+            'slack_days': times.slack,
+            'is_critical': times.is_critical,
+            'is_completed': step.is_completed,
+            'progress': step.progress_percentage,
+            'total_tasks': step.total_tasks,
+            'completed_tasks': step.completed_tasks,
+        })
+    return {
+        'flow': {'id': flow.pk, 'name': flow.name, 'start_date': flow.start_date},
+        'finish_date': max((times.earliest_finish for times in schedule.values()), default=flow.start_date),
+        'steps': steps,
+        # [dependency, dependent] pairs
+        'edges': sorted(
+            [dependency_id, step_id]
+            for step_id, dependency_ids in graph.dependencies.items() for dependency_id in dependency_ids
+        ),
+    }
@@ -7,6 +7,8 @@ urlpatterns = [
     path('', views.flow_list, name='flow_list'),
     path('create/', views.CreateFlowView.as_view(), name='create_flow'),
     path('flow/<int:pk>/', views.flow_detail, name='flow_detail'),
+    path('flow/<int:pk>/timeline/', views.api_flow_timeline, name='api_flow_timeline'),
+    path('flow/<int:pk>/simulation/', views.api_flow_simulation, name='api_flow_simulation'),
     path('flow/<int:pk>/edit/', views.FlowEditView.as_view(), name='flow_edit'),
     path('flow/<int:pk>/delete/', views.FlowDeleteView.as_view(), name='flow_delete'),
     path('flow/<int:flow_pk>/step/add/', views.StepCreateView.as_view(), name='add_step'),
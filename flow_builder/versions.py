@@ -0,0 +1,19 @@
+"""
+Schedule version stamps per flow, for cached timelines (see core.cache_versions).
+
+A flow's stamp is bumped once the recalculations of a committed transaction
+have run (see flow_builder.signals).
+"""
+from core.cache_versions import bump_version, get_version
+
+
+def _name(flow_id):
+    return f'flow_builder:schedule:{flow_id}'
+
+
+def get_schedule_version(flow_id):
+    return get_version(_name(flow_id))
+
+
+def bump_schedule_version(*flow_ids):
+    bump_version(*(_name(flow_id) for flow_id in flow_ids))
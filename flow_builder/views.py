@@ -3,10 +3,30 @@ from django.views.generic import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
 from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+import json
 from .models import Flow, Step, Task, Person
 from .forms import FlowForm, StepForm, TaskForm
+from .scheduling import FlowGraph
+from .simulation import DEFAULT_ITERATIONS, simulate_graph
+from .timeline import flow_timeline
+from .versions import get_schedule_version
+
+# Cached timelines are keyed by schedule version; this only bounds how long stale ones linger
+TIMELINE_CACHE_TIMEOUT = 60 * 60
+# Upper bounds on simulation runs per request, and on runs x steps (the CPU time spent)
+MAX_SIMULATION_ITERATIONS = 100000
+MAX_SIMULATION_CELLS = 20000000
 
 
 class CreateFlowView(CreateView):
@@ -35,10 +55,80 @@ def flow_list(request):
 def flow_detail(request, pk):
     flow = get_object_or_404(Flow, pk=pk)
     ordered_steps = flow.get_steps_in_order()
+    # Task counts come from the step counters; the task lists in one query
+    prefetch_related_objects(ordered_steps, 'tasks')
     context = {'flow': flow, 'steps': ordered_steps}
     return render(request, 'flow_builder/flow_detail.html', context)
 
 
+def flow_timeline_etag(request, pk):
+    """Strong ETag of a flow's timeline: the flow's schedule version"""
+    return f"flow-timeline-{pk}-{get_schedule_version(pk)}"
+
+
+# Public, like flow_list and flow_detail: it serves the dates those pages already show,
+# from the cache. The simulation below needs a login because each call costs real CPU.
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=flow_timeline_etag)
+def api_flow_timeline(request, pk):
+    """
+    Timeline (Gantt) data of a flow as JSON.
+
+    Polling clients that send back the ETag get a 304 after a single lookup of the flow's
+    schedule version in the cache (a table read with the database cache), without loading
+    the flow; otherwise the payload is served from the cache until the flow is rescheduled or edited.
+    """
+    cache_key = f'flow_builder:timeline:{flow_timeline_etag(request, pk)}'
+    content = cache.get(cache_key)
+
+    if content is None:
+        flow = get_object_or_404(Flow, pk=pk)
+        try:
+            data = flow_timeline(flow)
+        except ValidationError as error:
+            return JsonResponse({'error': error.messages[0]}, status=409)
+        content = json.dumps(data, cls=DjangoJSONEncoder)
+        cache.set(cache_key, content, TIMELINE_CACHE_TIMEOUT)
+
+    return HttpResponse(content, content_type='application/json')
+
+
+@login_required
+def api_flow_simulation(request, pk):
+    """
+    Monte Carlo schedule risk of a flow as JSON: P50/P80/P95 completion dates and
+    per-step criticality indices. ``iterations`` (default 10,000) and ``seed`` are optional;
+    large flows allow fewer iterations (``MAX_SIMULATION_CELLS``).
+    """
+    try:
+        iterations = int(request.GET.get('iterations', DEFAULT_ITERATIONS))
+        seed = int(request.GET['seed']) if request.GET.get('seed') else None
+    except ValueError:
+        return JsonResponse({'error': 'iterations and seed must be integers'}, status=400)
+    if not 1 <= iterations <= MAX_SIMULATION_ITERATIONS:
+        return JsonResponse({'error': f'iterations must be between 1 and {MAX_SIMULATION_ITERATIONS}'}, status=400)
+
+    flow = get_object_or_404(Flow, pk=pk)
+    graph = FlowGraph.load(flow)
+    if iterations * len(graph.steps) > MAX_SIMULATION_CELLS:
+        max_iterations = MAX_SIMULATION_CELLS // len(graph.steps)
+        return JsonResponse({'error': f'iterations must be at most {max_iterations} for this flow'}, status=400)
+    try:
+        result = simulate_graph(graph, iterations, seed)
+    except ValidationError as error:
+        return JsonResponse({'error': error.messages[0]}, status=409)
+    data = {
+        'flow': {'id': flow.pk, 'name': flow.name, 'start_date': flow.start_date},
+        'iterations': result.iterations,
+        'completion_dates': {f'P{p}': date for p, date in result.completion_dates.items()},
+        'mean_duration_days': result.mean_duration_days,
+        'criticality': [
+            {'id': step_id, 'criticality': criticality} for step_id, criticality in result.criticality.items()
+        ],
+    }
+    return JsonResponse(data)
+
+
 class FlowEditView(UpdateView):
     model = Flow
     form_class = FlowForm
@@ -89,8 +179,9 @@ class StepCreateView(CreateView):
     
     def form_valid(self, form):
         form.instance.flow = self.get_flow()
-        self.object = form.save()
-        self.object.flow.recalculate_dates()
+        # Saving the step and its dependencies reschedules what they affect, once on commit
+        with transaction.atomic():
+            self.object = form.save()
         messages.success(self.request, 'Step added successfully!')
         return super().form_valid(form)
     
@@ -122,8 +213,9 @@ class StepEditView(UpdateView):
         return context
     
     def form_valid(self, form):
-        self.object = form.save()
-        self.object.flow.recalculate_dates()
+        # Saving the step and its dependencies reschedules what they affect, once on commit
+        with transaction.atomic():
+            self.object = form.save()
         messages.success(self.request, 'Step updated successfully!')
         return super().form_valid(form)
     
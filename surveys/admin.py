@@ -2,9 +2,23 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from django.db.models import Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
 from .models import Survey, Section, Question, Response, Answer, Invite, ReportSnapshot
 
 
+def count_subquery(model, fk_name):
+    """Correlated COUNT(*) of ``model`` rows pointing at the outer row through ``fk_name``"""
+    counts = (
+        model.objects.filter(**{fk_name: OuterRef('pk')})
+        .order_by()
+        .values(fk_name)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
 class QuestionInline(admin.TabularInline):
     model = Question
     extra = 1
@@ -26,6 +40,7 @@ class SurveyAdmin(admin.ModelAdmin):
     search_fields = ['title', 'description', 'created_by__username']
     readonly_fields = ['created_at', 'updated_at', 'response_count', 'sections_count']
     inlines = [SectionInline]
+    actions = ['capture_report_snapshot']
     
     fieldsets = (
         ('Basic Information', {
@@ -40,6 +55,12 @@ class SurveyAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('created_by').annotate(
+            _response_count=count_subquery(Response, 'survey'),
+            _sections_count=count_subquery(Section, 'survey'),
+        )
+    
     def is_active_display(self, obj):
         if obj.is_active:
             return format_html('<span style="color: green;">✓ Active</span>')
@@ -48,8 +69,23 @@ class SurveyAdmin(admin.ModelAdmin):
     is_active_display.short_description = 'Status'
     
     def response_count(self, obj):
+        if hasattr(obj, '_response_count'):
+            return obj._response_count
         return obj.response_count
     response_count.short_description = 'Responses'
+    response_count.admin_order_field = '_response_count'
+    
+    def sections_count(self, obj):
+        if hasattr(obj, '_sections_count'):
+            return obj._sections_count
+        return obj.sections_count
+    sections_count.short_description = 'Sections'
+    
+    @admin.action(description='Capture report snapshot')
+    def capture_report_snapshot(self, request, queryset):
+        for survey in queryset:
+            ReportSnapshot.capture(survey)
+        self.message_user(request, f'Captured {queryset.count()} report snapshot(s).')
 
 
 @admin.register(Section)
@@ -60,9 +96,17 @@ class SectionAdmin(admin.ModelAdmin):
     ordering = ['survey', 'order']
     inlines = [QuestionInline]
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('survey').annotate(
+            _questions_count=count_subquery(Question, 'section'),
+        )
+    
     def questions_count(self, obj):
+        if hasattr(obj, '_questions_count'):
+            return obj._questions_count
         return obj.questions.count()
     questions_count.short_description = 'Questions'
+    questions_count.admin_order_field = '_questions_count'
 
 
 @admin.register(Question)
@@ -71,6 +115,7 @@ class QuestionAdmin(admin.ModelAdmin):
     list_filter = ['type', 'anonymity_mode', 'required', 'section__survey']
     search_fields = ['prompt', 'section__title', 'section__survey__title']
     ordering = ['section', 'order']
+    list_select_related = ['section__survey']
     
     fieldsets = (
         ('Basic Information', {
@@ -96,6 +141,9 @@ class AnswerInline(admin.TabularInline):
     readonly_fields = ['question', 'display_value', 'is_signed', 'moderation_status']
     fields = ['question', 'display_value', 'is_signed', 'moderation_status']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('question')
+    
     def display_value(self, obj):
         return obj.display_value
     display_value.short_description = 'Value'
@@ -119,6 +167,11 @@ class ResponseAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('survey', 'identity_user').annotate(
+            _answers_count=count_subquery(Answer, 'response'),
+        )
+    
     def identity_display(self, obj):
         if obj.identity_user:
             return obj.identity_user.username
@@ -133,8 +186,11 @@ class ResponseAdmin(admin.ModelAdmin):
     is_anonymous_display.short_description = 'Anonymity'
     
     def answers_count(self, obj):
+        if hasattr(obj, '_answers_count'):
+            return obj._answers_count
         return obj.answers_count
     answers_count.short_description = 'Answers'
+    answers_count.admin_order_field = '_answers_count'
 
 
 @admin.register(Answer)
@@ -143,6 +199,7 @@ class AnswerAdmin(admin.ModelAdmin):
     list_filter = ['question__type', 'question__anonymity_mode', 'moderation_status', 'is_signed']
     search_fields = ['question__prompt', 'response__survey__title', 'value_text']
     readonly_fields = ['response', 'question', 'display_value']
+    list_select_related = ['question', 'response__survey', 'response__identity_user']
     
     fieldsets = (
         ('Answer Information', {
@@ -180,6 +237,7 @@ class InviteAdmin(admin.ModelAdmin):
     list_filter = ['survey', 'expires_at', 'used_at']
     search_fields = ['survey__title', 'email', 'token']
     readonly_fields = ['token', 'status_display']
+    list_select_related = ['survey']
     
     fieldsets = (
         ('Invite Information', {
@@ -215,6 +273,7 @@ class ReportSnapshotAdmin(admin.ModelAdmin):
     list_filter = ['survey', 'computed_at']
     search_fields = ['survey__title']
     readonly_fields = ['computed_at', 'response_rate', 'enps_score']
+    list_select_related = ['survey']
     
     fieldsets = (
         ('Snapshot Information', {
@@ -335,6 +335,18 @@ class SurveyReportForm(forms.Form):
         widget=forms.RadioSelect,
         initial='summary'
     )
+    cohort_key = forms.CharField(
+        required=False,
+        max_length=50,
+        widget=forms.TextInput(attrs={'class': 'input input-bordered w-full', 'placeholder': 'department'}),
+        help_text='Optional response cohort field (e.g. "department") to group sentiment by'
+    )
+    min_cohort_size = forms.IntegerField(
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'input input-bordered w-full'}),
+        help_text="Minimum cohort size (never below the survey's k-threshold)"
+    )
 
 
 class AISurveyBriefForm(forms.Form):
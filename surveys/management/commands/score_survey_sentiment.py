@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.models import Answer, Survey
+from surveys.sentiment import score_answers
+
+
+class Command(BaseCommand):
+    help = 'Score free-text survey answers with the offline sentiment lexicon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--survey',
+            type=int,
+            help='Only score answers for this survey id'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of answers scored and written per batch'
+        )
+        parser.add_argument(
+            '--rescore',
+            action='store_true',
+            help='Rescore answers that already have a sentiment score'
+        )
+
+    def handle(self, *args, **options):
+        answers = Answer.objects.all()
+        if options['survey']:
+            if not Survey.objects.filter(pk=options['survey']).exists():
+                raise CommandError(f'Survey {options["survey"]} not found.')
+            answers = answers.filter(response__survey_id=options['survey'])
+
+        scored = score_answers(answers, chunk_size=options['chunk_size'], rescore=options['rescore'])
+        self.stdout.write(self.style.SUCCESS(f'Scored {scored} answers'))
@@ -0,0 +1,240 @@
+import io
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+
+from surveys.models import Survey, Question, Response
+
+
+SAMPLE_TEXT = [
+    'Communication between teams has improved a lot this quarter.',
+    'I would like clearer priorities from leadership.',
+    'Workload is heavy but manageable with better planning.',
+    'More training opportunities would help me grow.',
+    'The new tools are slow and frustrating to use.',
+    'I feel supported by my manager and my colleagues.',
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Command(BaseCommand):
+    help = 'Load-test survey submissions with concurrent simulated respondents and report SQLite lock behaviour'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--respondents',
+            type=int,
+            default=200,
+            help='Number of simulated respondents per round'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=16,
+            help='Number of respondents submitting at the same time'
+        )
+        parser.add_argument(
+            '--journal-mode',
+            choices=['current', 'delete', 'wal', 'compare'],
+            default='compare',
+            help='SQLite journal mode to test; "compare" runs one round in DELETE and one in WAL mode'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=None,
+            help='SQLite busy timeout in seconds for the respondents\' connections (default: driver default of 5s)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed for generated answers so runs are repeatable'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the generated responses instead of deleting them after each round'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('survey_load_test only supports the SQLite backend.')
+        if options['respondents'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--respondents and --concurrency must be at least 1.')
+
+        call_command('seed_balanced_honesty', stdout=io.StringIO())
+        survey = Survey.objects.get(title='Balanced Honesty Survey')
+        questions = list(
+            Question.objects.filter(section__survey=survey).order_by('section__order', 'order')
+        )
+
+        original_window = (survey.status, survey.publish_start, survey.publish_end)
+        now = timezone.now()
+        survey.status = 'PUBLISHED'
+        survey.publish_start = now - timedelta(minutes=5)
+        survey.publish_end = now + timedelta(days=1)
+        survey.save()
+
+        modes = {
+            'current': [None],
+            'delete': ['delete'],
+            'wal': ['wal'],
+            'compare': ['delete', 'wal'],
+        }[options['journal_mode']]
+        original_mode = self._journal_mode()
+
+        db_options = connections.settings['default'].setdefault('OPTIONS', {})
+        original_timeout = db_options.get('timeout')
+        if options['timeout'] is not None:
+            db_options['timeout'] = options['timeout']
+
+        results = []
+        try:
+            for mode in modes:
+                results.append(self._run_round(survey, questions, mode, options))
+        finally:
+            if options['timeout'] is not None:
+                if original_timeout is None:
+                    db_options.pop('timeout', None)
+                else:
+                    db_options['timeout'] = original_timeout
+            self._journal_mode(original_mode)
+            survey.status, survey.publish_start, survey.publish_end = original_window
+            survey.save()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for result in results:
+            self._write_result(result)
+
+    def _journal_mode(self, mode=None):
+        """Read the journal mode, or switch to ``mode`` and return the mode SQLite actually applied."""
+        with connection.cursor() as cursor:
+            if mode:
+                cursor.execute(f'PRAGMA journal_mode={mode}')
+            else:
+                cursor.execute('PRAGMA journal_mode')
+            return cursor.fetchone()[0]
+
+    def _run_round(self, survey, questions, mode, options):
+        journal_mode = self._journal_mode(mode)
+        last_pk = Response.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        url = reverse('surveys:take', args=[survey.pk])
+        respondents = range(options['respondents'])
+
+        def respond(index):
+            rng = random.Random(options['seed'] * 100003 + index)
+            return self._submit(url, self._answers(questions, rng))
+
+        def respond_in_thread(index):
+            # Each worker thread opens its own connection, as a separate server process would.
+            try:
+                return respond(index)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        if options['concurrency'] == 1:
+            outcomes = [respond(index) for index in respondents]
+        else:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                outcomes = list(pool.map(respond_in_thread, respondents))
+        elapsed = time.perf_counter() - started
+
+        created = Response.objects.filter(survey=survey, pk__gt=last_pk)
+        saved = created.count()
+        if not options['keep']:
+            created.delete()
+
+        latencies = sorted(latency * 1000 for status, latency in outcomes if status == 'ok')
+        lock_errors = sum(1 for status, _ in outcomes if status == 'locked')
+        return {
+            'journal_mode': journal_mode,
+            'respondents': options['respondents'],
+            'concurrency': options['concurrency'],
+            'succeeded': len(latencies),
+            'lock_errors': lock_errors,
+            'other_errors': len(outcomes) - len(latencies) - lock_errors,
+            'responses_saved': saved,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_per_second': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p90': round(percentile(latencies, 90), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(latencies[-1], 2) if latencies else 0.0,
+            },
+        }
+
+    def _answers(self, questions, rng):
+        data = {}
+        for question in questions:
+            field_name = f'question_{question.pk}'
+            if question.is_scale_question:
+                low, high = sorted((question.scale_min, question.scale_max))
+                data[field_name] = str(rng.randint(low, high))
+            elif question.type in ['SHORT_TEXT', 'LONG_TEXT']:
+                data[field_name] = ' '.join(rng.sample(SAMPLE_TEXT, 2))
+            elif question.type in ['SINGLE', 'MULTI', 'RANK'] and question.options:
+                data[field_name] = rng.choice(question.options)
+        return data
+
+    def _submit(self, url, data):
+        """POST one response and classify it as ``ok``, ``locked`` or ``error``."""
+        client = Client(HTTP_HOST='localhost')
+        started = time.perf_counter()
+        try:
+            response = client.post(url, data=data)
+        except OperationalError as exc:
+            return ('locked' if 'locked' in str(exc) else 'error', time.perf_counter() - started)
+        except Exception:
+            return ('error', time.perf_counter() - started)
+        latency = time.perf_counter() - started
+
+        # The view catches save errors and re-renders the form with a message instead of redirecting.
+        if response.status_code == 302:
+            return ('ok', latency)
+        if b'database is locked' in response.content or b'database table is locked' in response.content:
+            return ('locked', latency)
+        return ('error', latency)
+
+    def _write_result(self, result):
+        latency = result['latency_ms']
+        self.stdout.write(self.style.SUCCESS(
+            f"\nJournal mode: {result['journal_mode']} "
+            f"({result['respondents']} respondents, concurrency {result['concurrency']})"
+        ))
+        self.stdout.write(f"  Succeeded:    {result['succeeded']} ({result['responses_saved']} responses saved)")
+        style = self.style.ERROR if result['lock_errors'] else self.style.SUCCESS
+        self.stdout.write(style(f"  Lock errors:  {result['lock_errors']}"))
+        self.stdout.write(f"  Other errors: {result['other_errors']}")
+        self.stdout.write(f"  Elapsed:      {result['elapsed_seconds']}s")
+        self.stdout.write(f"  Throughput:   {result['throughput_per_second']} submissions/s")
+        self.stdout.write(
+            f"  Latency (ms): p50={latency['p50']} p90={latency['p90']} "
+            f"p99={latency['p99']} max={latency['max']}"
+        )
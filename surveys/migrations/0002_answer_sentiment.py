@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='sentiment_label',
+            field=models.CharField(blank=True, choices=[('POSITIVE', 'Positive'), ('NEUTRAL', 'Neutral'), ('NEGATIVE', 'Negative')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='sentiment_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
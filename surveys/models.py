@@ -169,6 +169,12 @@ class Answer(models.Model):
         ('REDACTED', 'Redacted'),
     ]
     
+    SENTIMENT_LABELS = [
+        ('POSITIVE', 'Positive'),
+        ('NEUTRAL', 'Neutral'),
+        ('NEGATIVE', 'Negative'),
+    ]
+    
     response = models.ForeignKey(Response, on_delete=models.CASCADE, related_name='answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answers')
     value_text = models.TextField(blank=True)
@@ -180,6 +186,9 @@ class Answer(models.Model):
     preferred_contact = models.TextField(blank=True)
     moderation_status = models.CharField(max_length=20, choices=MODERATION_STATUS, default='OK')
     flags_json = models.JSONField(default=dict, blank=True)  # For moderation flags
+    # Denormalized sentiment for text answers, filled in batches by surveys.sentiment.score_answers
+    sentiment_score = models.FloatField(null=True, blank=True)
+    sentiment_label = models.CharField(max_length=10, choices=SENTIMENT_LABELS, blank=True)
     
     class Meta:
         unique_together = ['response', 'question']
@@ -260,30 +269,41 @@ class ReportSnapshot(models.Model):
     def get_absolute_url(self):
         return reverse('surveys:report_snapshot_detail', kwargs={'pk': self.pk})
     
+    @classmethod
+    def capture(cls, survey):
+        """Compute and store the survey's headline aggregates so listings can read them without queries"""
+        return cls.objects.create(survey=survey, aggregates_json=cls.compute_aggregates(survey))
+    
+    @staticmethod
+    def compute_aggregates(survey):
+        total_invites = survey.invites.count()
+        total_responses = survey.responses.count()
+        nps = Answer.objects.filter(
+            question__type='NPS',
+            response__survey=survey,
+            value_number__isnull=False,
+        ).aggregate(
+            total=models.Count('pk'),
+            promoters=models.Count('pk', filter=models.Q(value_number__gte=9)),
+            detractors=models.Count('pk', filter=models.Q(value_number__lte=6)),
+        )
+        return {
+            'total_invites': total_invites,
+            'total_responses': total_responses,
+            'response_rate': (total_responses / total_invites) * 100 if total_invites else 0,
+            'enps_score': ((nps['promoters'] - nps['detractors']) / nps['total']) * 100 if nps['total'] else 0,
+        }
+    
     @property
     def response_rate(self):
-        """Calculate response rate as percentage"""
-        total_invites = self.survey.invites.count()
-        if total_invites == 0:
-            return 0
-        return (self.survey.response_count / total_invites) * 100
+        """Response rate as percentage, from the stored aggregates when available"""
+        if 'response_rate' in self.aggregates_json:
+            return self.aggregates_json['response_rate']
+        return self.compute_aggregates(self.survey)['response_rate']
     
     @property
     def enps_score(self):
-        """Calculate eNPS score from NPS questions"""
-        nps_answers = Answer.objects.filter(
-            question__type='NPS',
-            response__survey=self.survey
-        ).values_list('value_number', flat=True)
-        
-        if not nps_answers:
-            return 0
-        
-        promoters = sum(1 for score in nps_answers if score >= 9)
-        detractors = sum(1 for score in nps_answers if score <= 6)
-        total = len(nps_answers)
-        
-        if total == 0:
-            return 0
-        
-        return ((promoters - detractors) / total) * 100
+        """eNPS score from NPS questions, from the stored aggregates when available"""
+        if 'enps_score' in self.aggregates_json:
+            return self.aggregates_json['enps_score']
+        return self.compute_aggregates(self.survey)['enps_score']
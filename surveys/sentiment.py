@@ -0,0 +1,165 @@
+"""
+Offline lexicon-based sentiment scoring for free-text survey answers.
+
+Scores are stored on ``Answer.sentiment_score`` / ``Answer.sentiment_label`` so
+reports can aggregate them with SQL instead of re-scoring text on every view.
+"""
+import math
+import re
+
+from django.db.models import Avg, Count, Q
+from django.db.models.fields.json import KeyTextTransform
+
+from .models import Answer
+
+
+TEXT_QUESTION_TYPES = ['SHORT_TEXT', 'LONG_TEXT']
+
+POSITIVE_WORDS = {
+    'appreciate', 'appreciated', 'awesome', 'balanced', 'benefit', 'better', 'calm', 'clear',
+    'comfortable', 'confident', 'easy', 'effective', 'efficient', 'empowered', 'encouraged',
+    'engaged', 'enjoy', 'excellent', 'fair', 'flexible', 'fun', 'good', 'great', 'grow',
+    'growth', 'happy', 'helpful', 'improve', 'improved', 'improving', 'inspired', 'love',
+    'manageable', 'motivated', 'nice', 'open', 'positive', 'productive', 'proud', 'recognized',
+    'respect', 'respected', 'rewarding', 'safe', 'satisfied', 'strong', 'success', 'successful',
+    'support', 'supported', 'supportive', 'thank', 'thanks', 'transparent', 'trust', 'trusted',
+    'valued', 'welcome', 'well', 'wonderful',
+}
+
+NEGATIVE_WORDS = {
+    'afraid', 'angry', 'anxious', 'bad', 'blame', 'broken', 'burnout', 'burned', 'chaotic',
+    'concern', 'concerned', 'confused', 'confusing', 'conflict', 'difficult', 'disappointed',
+    'disrespected', 'exhausted', 'fail', 'failed', 'fear', 'frustrated', 'frustrating', 'hard',
+    'harassment', 'heavy', 'hostile', 'ignored', 'poor', 'pressure', 'problem', 'problems',
+    'slow', 'stress', 'stressed', 'stressful', 'terrible', 'tired', 'toxic', 'unclear', 'unfair',
+    'unhappy', 'unsafe', 'unsupported', 'upset', 'worried', 'worse', 'worst', 'overworked',
+    'overwhelmed', 'understaffed', 'unrealistic', 'micromanaged', 'micromanagement',
+}
+
+NEGATIONS = {'not', 'no', 'never', 'nothing', 'hardly', 'without', "don't", "doesn't",
+             "didn't", "isn't", "aren't", "wasn't", "can't", "won't"}
+
+INTENSIFIERS = {'very': 1.5, 'really': 1.5, 'extremely': 2.0, 'so': 1.3, 'too': 1.3,
+                'incredibly': 2.0, 'super': 1.5, 'slightly': 0.5, 'somewhat': 0.7}
+
+WORD_RE = re.compile(r"[a-z']+")
+
+# Same squashing idea as VADER: total / sqrt(total^2 + alpha) keeps scores in (-1, 1).
+NORMALIZATION_ALPHA = 2.0
+
+# Scores at or beyond these bounds get a positive/negative label.
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+
+def score_text(text):
+    """Return a sentiment score in [-1, 1] for a piece of free text."""
+    tokens = WORD_RE.findall((text or '').lower())
+    total = 0.0
+    hits = 0
+    for i, token in enumerate(tokens):
+        if token in POSITIVE_WORDS:
+            weight = 1.0
+        elif token in NEGATIVE_WORDS:
+            weight = -1.0
+        else:
+            continue
+        # Look back a few words for negations and intensifiers ("not very helpful").
+        for previous in tokens[max(0, i - 3):i]:
+            if previous in NEGATIONS:
+                weight = -weight
+            elif previous in INTENSIFIERS:
+                weight *= INTENSIFIERS[previous]
+        total += weight
+        hits += 1
+    if not hits:
+        return 0.0
+    return total / math.sqrt(total * total + NORMALIZATION_ALPHA)
+
+
+def label_for(score):
+    if score >= POSITIVE_THRESHOLD:
+        return 'POSITIVE'
+    if score <= NEGATIVE_THRESHOLD:
+        return 'NEGATIVE'
+    return 'NEUTRAL'
+
+
+def score_answers(answers=None, chunk_size=500, rescore=False):
+    """
+    Score free-text answers in chunks and store the results with ``bulk_update``.
+
+    Only answers without a score are processed unless ``rescore`` is set.
+    Returns the number of answers scored.
+    """
+    if answers is None:
+        answers = Answer.objects.all()
+    answers = answers.filter(question__type__in=TEXT_QUESTION_TYPES).exclude(value_text='')
+    if not rescore:
+        answers = answers.filter(sentiment_score__isnull=True)
+
+    scored = 0
+    chunk = []
+    for answer in answers.only('pk', 'value_text').order_by('pk').iterator(chunk_size=chunk_size):
+        chunk.append(answer)
+        if len(chunk) >= chunk_size:
+            scored += _score_chunk(chunk)
+            chunk = []
+    if chunk:
+        scored += _score_chunk(chunk)
+    return scored
+
+
+def _score_chunk(chunk):
+    scores = [score_text(answer.value_text) for answer in chunk]
+    for answer, score in zip(chunk, scores):
+        answer.sentiment_score = round(score, 4)
+        answer.sentiment_label = label_for(score)
+    Answer.objects.bulk_update(chunk, ['sentiment_score', 'sentiment_label'])
+    return len(chunk)
+
+
+def _sentiment_aggregates():
+    return {
+        'scored': Count('pk'),
+        'average': Avg('sentiment_score'),
+        'positive': Count('pk', filter=Q(sentiment_label='POSITIVE')),
+        'neutral': Count('pk', filter=Q(sentiment_label='NEUTRAL')),
+        'negative': Count('pk', filter=Q(sentiment_label='NEGATIVE')),
+    }
+
+
+def sentiment_summary(survey, responses=None, cohort_key=None, min_cohort_size=None):
+    """
+    Aggregate stored sentiment by question (and optionally by a ``cohort_json`` key)
+    with grouped SQL queries. Cohorts smaller than ``min_cohort_size`` or the survey's
+    k-threshold, whichever is larger, are omitted.
+    """
+    answers = Answer.objects.filter(
+        response__survey=survey,
+        question__type__in=TEXT_QUESTION_TYPES,
+        sentiment_score__isnull=False,
+    )
+    if responses is not None:
+        answers = answers.filter(response__in=responses)
+
+    summary = {
+        'overall': answers.aggregate(**_sentiment_aggregates()),
+        'by_question': list(
+            answers.values('question_id', 'question__prompt')
+            .annotate(**_sentiment_aggregates())
+            .order_by('question__section__order', 'question__order')
+        ),
+        'by_cohort': [],
+    }
+
+    if cohort_key:
+        summary['by_cohort'] = list(
+            answers.annotate(cohort=KeyTextTransform(cohort_key, 'response__cohort_json'))
+            .exclude(cohort__isnull=True)
+            .values('cohort')
+            .annotate(respondents=Count('response', distinct=True), **_sentiment_aggregates())
+            .filter(respondents__gte=max(survey.k_threshold, min_cohort_size or 0))
+            .order_by('cohort')
+        )
+    return summary
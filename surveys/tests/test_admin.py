@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from surveys.models import Survey, Section, Question, Response, Answer, Invite, ReportSnapshot
+
+
+class SurveyAdminQueryCountTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'x')
+        self.client.login(username='admin@example.com', password='x')
+
+    def add_survey(self, index):
+        now = timezone.now()
+        survey = Survey.objects.create(
+            title=f'Survey {index}', publish_start=now, publish_end=now + timedelta(days=7),
+            status='PUBLISHED', created_by=self.admin,
+        )
+        section = Section.objects.create(survey=survey, title='Section', order=1)
+        question = Question.objects.create(section=section, type='NPS', prompt='Recommend?', order=1)
+        for score in (10, 9, 3):
+            response = Response.objects.create(survey=survey)
+            Answer.objects.create(response=response, question=question, value_number=score)
+        Invite.objects.create(survey=survey, token=f'tok-{index}', expires_at=now + timedelta(days=1))
+        ReportSnapshot.capture(survey)
+        return survey
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelists_render_in_constant_queries(self):
+        urls = [
+            reverse('admin:surveys_survey_changelist'),
+            reverse('admin:surveys_section_changelist'),
+            reverse('admin:surveys_response_changelist'),
+            reverse('admin:surveys_answer_changelist'),
+            reverse('admin:surveys_invite_changelist'),
+            reverse('admin:surveys_reportsnapshot_changelist'),
+        ]
+        self.add_survey(1)
+        baseline = [self.count_queries(url) for url in urls]
+        for index in range(2, 6):
+            self.add_survey(index)
+        self.assertEqual([self.count_queries(url) for url in urls], baseline)
+
+    def test_snapshot_stores_enps_and_response_rate(self):
+        snapshot = ReportSnapshot.objects.get(survey=self.add_survey(1))
+        self.assertAlmostEqual(snapshot.enps_score, (2 - 1) / 3 * 100)
+        self.assertEqual(snapshot.response_rate, 300)
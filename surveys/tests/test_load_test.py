@@ -0,0 +1,26 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from surveys.models import Survey, Response
+
+
+class SurveyLoadTestCommandTests(TestCase):
+    def test_reports_results_and_cleans_up(self):
+        out = StringIO()
+        call_command(
+            'survey_load_test', respondents=3, concurrency=1,
+            journal_mode='current', json=True, stdout=out,
+        )
+        results = json.loads(out.getvalue())
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['succeeded'], 3)
+        self.assertEqual(results[0]['responses_saved'], 3)
+        self.assertEqual(results[0]['lock_errors'], 0)
+        self.assertEqual(Response.objects.count(), 0)
+
+        # The survey publishing window is restored after the run.
+        survey = Survey.objects.get(title='Balanced Honesty Survey')
+        self.assertEqual(survey.status, 'DRAFT')
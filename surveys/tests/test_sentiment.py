@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from surveys.models import Survey, Question, Response, Answer
+from surveys.sentiment import score_text, score_answers, sentiment_summary
+
+
+class SentimentScoringTests(TestCase):
+    def setUp(self):
+        call_command('seed_balanced_honesty', stdout=StringIO())
+        self.survey = Survey.objects.get(title='Balanced Honesty Survey')
+        self.survey.k_threshold = 2
+        self.survey.save()
+        self.question = Question.objects.filter(section__survey=self.survey, type='LONG_TEXT').first()
+        texts = [
+            ('Sales', 'My manager is very supportive and I feel valued.'),
+            ('Sales', 'Great team, clear goals.'),
+            ('Ops', 'Workload is overwhelming and the tools are terrible.'),
+        ]
+        for cohort, text in texts:
+            response = Response.objects.create(survey=self.survey, cohort_json={'department': cohort})
+            Answer.objects.create(response=response, question=self.question, value_text=text)
+
+    def test_score_text_polarity(self):
+        self.assertGreater(score_text('I love working here, great people'), 0)
+        self.assertLess(score_text('Stressful and unfair'), 0)
+        self.assertLess(score_text('not helpful at all'), 0)
+        self.assertEqual(score_text(''), 0.0)
+
+    def test_score_answers_only_scores_new_answers(self):
+        self.assertEqual(score_answers(chunk_size=2), 3)
+        self.assertEqual(score_answers(), 0)
+        self.assertFalse(Answer.objects.filter(sentiment_label='').exists())
+
+    def test_summary_groups_by_question_and_cohort(self):
+        score_answers()
+        summary = sentiment_summary(self.survey, cohort_key='department')
+        self.assertEqual(summary['overall']['scored'], 3)
+        self.assertEqual(summary['overall']['positive'], 2)
+        self.assertEqual(summary['by_question'][0]['question_id'], self.question.pk)
+        # The Ops cohort has a single respondent, below the k-threshold of 2.
+        self.assertEqual([row['cohort'] for row in summary['by_cohort']], ['Sales'])
+
+    def test_min_cohort_size_only_raises_the_k_threshold(self):
+        score_answers()
+        summary = sentiment_summary(self.survey, cohort_key='department', min_cohort_size=3)
+        self.assertEqual(summary['by_cohort'], [])
+        summary = sentiment_summary(self.survey, cohort_key='department', min_cohort_size=1)
+        self.assertEqual([row['cohort'] for row in summary['by_cohort']], ['Sales'])
+
+    def test_cohort_sentiment_from_the_reports_page(self):
+        user = get_user_model().objects.create_user('analyst', password='x', is_staff=True)
+        self.client.force_login(user)
+        url = reverse('surveys:survey_reports', args=[self.survey.pk])
+        self.assertContains(self.client.get(url), 'name="cohort_key"')
+
+        response = self.client.post(url, {'report_type': 'sentiment', 'cohort_key': 'department'})
+        self.assertEqual([row['cohort'] for row in response.context['report_data']['sentiment']['by_cohort']], ['Sales'])
+        self.assertContains(response, 'By department')
+
+        response = self.client.post(url, {'report_type': 'sentiment', 'cohort_key': 'department', 'min_cohort_size': 3})
+        self.assertEqual(response.context['report_data']['sentiment']['by_cohort'], [])
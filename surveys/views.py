@@ -23,6 +23,7 @@ from .forms import (
 )
 from .ai_survey_generator import generate_survey_json
 from .services import create_survey_from_json
+from .sentiment import score_answers, sentiment_summary
 
 
 def is_survey_admin(user):
@@ -484,6 +485,12 @@ def generate_survey_report(survey, options):
             question_data['answers'] = list(answers)
             report_data['questions'].append(question_data)
     
+    # Score any text answers submitted since the last batch, then aggregate in SQL
+    score_answers(Answer.objects.filter(response__survey=survey))
+    report_data['sentiment'] = sentiment_summary(
+        survey, responses, options.get('cohort_key'), options.get('min_cohort_size')
+    )
+    
     return report_data
 
 